@@ -0,0 +1,49 @@
+"""
+Nodes settled and time per query for A* and ALT compared with Dijkstra.
+
+Usage: python benchmarks/bench_goal_directed.py [grid side] [queries]
+"""
+
+import sys
+from common import grid_graph, random_pairs, timed
+from functools import partial
+from route_calc.geo import great_circle_heuristic
+from route_calc.landmarks import LandmarkIndex
+from route_calc.search import ShortestPathTree, astar
+
+
+def main(side: int = 60, queries: int = 200):
+    graph = grid_graph(side)
+    pairs = random_pairs(graph, queries)
+    print(f"{graph}")
+
+    index, preprocessing = timed(LandmarkIndex.build, graph, k=8)
+    print(f"Landmark preprocessing: {preprocessing:.2f} s")
+
+    def run_dijkstra():
+        results = []
+        for s, t in pairs:
+            tree = ShortestPathTree(graph, s)
+            results.append((tree.duration(t), len(tree.settled)))
+        return results
+
+    def run(heuristic):
+        return lambda: [astar(graph, s, t, heuristic(t))[::2] for s, t in pairs]
+
+    expected, baseline = timed(run_dijkstra)
+    print(
+        f"Dijkstra: {1e3 * baseline / queries:.3f} ms/query, {sum(s for _, s in expected) / queries:.0f} settled"
+    )
+    for label, heuristic in [
+        ("A*", partial(great_circle_heuristic, graph)),
+        ("ALT", index.heuristic),
+    ]:
+        results, elapsed = timed(run(heuristic))
+        assert all(abs(a[0] - b[0]) < 1e-9 for a, b in zip(results, expected))
+        print(
+            f"{label}: {1e3 * elapsed / queries:.3f} ms/query, {sum(s for _, s in results) / queries:.0f} settled"
+        )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
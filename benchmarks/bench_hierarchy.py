@@ -0,0 +1,47 @@
+"""
+Contraction hierarchy preprocessing cost and query speedup over Dijkstra.
+
+Usage: python benchmarks/bench_hierarchy.py [grid side] [queries]
+"""
+
+import sys
+from common import grid_graph, random_pairs, timed
+from route_calc.hierarchy import ContractionHierarchy
+from route_calc.search import ShortestPathTree, bidirectional
+
+
+def main(side: int = 60, queries: int = 200):
+    graph = grid_graph(side)
+    pairs = random_pairs(graph, queries)
+    print(f"{graph}")
+
+    hierarchy, preprocessing = timed(ContractionHierarchy.build, graph)
+    print(f"Preprocessing: {preprocessing:.2f} s")
+    print(
+        f"Shortcuts: {hierarchy.n_shortcuts} ({hierarchy.n_shortcuts / (graph.n_routes / 2):.2f} per route)"
+    )
+
+    def run_dijkstra():
+        return [ShortestPathTree(graph, s).duration(t) for s, t in pairs]
+
+    def run_bidirectional():
+        return [bidirectional(graph, s, t)[0] for s, t in pairs]
+
+    def run_hierarchy():
+        return [hierarchy.query(s, t)[0] for s, t in pairs]
+
+    expected, baseline = timed(run_dijkstra)
+    for label, run in [
+        ("Bidirectional", run_bidirectional),
+        ("Contraction hierarchy", run_hierarchy),
+    ]:
+        durations, elapsed = timed(run)
+        assert all(abs(a - b) < 1e-9 for a, b in zip(durations, expected))
+        print(
+            f"{label}: {1e3 * elapsed / queries:.3f} ms/query ({baseline / elapsed:.1f}x Dijkstra)"
+        )
+    print(f"Dijkstra: {1e3 * baseline / queries:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,78 @@
+"""
+Yen's k shortest paths with masking and a shared tree, compared with rerunning
+Dijkstra on a copy of the graph with routes removed for every spur node.
+
+Usage: python benchmarks/bench_k_shortest.py [grid side] [queries] [k]
+"""
+
+import sys
+import heapq
+import numpy as np
+from common import grid_graph, random_pairs, timed
+from route_calc.graph import CompiledGraph
+from route_calc.search import ShortestPathTree, k_shortest_paths
+
+
+def naive_k_shortest_paths(
+    graph: CompiledGraph, source: int, target: int, k: int
+) -> list[tuple[float, list[int]]]:
+    """
+    Textbook Yen's algorithm, copying the graph for each spur search.
+    """
+    starts = np.repeat(np.arange(graph.n_nodes), np.diff(graph.offsets))
+
+    def duration(path):
+        return sum(dict(graph.neighbors(u))[v] for u, v in zip(path, path[1:]))
+
+    path = ShortestPathTree(graph, source).path(target)
+    if not path:
+        return []
+    found, candidates, seen = [(duration(path), path)], [], {tuple(path)}
+    while len(found) < k:
+        _, path = found[-1]
+        for i in range(len(path) - 1):
+            root = path[: i + 1]
+            # Remove the root's nodes and the routes used by earlier paths
+            keep = ~np.isin(starts, root[:-1]) & ~np.isin(graph.targets, root[:-1])
+            for _, p in found:
+                if p[: i + 1] == root:
+                    keep &= ~((starts == p[i]) & (graph.targets == p[i + 1]))
+            masked = CompiledGraph.from_edges(
+                graph.names, starts[keep], graph.targets[keep], graph.weights[keep]
+            )
+            spur = ShortestPathTree(masked, path[i]).path(target)
+            if spur and tuple(root[:-1] + spur) not in seen:
+                seen.add(tuple(root[:-1] + spur))
+                heapq.heappush(
+                    candidates, (duration(root[:-1] + spur), root[:-1] + spur)
+                )
+        if not candidates:
+            break
+        found.append(heapq.heappop(candidates))
+    return found
+
+
+def main(side: int = 30, queries: int = 20, k: int = 5):
+    graph = grid_graph(side)
+    pairs = random_pairs(graph, queries)
+    print(f"{graph}, k = {k}")
+
+    def run_naive():
+        return [naive_k_shortest_paths(graph, s, t, k) for s, t in pairs]
+
+    def run_yen():
+        return [k_shortest_paths(graph, s, t, k) for s, t in pairs]
+
+    expected, baseline = timed(run_naive)
+    print(f"Naive: {1e3 * baseline / queries:.1f} ms/query")
+    results, elapsed = timed(run_yen)
+    for paths, reference in zip(results, expected):
+        assert len(paths) == len(reference)
+        assert all(abs(a[0] - b[0]) < 1e-9 for a, b in zip(paths, reference))
+    print(
+        f"Masked with shared tree: {1e3 * elapsed / queries:.1f} ms/query ({baseline / elapsed:.1f}x)"
+    )
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:]])
@@ -0,0 +1,85 @@
+import time
+import random
+import numpy as np
+from route_calc.graph import CompiledGraph
+
+
+def grid_graph(side: int = 100, seed: int = 0) -> CompiledGraph:
+    """
+    A road-network-like square grid with a few diagonals and random durations.
+
+    Parameters
+    ----------
+    side: int
+        Number of locations along each side of the grid
+    seed: int
+        Seed for the random durations
+
+    Returns
+    -------
+    CompiledGraph object with side * side locations
+    """
+    rng = random.Random(seed)
+    edges = []
+    for r in range(side):
+        for c in range(side):
+            u = r * side + c
+            if c + 1 < side:
+                edges.append((u, u + 1))
+            if r + 1 < side:
+                edges.append((u, u + side))
+            if r + 1 < side and c + 1 < side and rng.random() < 0.1:
+                edges.append((u, u + side + 1))
+    # Roughly 100 m between neighboring locations, at 0.5 to 1 km per minute
+    latitudes = np.repeat(np.arange(side) * 0.0009, side) + 42.3
+    longitudes = np.tile(np.arange(side) * 0.0012, side) - 71.1
+    weights = [
+        rng.uniform(0.1, 0.2) * (1.5 if u % side != v % side and v - u != 1 else 1)
+        for u, v in edges
+    ]
+    starts = [u for u, _ in edges] + [v for _, v in edges]
+    ends = [v for _, v in edges] + [u for u, _ in edges]
+    return CompiledGraph.from_edges(
+        names=[str(i) for i in range(side * side)],
+        starts=starts,
+        ends=ends,
+        weights=weights * 2,
+        latitudes=latitudes,
+        longitudes=longitudes,
+    )
+
+
+def random_pairs(graph: CompiledGraph, n: int, seed: int = 0) -> list[tuple[int, int]]:
+    """
+    Random (start, end) node ID pairs.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to draw node IDs from
+    n: int
+        Number of pairs
+    seed: int
+        Seed for the random draws
+
+    Returns
+    -------
+    List of (start, end) tuples
+    """
+    rng = random.Random(seed)
+    return [
+        (rng.randrange(graph.n_nodes), rng.randrange(graph.n_nodes)) for _ in range(n)
+    ]
+
+
+def timed(function, *args, **kwargs):
+    """
+    Call a function and measure its wall-clock time.
+
+    Returns
+    -------
+    The function's result and the elapsed time in seconds
+    """
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - start
@@ -1,5 +1,8 @@
-from .location import Location
+from .location import Location, LocationTable
+from .graph import CompiledGraph
 from .map import Map
+from .scenario import Scenario
+from .search import Route
 from .plotter import plot_map, plot_nodes, plot_route
-from .readers import read_locations, read_routes
-from .simulation import simulate_traffic
+from .readers import convert_csv, read_compiled, read_locations, read_routes
+from .simulation import simulate_scenarios, simulate_traffic, simulate_traffic_batch
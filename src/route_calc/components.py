@@ -0,0 +1,136 @@
+from __future__ import annotations
+from route_calc.graph import CompiledGraph
+
+
+class ComponentIndex:
+    """
+    Connected components of a map, kept up to date as routes are added with a
+    union-find structure. Blocked routes of infinite duration do not connect
+    locations, so locations in different components cannot reach each other.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._parent = []
+        self._size = []
+
+    def __repr__(self):
+        return f"ComponentIndex of {len(self._parent)} locations in {self.n_components} components"
+
+    @property
+    def n_components(self) -> int:
+        """Number of connected components."""
+        return sum(1 for i, parent in enumerate(self._parent) if i == parent)
+
+    @classmethod
+    def from_graph(cls, graph: CompiledGraph) -> ComponentIndex:
+        """
+        Label the components of a compiled graph.
+
+        Parameters
+        ----------
+        graph: CompiledGraph
+            Graph to label
+
+        Returns
+        -------
+        ComponentIndex object
+        """
+        index = cls()
+        index._ids = dict(graph.index)
+        index._parent = list(range(graph.n_nodes))
+        index._size = [1] * graph.n_nodes
+        offsets, targets, weights = graph.as_lists()
+        inf = float("inf")
+        for u in range(graph.n_nodes):
+            for i in range(offsets[u], offsets[u + 1]):
+                if targets[i] > u and weights[i] != inf:
+                    index._union(u, targets[i])
+        return index
+
+    def add(self, name: str):
+        """
+        Add a location as a component of its own, if it is not already known.
+
+        Parameters
+        ----------
+        name: str
+            Location name
+        """
+        if name not in self._ids:
+            self._ids[name] = len(self._parent)
+            self._parent.append(len(self._parent))
+            self._size.append(1)
+
+    def add_route(self, start: str, end: str, duration: float):
+        """
+        Join the components of the locations at either end of a new route.
+
+        Parameters
+        ----------
+        start: str
+            Starting location name
+        end: str
+            Ending location name
+        duration: float
+            Time it takes to traverse the route
+        """
+        self.add(start)
+        self.add(end)
+        if duration != float("inf"):
+            self._union(self._ids[start], self._ids[end])
+
+    def connected(self, start: str, end: str) -> bool:
+        """
+        Whether two locations are in the same component.
+
+        Parameters
+        ----------
+        start: str
+            Starting location name
+        end: str
+            Ending location name
+
+        Returns
+        -------
+        True if a route between them may exist
+        """
+        return self._find(self._ids[start]) == self._find(self._ids[end])
+
+    def _find(self, node: int) -> int:
+        """
+        Root of a node's component, halving the path to it along the way.
+
+        Parameters
+        ----------
+        node: int
+            Node ID
+
+        Returns
+        -------
+        Node ID of the root
+        """
+        parent = self._parent
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    def _union(self, u: int, v: int):
+        """
+        Merge the components of two nodes, attaching the smaller to the larger.
+
+        Parameters
+        ----------
+        u: int
+            Node ID
+        v: int
+            Node ID
+        """
+        u, v = self._find(u), self._find(v)
+        if u == v:
+            return
+        if self._size[u] < self._size[v]:
+            u, v = v, u
+        self._parent[v] = u
+        self._size[u] += self._size[v]
@@ -0,0 +1,86 @@
+from __future__ import annotations
+import math
+import numpy as np
+from typing import Callable, TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from route_calc.graph import CompiledGraph
+
+# Mean radius of the Earth in kilometers
+EARTH_RADIUS = 6371.0088
+
+
+def haversine(
+    latitude1: float | np.ndarray,
+    longitude1: float | np.ndarray,
+    latitude2: float | np.ndarray,
+    longitude2: float | np.ndarray,
+) -> float | np.ndarray:
+    """
+    Great-circle distance between points given in degrees, in kilometers.
+    Works elementwise on NumPy arrays as well as on single values.
+
+    Parameters
+    ----------
+    latitude1: float | np.ndarray
+        Latitude of the first point
+    longitude1: float | np.ndarray
+        Longitude of the first point
+    latitude2: float | np.ndarray
+        Latitude of the second point
+    longitude2: float | np.ndarray
+        Longitude of the second point
+
+    Returns
+    -------
+    Distance in kilometers
+    """
+    phi1, phi2 = np.radians(latitude1), np.radians(latitude2)
+    dphi = phi2 - phi1
+    dlambda = np.radians(longitude2) - np.radians(longitude1)
+    a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def great_circle_heuristic(
+    graph: CompiledGraph, target: int, max_speed: float | None = None
+) -> Callable[[int], float]:
+    """
+    A* heuristic of the great-circle distance to a target divided by the maximum
+    speed.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search, with coordinates for every node
+    target: int
+        Ending node ID
+    max_speed: float | None
+        Maximum travel speed in kilometers per time unit. Defaults to the fastest
+        route in the graph.
+
+    Returns
+    -------
+    Function from a node ID to a lower bound on its duration to target
+    """
+    speed = max_speed if max_speed is not None else graph.max_speed()
+    if speed == 0 or math.isinf(speed):
+        return lambda node: 0.0
+    latitudes, longitudes = graph.latitudes, graph.longitudes
+    phi2 = math.radians(latitudes[target])
+    lambda2 = math.radians(longitudes[target])
+    cos_phi2 = math.cos(phi2)
+    # Shrink the bound slightly so rounding can never make it overestimate
+    scale = 2 * EARTH_RADIUS / speed * (1 - 1e-9)
+
+    def heuristic(node: int) -> float:
+        phi1 = math.radians(latitudes[node])
+        a = (
+            math.sin((phi2 - phi1) / 2) ** 2
+            + math.cos(phi1)
+            * cos_phi2
+            * math.sin((lambda2 - math.radians(longitudes[node])) / 2) ** 2
+        )
+        return scale * math.asin(math.sqrt(min(a, 1.0)))
+
+    return heuristic
@@ -0,0 +1,521 @@
+from __future__ import annotations
+import copy
+import hashlib
+import json
+import struct
+import numpy as np
+from route_calc.geo import haversine
+from route_calc.location import Location, LocationTable
+
+# Binary graph files start with MAGIC, the format version and the header length
+MAGIC = b"RCGRAPH\0"
+FORMAT_VERSION = 1
+_PREFIX = struct.Struct("<8sIQ")
+# Arrays in a graph file start on multiples of this many bytes
+_ALIGNMENT = 64
+
+
+class CompiledGraph:
+    """
+    A frozen, array-backed snapshot of a Map in compressed sparse row (CSR) form.
+
+    Nodes are identified by consecutive integer IDs. The neighbors of node `i` are
+    `targets[offsets[i]:offsets[i + 1]]`, reached with the matching `weights`.
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        offsets: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray,
+        latitudes: np.ndarray | None = None,
+        longitudes: np.ndarray | None = None,
+        locations: list[Location] | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        names: list[str]
+            Location name of each node, indexed by node ID
+        offsets: np.ndarray
+            Start of each node's neighbors in `targets`, of length `len(names) + 1`
+        targets: np.ndarray
+            Node ID at the end of each route
+        weights: np.ndarray
+            Duration of each route
+        latitudes: np.ndarray | None
+            Latitude of each node (NaN when unknown)
+        longitudes: np.ndarray | None
+            Longitude of each node (NaN when unknown)
+        locations: list[Location] | None
+            Location objects of each node, if the snapshot was taken from a Map
+        """
+        self.names = list(names)
+        self.index = {name: i for i, name in enumerate(self.names)}
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        if latitudes is None:
+            latitudes = np.full(len(self.names), np.nan)
+        if longitudes is None:
+            longitudes = np.full(len(self.names), np.nan)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.locations = locations
+        self._topology_lists = None
+        self._weight_list = None
+        self._max_speed = None
+        self._content_hash = None
+        self._route_ids = None
+        self._table = None
+        # Graph file the arrays are mapped from, while they match it
+        self._source = None
+
+    def __repr__(self):
+        return f"CompiledGraph of {self.n_nodes} locations and {self.n_routes} possible routes"
+
+    def __getstate__(self):
+        # A mapped graph is pickled as its path, so every process that unpickles
+        # it maps the same file and shares one copy in the page cache
+        if self._source is not None:
+            return {"_source": self._source, "_content_hash": self._content_hash}
+        # The list views are rebuilt on demand rather than pickled
+        state = self.__dict__.copy()
+        state["_topology_lists"] = None
+        state["_weight_list"] = None
+        return state
+
+    def __setstate__(self, state: dict):
+        if set(state) == {"_source", "_content_hash"}:
+            graph = CompiledGraph.load(state["_source"])
+            if graph.content_hash() != state["_content_hash"]:
+                raise ValueError(f"Graph file {state['_source']} changed on disk")
+            state = graph.__dict__
+        self.__dict__.update(state)
+
+    def __copy__(self):
+        # Unlike pickling, a shallow copy keeps the cached list views
+        graph = object.__new__(CompiledGraph)
+        graph.__dict__.update(self.__dict__)
+        return graph
+
+    def __len__(self):
+        return self.n_nodes
+
+    @property
+    def n_nodes(self) -> int:
+        """Number of nodes in the graph."""
+        return len(self.names)
+
+    @property
+    def n_routes(self) -> int:
+        """Number of directed routes in the graph."""
+        return len(self.targets)
+
+    @classmethod
+    def from_edges(
+        cls,
+        names: list[str],
+        starts: np.ndarray,
+        ends: np.ndarray,
+        weights: np.ndarray,
+        latitudes: np.ndarray | None = None,
+        longitudes: np.ndarray | None = None,
+        locations: list[Location] | None = None,
+    ) -> CompiledGraph:
+        """
+        Build a graph from parallel arrays of directed routes.
+
+        Parameters
+        ----------
+        names: list[str]
+            Location name of each node, indexed by node ID
+        starts: np.ndarray
+            Node ID at the start of each route
+        ends: np.ndarray
+            Node ID at the end of each route
+        weights: np.ndarray
+            Duration of each route
+        latitudes: np.ndarray | None
+            Latitude of each node (NaN when unknown)
+        longitudes: np.ndarray | None
+            Longitude of each node (NaN when unknown)
+        locations: list[Location] | None
+            Location objects of each node
+
+        Returns
+        -------
+        CompiledGraph object
+        """
+        starts = np.asarray(starts, dtype=np.int64)
+        # A stable sort keeps routes in insertion order within each row
+        order = np.argsort(starts, kind="stable")
+        offsets = np.zeros(len(names) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(starts, minlength=len(names)), out=offsets[1:])
+        return cls(
+            names=names,
+            offsets=offsets,
+            targets=np.asarray(ends, dtype=np.int64)[order],
+            weights=np.asarray(weights, dtype=np.float64)[order],
+            latitudes=latitudes,
+            longitudes=longitudes,
+            locations=locations,
+        )
+
+    def route_ids(self) -> tuple[np.ndarray, int]:
+        """
+        Number the undirected routes, so both directions of a route share an ID.
+
+        Returns
+        -------
+        Route ID of each entry in `targets`, ordered by (lower, higher) node ID
+        Number of undirected routes
+        """
+        if self._route_ids is None:
+            starts = np.repeat(np.arange(self.n_nodes), np.diff(self.offsets))
+            keys = np.minimum(starts, self.targets) * self.n_nodes + np.maximum(
+                starts, self.targets
+            )
+            unique, ids = np.unique(keys, return_inverse=True)
+            self._route_ids = (ids.astype(np.int64), len(unique))
+        return self._route_ids
+
+    def content_hash(self) -> str:
+        """
+        A SHA-256 digest of the graph's names, coordinates and routes, for keying
+        anything derived from it.
+
+        Returns
+        -------
+        Hexadecimal digest as a string
+        """
+        if self._content_hash is None:
+            digest = hashlib.sha256()
+            digest.update("\n".join(self.names).encode("utf-8"))
+            for array in (
+                self.latitudes,
+                self.longitudes,
+                self.offsets,
+                self.targets,
+                self.weights,
+            ):
+                digest.update(np.ascontiguousarray(array).tobytes())
+            self._content_hash = digest.hexdigest()
+        return self._content_hash
+
+    @property
+    def located(self) -> bool:
+        """Whether every node has coordinates."""
+        return not (np.isnan(self.latitudes).any() or np.isnan(self.longitudes).any())
+
+    def max_speed(self) -> float:
+        """
+        The fastest great-circle speed over any route, in kilometers per time unit.
+        Dividing a great-circle distance by this speed never overestimates the
+        duration, which makes it an admissible A* heuristic.
+
+        Returns
+        -------
+        Maximum speed as a float (NaN if any node lacks coordinates)
+        """
+        if self._max_speed is None:
+            starts = np.repeat(np.arange(self.n_nodes), np.diff(self.offsets))
+            distances = haversine(
+                self.latitudes[starts],
+                self.longitudes[starts],
+                self.latitudes[self.targets],
+                self.longitudes[self.targets],
+            )
+            with np.errstate(divide="ignore", invalid="ignore"):
+                speeds = distances / self.weights
+            # Zero-duration routes between distinct points allow unbounded speed
+            speeds[(self.weights == 0) & (distances > 0)] = np.inf
+            speeds[np.isnan(speeds) & ~np.isnan(distances)] = 0.0
+            self._max_speed = float(speeds.max(initial=0.0))
+        return self._max_speed
+
+    def with_weights(self, weights: np.ndarray) -> CompiledGraph:
+        """
+        A graph with the same locations and routes but different durations.
+        Everything except the durations is shared with this graph, not copied.
+
+        Parameters
+        ----------
+        weights: np.ndarray
+            Duration of each route, aligned with `weights`
+
+        Returns
+        -------
+        CompiledGraph object
+        """
+        weights = np.asarray(weights, dtype=np.float64)
+        if weights.shape != self.weights.shape:
+            raise ValueError(
+                f"Expected {self.n_routes} route durations, got {weights.shape}"
+            )
+        # Build the shared list views once so every overlay can reuse them
+        self._topology()
+        graph = copy.copy(self)
+        graph.weights = weights
+        graph._weight_list = None
+        graph._max_speed = None
+        graph._content_hash = None
+        graph._source = None
+        return graph
+
+    def update_weight(self, start: int, end: int, duration: float):
+        """
+        Change the duration of a route in place, in both directions.
+        NOTE: Overlays from with_weights keep their own durations.
+
+        Parameters
+        ----------
+        start: int
+            Node ID at one end of the route
+        end: int
+            Node ID at the other end of the route
+        duration: float
+            New duration of the route
+        """
+        for a, b in ((start, end), (end, start)):
+            lo, hi = self.offsets[a], self.offsets[a + 1]
+            for i in lo + np.flatnonzero(self.targets[lo:hi] == b):
+                self.weights[i] = duration
+                if self._weight_list is not None:
+                    self._weight_list[i] = duration
+        self._max_speed = None
+        self._content_hash = None
+        self._source = None
+
+    def save(self, path: str, **metadata):
+        """
+        Save the graph to a binary file that CompiledGraph.load can memory-map.
+
+        The file holds a fixed prefix (MAGIC, FORMAT_VERSION and the header
+        length), a JSON header with the content hash, array layout and any
+        metadata, then the raw arrays, each aligned for zero-copy mapping.
+
+        Parameters
+        ----------
+        path: str
+            Path to the file
+        **metadata
+            JSON-serializable values to store in the header, such as time units
+        """
+        if any("\0" in name for name in self.names):
+            raise ValueError("Location names cannot contain null characters")
+        arrays = {
+            "names": np.frombuffer("\0".join(self.names).encode("utf-8"), np.uint8),
+            "latitudes": self.latitudes,
+            "longitudes": self.longitudes,
+            "offsets": self.offsets,
+            "targets": self.targets,
+            "weights": self.weights,
+        }
+        # Lay the arrays out after the header, padding each to the alignment
+        layout, position = {}, 0
+        for name, array in arrays.items():
+            layout[name] = [position, array.dtype.str, len(array)]
+            position += -(-array.nbytes // _ALIGNMENT) * _ALIGNMENT
+        header = {
+            "n_nodes": self.n_nodes,
+            "n_routes": self.n_routes,
+            "content_hash": self.content_hash(),
+            "arrays": layout,
+            "metadata": metadata,
+        }
+        encoded = json.dumps(header).encode("utf-8")
+        start = -(-(_PREFIX.size + len(encoded)) // _ALIGNMENT) * _ALIGNMENT
+        encoded = encoded.ljust(start - _PREFIX.size)
+
+        with open(path, "wb") as f:
+            f.write(_PREFIX.pack(MAGIC, FORMAT_VERSION, len(encoded)))
+            f.write(encoded)
+            for name, array in arrays.items():
+                f.seek(start + layout[name][0])
+                np.ascontiguousarray(array).tofile(f)
+            f.truncate(start + position)
+
+    @staticmethod
+    def read_header(path: str) -> dict:
+        """
+        Read the header of a graph file without loading any arrays.
+
+        Parameters
+        ----------
+        path: str
+            Path to the file
+
+        Returns
+        -------
+        Header as a dictionary, including "content_hash" and "metadata"
+        """
+        with open(path, "rb") as f:
+            prefix = f.read(_PREFIX.size)
+            if len(prefix) < _PREFIX.size or prefix[: len(MAGIC)] != MAGIC:
+                raise ValueError(f"{path} is not a graph file")
+            _, version, length = _PREFIX.unpack(prefix)
+            if version > FORMAT_VERSION:
+                raise ValueError(
+                    f"{path} has format version {version}, newer than {FORMAT_VERSION}"
+                )
+            header = json.loads(f.read(length))
+        header["format_version"] = version
+        header["data_offset"] = _PREFIX.size + length
+        return header
+
+    @classmethod
+    def load(cls, path: str, mmap: bool = True) -> CompiledGraph:
+        """
+        Load a graph saved by CompiledGraph.save.
+
+        Parameters
+        ----------
+        path: str
+            Path to the file
+        mmap: bool
+            Map the arrays from the file instead of reading them into memory.
+            Mapped arrays are copy-on-write, so changing the graph never changes
+            the file, and processes mapping one file share its pages. Searches
+            read mapped arrays in place rather than copying them into lists.
+
+        Returns
+        -------
+        CompiledGraph object
+        """
+        header = cls.read_header(path)
+        arrays = {}
+        for name, (position, dtype, count) in header["arrays"].items():
+            offset = header["data_offset"] + position
+            if not count:
+                arrays[name] = np.zeros(0, dtype=dtype)
+            elif mmap:
+                arrays[name] = np.memmap(
+                    path, dtype=dtype, mode="c", offset=offset, shape=(count,)
+                )
+            else:
+                arrays[name] = np.fromfile(
+                    path, dtype=dtype, count=count, offset=offset
+                )
+        names = arrays.pop("names").tobytes().decode("utf-8")
+        graph = cls(names=names.split("\0") if header["n_nodes"] else [], **arrays)
+        # The stored hash saves rehashing every array
+        graph._content_hash = header["content_hash"]
+        if mmap:
+            graph._source = str(path)
+        return graph
+
+    @property
+    def table(self) -> LocationTable:
+        """The names and coordinates as a LocationTable sharing this graph's arrays."""
+        if self._table is None:
+            self._table = LocationTable(self.names, self.latitudes, self.longitudes)
+            self._table._index = self.index
+        return self._table
+
+    def location(self, node: int) -> Location:
+        """
+        Get the Location of a node.
+
+        Parameters
+        ----------
+        node: int
+            Node ID
+
+        Returns
+        -------
+        Location object
+        """
+        if self.locations is not None:
+            return self.locations[node]
+        return self.table[node]
+
+    def neighbors(self, node: int) -> list[tuple[int, float]]:
+        """
+        Get the routes leaving a node.
+
+        Parameters
+        ----------
+        node: int
+            Node ID
+
+        Returns
+        -------
+        List of (node ID, duration) tuples
+        """
+        offsets, targets, weights = self.as_lists()
+        lo, hi = offsets[node], offsets[node + 1]
+        return list(zip(targets[lo:hi], weights[lo:hi]))
+
+    def as_lists(self) -> tuple[list, list, list]:
+        """
+        The CSR arrays as Python lists, for the pure-Python search loops.
+        NOTE: Indexing a list is several times faster than indexing a NumPy array
+        element by element, so the lists are built once and cached. Arrays mapped
+        from a file are wrapped instead of copied, which is slower to index but
+        keeps their pages shared between processes.
+
+        Returns
+        -------
+        Offsets, targets and weights as lists
+        """
+        if _is_mapped(self.weights):
+            return (*self._topology(), _MappedList(self.weights))
+        if self._weight_list is None:
+            self._weight_list = self.weights.tolist()
+        return (*self._topology(), self._weight_list)
+
+    def _topology(self) -> tuple[list, list]:
+        """
+        The offsets and targets as Python lists, or as wrappers of mapped arrays.
+
+        Returns
+        -------
+        Offsets and targets
+        """
+        if _is_mapped(self.targets):
+            return _MappedList(self.offsets), _MappedList(self.targets)
+        if self._topology_lists is None:
+            self._topology_lists = (self.offsets.tolist(), self.targets.tolist())
+        return self._topology_lists
+
+
+def _is_mapped(array: np.ndarray) -> bool:
+    """
+    Whether an array is a view of a memory-mapped file.
+
+    Parameters
+    ----------
+    array: np.ndarray
+        Array to check
+
+    Returns
+    -------
+    True if the array or any array it views is a numpy.memmap
+    """
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+        array = array.base
+    return False
+
+
+class _MappedList:
+    """
+    Read-only list interface to a memory-mapped array, returning Python scalars
+    without copying the array out of the shared page cache.
+    """
+
+    __slots__ = ("_array",)
+
+    def __init__(self, array: np.ndarray):
+        self._array = array.view(np.ndarray)
+
+    def __len__(self):
+        return len(self._array)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return self._array[i].tolist()
+        return self._array.item(i)
@@ -0,0 +1,340 @@
+from __future__ import annotations
+import heapq
+import numpy as np
+from route_calc.graph import CompiledGraph
+
+# Marks an upward route that is an original route rather than a shortcut
+ORIGINAL = -1
+
+
+class ContractionHierarchy:
+    """
+    A contraction hierarchy over a compiled graph for fast point-to-point queries.
+
+    Nodes are contracted one at a time in order of importance, adding shortcut
+    routes that preserve shortest durations between the remaining nodes. A query
+    then only searches upward in the order from both ends.
+    NOTE: Assumes every route is stored in both directions with the same duration,
+    so one upward graph serves the forward and backward searches.
+    """
+
+    def __init__(
+        self,
+        rank: np.ndarray,
+        offsets: np.ndarray,
+        targets: np.ndarray,
+        weights: np.ndarray,
+        middles: np.ndarray,
+        graph_hash: str = "",
+    ):
+        """
+        Parameters
+        ----------
+        rank: np.ndarray
+            Contraction order of each node
+        offsets: np.ndarray
+            Start of each node's upward routes in `targets`
+        targets: np.ndarray
+            Higher-ranked node ID at the end of each upward route
+        weights: np.ndarray
+            Duration of each upward route
+        middles: np.ndarray
+            Node ID a shortcut bypasses, or ORIGINAL for an original route
+        graph_hash: str
+            Content hash of the graph the hierarchy was built from
+        """
+        self.rank = np.asarray(rank, dtype=np.int64)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.targets = np.asarray(targets, dtype=np.int64)
+        self.weights = np.asarray(weights, dtype=np.float64)
+        self.middles = np.asarray(middles, dtype=np.int64)
+        self.graph_hash = graph_hash
+        self._lists = None
+
+    def __repr__(self):
+        return f"ContractionHierarchy of {len(self.rank)} locations and {self.n_shortcuts} shortcuts"
+
+    @property
+    def n_shortcuts(self) -> int:
+        """Number of shortcut routes added by contraction."""
+        return int((self.middles != ORIGINAL).sum())
+
+    @classmethod
+    def build(
+        cls, graph: CompiledGraph, settle_limit: int = 64
+    ) -> ContractionHierarchy:
+        """
+        Contract every node of a graph, ordered by edge difference.
+
+        Parameters
+        ----------
+        graph: CompiledGraph
+            Graph to preprocess
+        settle_limit: int
+            Maximum number of nodes each witness search may settle. Lower values
+            preprocess faster but may add unnecessary shortcuts.
+
+        Returns
+        -------
+        ContractionHierarchy object
+        """
+        n = graph.n_nodes
+        offsets, targets, weights = graph.as_lists()
+
+        # Remaining graph as {neighbor: (duration, middle)} per node, keeping only
+        # the shortest finite route between each pair
+        adjacency = [{} for _ in range(n)]
+        for u in range(n):
+            for i in range(offsets[u], offsets[u + 1]):
+                v, w = targets[i], weights[i]
+                if v != u and w < adjacency[u].get(v, (float("inf"),))[0]:
+                    adjacency[u][v] = adjacency[v][u] = (w, ORIGINAL)
+        deleted = [0] * n
+
+        def witnesses(source: int, excluded: int, limit: float) -> dict:
+            # Local Dijkstra that avoids the node being contracted
+            distances = {source: 0.0}
+            pq = [(0.0, source)]
+            settled = 0
+            while pq and settled < settle_limit:
+                curr_time, curr_node = heapq.heappop(pq)
+                if curr_time > distances[curr_node]:
+                    continue
+                if curr_time > limit:
+                    break
+                settled += 1
+                for neighbor, (weight, _) in adjacency[curr_node].items():
+                    total_time = curr_time + weight
+                    if neighbor != excluded and total_time < distances.get(
+                        neighbor, float("inf")
+                    ):
+                        distances[neighbor] = total_time
+                        heapq.heappush(pq, (total_time, neighbor))
+            return distances
+
+        def shortcuts(v: int) -> list[tuple[int, int, float]]:
+            # Shortcuts needed between each pair of neighbors without a witness
+            neighbors = list(adjacency[v].items())
+            needed = []
+            for i, (u, (weight_u, _)) in enumerate(neighbors[:-1]):
+                others = neighbors[i + 1 :]
+                limit = weight_u + max(weight for _, (weight, _) in others)
+                distances = witnesses(u, v, limit)
+                for x, (weight_x, _) in others:
+                    via = weight_u + weight_x
+                    if distances.get(x, float("inf")) > via:
+                        needed.append((u, x, via))
+            return needed
+
+        def priority(v: int) -> tuple[int, list]:
+            needed = shortcuts(v)
+            return len(needed) - len(adjacency[v]) + deleted[v], needed
+
+        pq = [(priority(v)[0], v) for v in range(n)]
+        heapq.heapify(pq)
+        rank = np.zeros(n, dtype=np.int64)
+        upward = [[] for _ in range(n)]
+        order = 0
+        while pq:
+            _, v = heapq.heappop(pq)
+            # Lazy update: reinsert if the node became less attractive
+            current, needed = priority(v)
+            if pq and current > pq[0][0]:
+                heapq.heappush(pq, (current, v))
+                continue
+
+            for u, x, via in needed:
+                if via < adjacency[u].get(x, (float("inf"),))[0]:
+                    adjacency[u][x] = adjacency[x][u] = (via, v)
+            # Routes to the remaining neighbors all lead upward
+            upward[v] = [(u, w, m) for u, (w, m) in adjacency[v].items()]
+            for u in adjacency[v]:
+                del adjacency[u][v]
+                deleted[u] += 1
+            adjacency[v] = {}
+            rank[v] = order
+            order += 1
+
+        up_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum([len(r) for r in upward], out=up_offsets[1:])
+        return cls(
+            rank=rank,
+            offsets=up_offsets,
+            targets=[u for r in upward for u, _, _ in r],
+            weights=[w for r in upward for _, w, _ in r],
+            middles=[m for r in upward for _, _, m in r],
+            graph_hash=graph.content_hash(),
+        )
+
+    def query(self, source: int, target: int) -> tuple[float, list[int], int]:
+        """
+        Bidirectional upward search for the minimum duration route.
+
+        Parameters
+        ----------
+        source: int
+            Starting node ID
+        target: int
+            Ending node ID
+
+        Returns
+        -------
+        Minimum duration from source to target as a float (inf if unreachable)
+        List of node IDs from source to target, empty if unreachable
+        Number of nodes settled by both searches
+        """
+        if source == target:
+            return 0.0, [source], 1
+        offsets, targets, weights, _ = self._as_lists()
+        distances = ({source: 0.0}, {target: 0.0})
+        prev = ({source: None}, {target: None})
+        pqs = ([(0.0, source)], [(0.0, target)])
+        best, meeting = float("inf"), None
+        settled = 0
+
+        while pqs[0] or pqs[1]:
+            if not pqs[1] or (pqs[0] and pqs[0][0][0] <= pqs[1][0][0]):
+                side = 0
+            else:
+                side = 1
+            curr_time, curr_node = heapq.heappop(pqs[side])
+            dist = distances[side]
+            if curr_time > dist[curr_node]:
+                continue
+            # Nothing left on this side can improve the best route
+            if curr_time >= best:
+                pqs[side].clear()
+                continue
+            settled += 1
+
+            other = distances[1 - side]
+            if curr_node in other and curr_time + other[curr_node] < best:
+                best = curr_time + other[curr_node]
+                meeting = curr_node
+            for i in range(offsets[curr_node], offsets[curr_node + 1]):
+                neighbor = targets[i]
+                total_time = curr_time + weights[i]
+                if total_time < dist.get(neighbor, float("inf")):
+                    dist[neighbor] = total_time
+                    prev[side][neighbor] = curr_node
+                    heapq.heappush(pqs[side], (total_time, neighbor))
+
+        if meeting is None:
+            return float("inf"), [], settled
+
+        # Walk both searches back from the meeting point, then expand shortcuts
+        nodes = []
+        cur = meeting
+        while cur is not None:
+            nodes.append(cur)
+            cur = prev[0][cur]
+        nodes.reverse()
+        cur = prev[1][meeting]
+        while cur is not None:
+            nodes.append(cur)
+            cur = prev[1][cur]
+        path = [source]
+        for a, b in zip(nodes, nodes[1:]):
+            path.extend(self._unpack(a, b))
+        return best, path, settled
+
+    def _unpack(self, a: int, b: int) -> list[int]:
+        """
+        Expand a route of the hierarchy into original routes.
+
+        Parameters
+        ----------
+        a: int
+            Starting node ID
+        b: int
+            Ending node ID
+
+        Returns
+        -------
+        List of node IDs after a, up to and including b
+        """
+        offsets, targets, _, middles = self._as_lists()
+        rank = self.rank
+        path = []
+        stack = [(a, b)]
+        while stack:
+            x, y = stack.pop()
+            # Each route is stored once, leaving its lower-ranked end
+            low, high = (x, y) if rank[x] < rank[y] else (y, x)
+            for i in range(offsets[low], offsets[low + 1]):
+                if targets[i] == high:
+                    middle = middles[i]
+                    break
+            if middle == ORIGINAL:
+                path.append(y)
+            else:
+                stack.append((middle, y))
+                stack.append((x, middle))
+        return path
+
+    def _as_lists(self) -> tuple[list, list, list, list]:
+        """
+        The upward CSR arrays as Python lists, for the pure-Python search loop.
+
+        Returns
+        -------
+        Offsets, targets, weights and middles as lists
+        """
+        if self._lists is None:
+            self._lists = (
+                self.offsets.tolist(),
+                self.targets.tolist(),
+                self.weights.tolist(),
+                self.middles.tolist(),
+            )
+        return self._lists
+
+    def save(self, path: str):
+        """
+        Save the hierarchy to a .npz file.
+
+        Parameters
+        ----------
+        path: str
+            Path to the file
+        """
+        np.savez(
+            path,
+            rank=self.rank,
+            offsets=self.offsets,
+            targets=self.targets,
+            weights=self.weights,
+            middles=self.middles,
+            graph_hash=np.array(self.graph_hash),
+        )
+
+    @classmethod
+    def load(
+        cls, path: str, graph: CompiledGraph | None = None
+    ) -> ContractionHierarchy:
+        """
+        Load a hierarchy from a .npz file.
+
+        Parameters
+        ----------
+        path: str
+            Path to the file
+        graph: CompiledGraph | None
+            If given, the graph the hierarchy must have been built from
+
+        Returns
+        -------
+        ContractionHierarchy object
+        """
+        with np.load(path) as data:
+            hierarchy = cls(
+                rank=data["rank"],
+                offsets=data["offsets"],
+                targets=data["targets"],
+                weights=data["weights"],
+                middles=data["middles"],
+                graph_hash=str(data["graph_hash"]),
+            )
+        if graph is not None and hierarchy.graph_hash != graph.content_hash():
+            raise ValueError(f"Contraction hierarchy {path} was built from another map")
+        return hierarchy
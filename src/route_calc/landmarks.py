@@ -0,0 +1,112 @@
+from __future__ import annotations
+import numpy as np
+from typing import Callable
+from route_calc.graph import CompiledGraph
+from route_calc.matrix import dijkstra_rows
+
+
+class LandmarkIndex:
+    """
+    Precomputed durations from a few landmark nodes, giving A* lower bounds by the
+    triangle inequality (the ALT algorithm). Unlike a great-circle heuristic, it
+    needs no coordinates.
+    NOTE: Assumes every route is stored in both directions with the same duration.
+    """
+
+    def __init__(self, landmarks: np.ndarray, distances: np.ndarray):
+        """
+        Parameters
+        ----------
+        landmarks: np.ndarray
+            Node ID of each landmark
+        distances: np.ndarray
+            Minimum durations indexed by [landmark, node ID]
+        """
+        self.landmarks = np.asarray(landmarks, dtype=np.int64)
+        self.distances = np.asarray(distances, dtype=np.float64)
+        self._rows = None
+
+    def __repr__(self):
+        return f"LandmarkIndex of {len(self.landmarks)} landmarks"
+
+    @classmethod
+    def build(cls, graph: CompiledGraph, k: int = 8, seed: int = 0) -> LandmarkIndex:
+        """
+        Choose landmarks by farthest-point selection and precompute their durations.
+
+        Parameters
+        ----------
+        graph: CompiledGraph
+            Graph to index
+        k: int
+            Number of landmarks
+        seed: int
+            Seed for choosing the node the selection starts from
+
+        Returns
+        -------
+        LandmarkIndex object
+        """
+        k = min(k, graph.n_nodes)
+        distances = np.empty((k, graph.n_nodes))
+        # Nearest landmark duration of every node, where unreachable counts as farthest
+        nearest = dijkstra_rows(
+            graph, [np.random.default_rng(seed).integers(graph.n_nodes)]
+        )[0]
+        landmarks = []
+        for i in range(k):
+            landmark = int(np.argmax(nearest))
+            landmarks.append(landmark)
+            distances[i] = dijkstra_rows(graph, [landmark])[0]
+            nearest = np.minimum(nearest, distances[i]) if i else distances[i].copy()
+            nearest[landmarks] = -1.0
+        return cls(landmarks=landmarks, distances=distances)
+
+    def lower_bound(self, source: int, target: int) -> float:
+        """
+        Lower bound on the minimum duration between two nodes.
+
+        Parameters
+        ----------
+        source: int
+            Starting node ID
+        target: int
+            Ending node ID
+
+        Returns
+        -------
+        Lower bound as a float (inf if the nodes are provably disconnected)
+        """
+        return self.heuristic(target)(source)
+
+    def heuristic(self, target: int) -> Callable[[int], float]:
+        """
+        A* heuristic towards a target, the largest triangle-inequality bound over
+        all landmarks.
+
+        Parameters
+        ----------
+        target: int
+            Ending node ID
+
+        Returns
+        -------
+        Function from a node ID to a lower bound on its duration to target
+        """
+        if self._rows is None:
+            self._rows = self.distances.tolist()
+        inf = float("inf")
+        rows = [(row, row[target]) for row in self._rows]
+
+        def heuristic(node: int) -> float:
+            bound = 0.0
+            for row, to_target in rows:
+                to_node = row[node]
+                # A landmark reaching exactly one of the two nodes separates them
+                if (to_node == inf) != (to_target == inf):
+                    return inf
+                if to_node != inf and abs(to_target - to_node) > bound:
+                    bound = abs(to_target - to_node)
+            return bound
+
+        return heuristic
@@ -1,7 +1,12 @@
 from __future__ import annotations
+import numpy as np
+from typing import Iterable, Iterator
 
 
 class Location:
+    # Slots instead of an instance dictionary keep large maps small
+    __slots__ = ("name", "latitude", "longitude")
+
     def __init__(
         self, name: str, latitude: float | None = None, longitude: float | None = None
     ):
@@ -15,7 +20,11 @@ class Location:
     def __eq__(self, other: Location | str):
         # If other is a Location object, require all attributes to match
         if isinstance(other, Location):
-            return vars(self) == vars(other)
+            return other is self or (
+                self.name == other.name
+                and self.latitude == other.latitude
+                and self.longitude == other.longitude
+            )
         # If other is just a string, match it to the name
         elif isinstance(other, str):
             return self.name == other
@@ -25,3 +34,133 @@ class Location:
 
     def __hash__(self):
         return hash(self.name)
+
+
+class LocationTable:
+    """
+    Locations stored as parallel arrays of names and coordinates, handing out
+    lightweight LocationView objects instead of holding one Location per node.
+    """
+
+    def __init__(
+        self,
+        names: list[str],
+        latitudes: np.ndarray | None = None,
+        longitudes: np.ndarray | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        names: list[str]
+            Name of each location
+        latitudes: np.ndarray | None
+            Latitude of each location (NaN when unknown)
+        longitudes: np.ndarray | None
+            Longitude of each location (NaN when unknown)
+        """
+        self.names = names
+        if latitudes is None:
+            latitudes = np.full(len(names), np.nan)
+        if longitudes is None:
+            longitudes = np.full(len(names), np.nan)
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        if not len(self.names) == len(self.latitudes) == len(self.longitudes):
+            raise ValueError("Expected one name, latitude and longitude per location")
+        self._index = None
+
+    def __repr__(self):
+        return f"LocationTable of {len(self)} locations"
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, i: int) -> LocationView:
+        if not -len(self) <= i < len(self):
+            raise IndexError(f"Location {i} out of range")
+        return LocationView(self, i % len(self))
+
+    def __iter__(self) -> Iterator[LocationView]:
+        return (LocationView(self, i) for i in range(len(self)))
+
+    @classmethod
+    def from_locations(cls, locations: Iterable[Location]) -> LocationTable:
+        """
+        Copy Location objects into a table.
+
+        Parameters
+        ----------
+        locations: Iterable[Location]
+            Locations to store
+
+        Returns
+        -------
+        LocationTable object
+        """
+        locations = list(locations)
+        return cls(
+            names=[l.name for l in locations],
+            latitudes=[np.nan if l.latitude is None else l.latitude for l in locations],
+            longitudes=[
+                np.nan if l.longitude is None else l.longitude for l in locations
+            ],
+        )
+
+    def index(self, name: str) -> int:
+        """
+        Position of a location by name, in constant time after the first call.
+
+        Parameters
+        ----------
+        name: str
+            Location name
+
+        Returns
+        -------
+        Position as an integer
+        """
+        if self._index is None:
+            self._index = {name: i for i, name in enumerate(self.names)}
+        try:
+            return self._index[name]
+        except KeyError:
+            raise KeyError(f"Location {name} not in table") from None
+
+
+class LocationView(Location):
+    """
+    A Location backed by one row of a LocationTable. It behaves like a Location
+    but reads its attributes from the table's arrays.
+    """
+
+    __slots__ = ("table", "position")
+
+    def __init__(self, table: LocationTable, position: int):
+        """
+        Parameters
+        ----------
+        table: LocationTable
+            Table holding the location
+        position: int
+            Position of the location in the table
+        """
+        self.table = table
+        self.position = position
+
+    def __reduce__(self):
+        # Unpickle as a plain Location rather than pickling the whole table
+        return Location, (self.name, self.latitude, self.longitude)
+
+    @property
+    def name(self) -> str:
+        return self.table.names[self.position]
+
+    @property
+    def latitude(self) -> float | None:
+        latitude = float(self.table.latitudes[self.position])
+        return None if np.isnan(latitude) else latitude
+
+    @property
+    def longitude(self) -> float | None:
+        longitude = float(self.table.longitudes[self.position])
+        return None if np.isnan(longitude) else longitude
@@ -1,6 +1,33 @@
 from __future__ import annotations
-import heapq
+import numpy as np
+from collections import OrderedDict
+from itertools import chain
+from typing import Iterable
 from route_calc.location import Location
+from route_calc.graph import CompiledGraph
+from route_calc.components import ComponentIndex
+from route_calc.geo import great_circle_heuristic
+from route_calc.hierarchy import ContractionHierarchy
+from route_calc.landmarks import LandmarkIndex
+from route_calc.matrix import distance_matrix
+from route_calc.parallel import map_over_graph
+from route_calc.profiles import (
+    DAY_LENGTHS,
+    ProfilePool,
+    arrival_profile,
+    time_dependent_dijkstra,
+)
+from route_calc.spatial import SpatialIndex
+from route_calc.search import (
+    Route,
+    ShortestPathTree,
+    astar,
+    bidirectional,
+    k_shortest_paths,
+    reachable_within,
+    settle_targets,
+    voronoi,
+)
 
 
 class Map:
@@ -8,7 +35,13 @@ class Map:
     An abstracted geographical map as an adjacency list.
     """
 
-    def __init__(self, time_units: str = "minutes", verbose: bool = False):
+    def __init__(
+        self,
+        time_units: str = "minutes",
+        verbose: bool = False,
+        cache_size: int = 16,
+        max_speed: float | None = None,
+    ):
         """
         Parameters
         ----------
@@ -16,12 +49,37 @@ class Map:
             The units to use for tracking the route durations
         verbose: bool
             Toggles verbosity of print statements
+        cache_size: int
+            Maximum number of shortest-path trees to keep, one per source location
+        max_speed: float | None
+            Maximum travel speed in kilometers per time unit, used by A* search.
+            Must not be exceeded by any route. If None, it is taken from the
+            fastest route in the map.
         """
         self.time_units = time_units
         self.verbose = verbose
-        self._adjacency_list = {}
+        self.cache_size = cache_size
+        self.max_speed = max_speed
+        self._adjacency = {}
+        self._locations = {}
+        self._compiled = None
+        self._version = 0
+        self._trees = OrderedDict()
+        self._trees_version = 0
+        self._hierarchy = None
+        self._landmarks = None
+        self._landmarks_version = 0
+        self._spatial = None
+        self._spatial_version = 0
+        self._pool = None
+        self._profiles = {}
+        self._route_profiles = None
+        self._route_profiles_version = 0
+        self._components = None
 
     def __repr__(self):
+        if self._adjacency is None:
+            return f"Map of {self._compiled.n_nodes} locations and {self._compiled.n_routes} possible routes"
         return f"Map of {len(self._adjacency_list)} locations and {sum([len(r.values()) for r in self._adjacency_list.values()])} possible routes"
 
     def __eq__(self, other: Map):
@@ -31,6 +89,67 @@ class Map:
             f"Cannot establish equality between Map and {type(other)} objects"
         )
 
+    @property
+    def _adjacency_list(self) -> dict:
+        """The routes as {start: {end: duration}}, built on first use for a loaded map."""
+        if self._adjacency is None:
+            graph = self._compiled
+            offsets, targets, weights = graph.as_lists()
+            locations = [graph.location(i) for i in range(graph.n_nodes)]
+            self._adjacency = {
+                location: {
+                    locations[targets[i]]: weights[i]
+                    for i in range(offsets[u], offsets[u + 1])
+                }
+                for u, location in enumerate(locations)
+            }
+            self._locations = {location.name: location for location in locations}
+            graph.locations = locations
+        return self._adjacency
+
+    @classmethod
+    def load(cls, path: str, verbose: bool = False, cache_size: int = 16) -> Map:
+        """
+        Load a map saved by Map.save. The routes are memory-mapped from the file,
+        and Python objects for them are only built if the map is modified.
+
+        Parameters
+        ----------
+        path: str
+            Path to the file
+        verbose: bool
+            Toggles verbosity of print statements
+        cache_size: int
+            Maximum number of shortest-path trees to keep, one per source location
+
+        Returns
+        -------
+        Map object
+        """
+        metadata = CompiledGraph.read_header(path)["metadata"]
+        loaded = cls(
+            time_units=metadata.get("time_units", "minutes"),
+            verbose=verbose,
+            cache_size=cache_size,
+            max_speed=metadata.get("max_speed"),
+        )
+        loaded._adjacency = None
+        loaded._locations = None
+        loaded._compiled = CompiledGraph.load(path)
+        return loaded
+
+    def save(self, path: str):
+        """
+        Save the map to a binary file for fast loading with Map.load.
+        NOTE: Profiles from Map.set_profile are not saved.
+
+        Parameters
+        ----------
+        path: str
+            Path to the file
+        """
+        self.compile().save(path, time_units=self.time_units, max_speed=self.max_speed)
+
     def add_route(self, start: Location, end: Location, duration: float = 0.0):
         """
         Add a route to the map.
@@ -50,103 +169,909 @@ class Map:
             if self.verbose:
                 print(f"Starting location {start} not in map. Adding...")
             self._adjacency_list[start] = {}
+            self._locations[start.name] = start
         # Adds end location to adjacency list
         if end not in self._adjacency_list:
             if self.verbose:
                 print(f"Ending location {end} not in map. Adding...")
             self._adjacency_list[end] = {}
+            self._locations[end.name] = end
         # Adds duration to adjacency list
+        previous = self._adjacency_list[start].get(end)
         self._adjacency_list[start][end] = duration
         self._adjacency_list[end][start] = duration
+        self._update_components(start.name, end.name, previous, duration)
+        # Any compiled snapshot or cached search is now out of date
+        self._version += 1
+        self._compiled = None
 
-    def calculate_duration(self, start: Location | str, end: Location | str) -> float:
+    def add_routes(
+        self,
+        routes: Iterable[tuple] | None = None,
+        starts: np.ndarray | list | None = None,
+        ends: np.ndarray | list | None = None,
+        durations: np.ndarray | list | None = None,
+        duplicates: str = "last",
+    ):
         """
-        Calculates the minimum duration required for a route using Dijkstra's algorithm.
+        Add many routes to the map at once, invalidating cached searches only once.
+        Give either routes, or starts, ends and durations as parallel arrays.
+        NOTE: Assumes each duration is the same to and from the starting location.
+
+        Parameters
+        ----------
+        routes: Iterable[tuple] | None
+            (start, end, duration) tuples, with locations or location names
+        starts: np.ndarray | list | None
+            Starting location or location name of each route
+        ends: np.ndarray | list | None
+            Ending location or location name of each route
+        durations: np.ndarray | list | None
+            Duration of each route
+        duplicates: str
+            What to do with a route given more than once or already in the map:
+            "last" keeps the latest duration, "min" keeps the shortest, and
+            "error" raises a ValueError without adding any route
+        """
+        if duplicates not in ("last", "min", "error"):
+            raise ValueError(f"Unknown duplicate policy {duplicates}")
+        arrays = (starts, ends, durations)
+        if routes is None and all(array is not None for array in arrays):
+            starts, ends = np.asarray(starts).tolist(), np.asarray(ends).tolist()
+        elif routes is not None and all(array is None for array in arrays):
+            starts, ends, durations = [list(c) for c in zip(*routes)] or ([], [], [])
+        else:
+            raise ValueError("Expected either routes or starts, ends and durations")
+        durations = np.asarray(durations, dtype=np.float64)
+        if not len(starts) == len(ends) == len(durations):
+            raise ValueError("Expected one start, end and duration per route")
+        if not len(durations):
+            return
+        adjacency, locations = self._adjacency_list, self._locations
+
+        # Number the distinct locations, matching names to existing locations
+        unique = list(dict.fromkeys(chain(starts, ends)))
+        ids = {location: i for i, location in enumerate(unique)}
+        unique = [
+            (
+                location
+                if isinstance(location, Location)
+                else locations.get(location) or Location(name=location)
+            )
+            for location in unique
+        ]
+        start_ids = np.fromiter(map(ids.__getitem__, starts), np.int64, len(starts))
+        end_ids = np.fromiter(map(ids.__getitem__, ends), np.int64, len(ends))
+
+        # Resolve repeats within the batch on arrays, in either direction
+        keys = np.minimum(start_ids, end_ids) * len(unique) + np.maximum(
+            start_ids, end_ids
+        )
+        if duplicates == "min":
+            order = np.lexsort((durations, keys))
+            keep = np.sort(order[np.unique(keys[order], return_index=True)[1]])
+        else:
+            last = np.unique(keys[::-1], return_index=True)[1]
+            keep = np.sort(len(keys) - 1 - last)
+        repeated = len(keys) - len(keep)
+        if duplicates == "error" and repeated:
+            first = np.unique(keys, return_index=True)[1]
+            i = np.setdiff1d(np.arange(len(keys)), first)[0]
+            raise ValueError(f"Duplicate route between {starts[i]} and {ends[i]}")
+        start_ids, end_ids = start_ids[keep], end_ids[keep]
+        durations = durations[keep]
+
+        # Check routes already in the map before changing anything
+        previous = [None] * len(durations)
+        if adjacency:
+            for i, (start, end) in enumerate(zip(start_ids.tolist(), end_ids.tolist())):
+                previous[i] = adjacency.get(unique[start], {}).get(unique[end])
+                if previous[i] is None:
+                    continue
+                repeated += 1
+                if duplicates == "error":
+                    raise ValueError(
+                        f"Duplicate route between {unique[start]} and {unique[end]}"
+                    )
+                if duplicates == "min" and previous[i] < durations[i]:
+                    durations[i] = previous[i]
+
+        count = len(adjacency)
+        for location in unique:
+            if location not in adjacency:
+                adjacency[location] = {}
+                locations[location.name] = location
+        # Group both directions of every route by start, so each location's routes
+        # are inserted with one dictionary update
+        sources = np.concatenate([start_ids, end_ids])
+        order = np.argsort(sources, kind="stable")
+        bounds = np.cumsum(np.bincount(sources, minlength=len(unique))).tolist()
+        targets = [
+            unique[i] for i in np.concatenate([end_ids, start_ids])[order].tolist()
+        ]
+        weights = np.concatenate([durations, durations])[order].tolist()
+        lo = 0
+        for location, hi in zip(unique, bounds):
+            if hi > lo:
+                adjacency[location].update(zip(targets[lo:hi], weights[lo:hi]))
+            lo = hi
+        for start, end, old, new in zip(
+            start_ids.tolist(), end_ids.tolist(), previous, durations.tolist()
+        ):
+            self._update_components(unique[start].name, unique[end].name, old, new)
+        if self.verbose:
+            print(
+                f"Added {len(durations)} routes and {len(adjacency) - count} new locations"
+                + (
+                    f", resolving {repeated} duplicates ({duplicates})"
+                    if repeated
+                    else ""
+                )
+            )
+        # Any compiled snapshot or cached search is now out of date
+        self._version += 1
+        self._compiled = None
+
+    def update_route(self, start: Location | str, end: Location | str, duration: float):
+        """
+        Change the duration of an existing route, such as for live traffic.
+        Cached shortest-path trees are repaired rather than discarded, so the
+        cost depends on how many routes change rather than on the map size.
 
         Parameters
         ----------
         start: Location | str
-            Starting location
+            Starting location for the route
         end: Location | str
-            Ending location
+            Ending location for the route
+        duration: float
+            New time it takes to traverse the route
+        """
+        start, end = self._resolve(start), self._resolve(end)
+        if end not in self._adjacency_list[start]:
+            raise KeyError(f"No route between {start} and {end} in map")
+        old = self._adjacency_list[start][end]
+        if self.verbose:
+            print(f"Updating route from {start} to {end}: {old} -> {duration}")
+        self._adjacency_list[start][end] = duration
+        self._adjacency_list[end][start] = duration
+        self._update_components(start.name, end.name, old, duration)
+        # Derived indexes are rebuilt, but the snapshot and trees are patched
+        up_to_date = self._trees_version == self._version
+        self._version += 1
+        # No location moved, so the spatial index stays valid
+        if self._spatial_version == self._version - 1:
+            self._spatial_version = self._version
+        if self._compiled is None:
+            return
+        u, v = self._compiled.index[start.name], self._compiled.index[end.name]
+        self._compiled.update_weight(u, v, duration)
+        if up_to_date:
+            for tree in self._trees.values():
+                tree.update_route(u, v, old, duration)
+            self._trees_version = self._version
+
+    def compile(self) -> CompiledGraph:
+        """
+        Freeze the map into an array-backed CSR snapshot with integer node IDs.
+        The snapshot is cached until the next route is added.
 
         Returns
         -------
-        Minimum duration from start to end as a float
+        CompiledGraph object
         """
-        dist, prev = self._dijkstra(start=start, end=end)
-        return dist
+        if self._compiled is None:
+            locations = list(self._adjacency_list)
+            index = {location: i for i, location in enumerate(locations)}
+            offsets = np.zeros(len(locations) + 1, dtype=np.int64)
+            np.cumsum([len(r) for r in self._adjacency_list.values()], out=offsets[1:])
+            self._compiled = CompiledGraph(
+                names=[location.name for location in locations],
+                offsets=offsets,
+                targets=np.fromiter(
+                    (index[n] for r in self._adjacency_list.values() for n in r),
+                    dtype=np.int64,
+                    count=offsets[-1],
+                ),
+                weights=np.fromiter(
+                    (d for r in self._adjacency_list.values() for d in r.values()),
+                    dtype=np.float64,
+                    count=offsets[-1],
+                ),
+                latitudes=[
+                    np.nan if l.latitude is None else l.latitude for l in locations
+                ],
+                longitudes=[
+                    np.nan if l.longitude is None else l.longitude for l in locations
+                ],
+                locations=locations,
+            )
+        return self._compiled
 
-    def construct_path(self, start: Location | str, end: Location | str) -> list:
+    def contract(self, path: str | None = None) -> ContractionHierarchy:
         """
-        Reconstructs the path from start to end
+        Preprocess the map into a contraction hierarchy for fast queries.
+        The hierarchy is cached until the next route is added.
 
         Parameters
         ----------
-        start: Location | str
-            Starting location
-        end: Location | str
-            Ending location
+        path: str | None
+            Path to a .npz file. A hierarchy saved there for this exact map is
+            loaded instead of rebuilt, and otherwise the new hierarchy is saved.
 
         Returns
         -------
-        List of locations from start to end
+        ContractionHierarchy object
         """
-        dist, prev = self._dijkstra(start=start, end=end)
-        path = []
-        cur = [n for n in self._adjacency_list if n == end][0]
-        while cur is not None:
-            path.append(cur)
-            cur = prev[cur]
-        path.reverse()
-        if path and path[0] == start:
-            return path
-        return []
+        graph = self.compile()
+        if (
+            self._hierarchy is None
+            or self._hierarchy.graph_hash != graph.content_hash()
+        ):
+            self._hierarchy = None
+            if path is not None:
+                try:
+                    self._hierarchy = ContractionHierarchy.load(path, graph=graph)
+                except (OSError, ValueError):
+                    pass
+            if self._hierarchy is None:
+                self._hierarchy = ContractionHierarchy.build(graph)
+                if path is not None:
+                    self._hierarchy.save(path)
+        return self._hierarchy
 
-    def _dijkstra(
-        self, start: Location | str, end: Location | str
-    ) -> tuple[float, dict]:
+    def landmarks(self, k: int = 8) -> LandmarkIndex:
         """
-        Implementation of Dijkstra's algorithm.
+        Build the landmark index for ALT search, which works without coordinates.
+        The index is cached until the next route is added.
+
+        Parameters
+        ----------
+        k: int
+            Number of landmarks, used when the index is (re)built
+
+        Returns
+        -------
+        LandmarkIndex object
+        """
+        if self._landmarks is None or self._landmarks_version != self._version:
+            self._landmarks = LandmarkIndex.build(self.compile(), k=k)
+            self._landmarks_version = self._version
+        return self._landmarks
+
+    def components(self) -> ComponentIndex:
+        """
+        Label the connected components of the map, ignoring blocked routes of
+        infinite duration. The labelling is updated as routes are added, and
+        rebuilt only after a route is blocked.
+
+        Returns
+        -------
+        ComponentIndex object
+        """
+        if self._components is None:
+            self._components = ComponentIndex.from_graph(self.compile())
+        return self._components
+
+    def set_profile(
+        self,
+        start: Location | str,
+        end: Location | str,
+        times: list[float],
+        durations: list[float],
+    ) -> int:
+        """
+        Give a route a travel-time profile over the day for time-dependent
+        queries. Identical profiles are stored once and shared between routes.
+        NOTE: Assumes the profile is the same to and from the starting location.
 
         Parameters
         ----------
         start: Location | str
-            Starting location
+            Starting location for the route
         end: Location | str
-            Ending location
+            Ending location for the route
+        times: list[float]
+            Increasing times of day of the profile's breakpoints, in the map's
+            time units
+        durations: list[float]
+            Duration of the route when departing at each breakpoint, with
+            linear interpolation in between and around midnight
 
         Returns
         -------
-        Minimum duration from start to end as a float
-        Previous node in shortest path as a dictionary
+        Profile ID as an integer
+        """
+        start, end = self._resolve(start), self._resolve(end)
+        if end not in self._adjacency_list[start]:
+            raise KeyError(f"No route between {start} and {end} in map")
+        if self._pool is None:
+            if self.time_units not in DAY_LENGTHS:
+                raise ValueError(f"Unknown length of day in {self.time_units}")
+            self._pool = ProfilePool(period=DAY_LENGTHS[self.time_units])
+        profile = self._pool.add(times, durations)
+        self._profiles[(start.name, end.name)] = profile
+        self._profiles[(end.name, start.name)] = profile
+        self._route_profiles = None
+        return profile
+
+    def arrival_profile(
+        self,
+        start: Location | str | tuple,
+        end: Location | str | tuple,
+        depart_from: float,
+        depart_until: float,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Finds the earliest arrival time at end for every departure time in a
+        window with a single search over piecewise-linear arrival functions.
+
+        Parameters
+        ----------
+        start: Location | str | tuple
+            Starting location, or (latitude, longitude) to start from the nearest
+        end: Location | str | tuple
+            Ending location, or (latitude, longitude) to end at the nearest
+        depart_from: float
+            Start of the departure window, as a time of day
+        depart_until: float
+            End of the departure window
+
+        Returns
+        -------
+        Departure times at the breakpoints of the arrival function
+        Earliest arrival time at each of those departure times (inf if
+        unreachable), linear in between
+        """
+        start_id, end_id = self._node_id(start), self._node_id(end)
+        return arrival_profile(
+            self.compile(),
+            self._pool,
+            self._profile_ids(),
+            start_id,
+            end_id,
+            depart_from,
+            depart_until,
+        )
+
+    def spatial_index(self) -> SpatialIndex:
+        """
+        Build the spatial index over the locations with coordinates, keyed by
+        node ID. The index is cached until the next route is added.
+
+        Returns
+        -------
+        SpatialIndex object
+        """
+        if self._spatial is None or self._spatial_version != self._version:
+            graph = self.compile()
+            self._spatial = SpatialIndex(graph.latitudes, graph.longitudes)
+            self._spatial_version = self._version
+        return self._spatial
+
+    def nearest(
+        self,
+        latitude: float | np.ndarray,
+        longitude: float | np.ndarray,
+        k: int = 1,
+    ) -> list:
+        """
+        Finds the locations nearest to coordinates, by great-circle distance.
+
+        Parameters
+        ----------
+        latitude: float | np.ndarray
+            Latitude in degrees, or an array of latitudes to snap at once
+        longitude: float | np.ndarray
+            Longitude in degrees, or an array of longitudes to snap at once
+        k: int
+            Number of locations to find for each point
+
+        Returns
+        -------
+        List of up to k locations, nearest first, or one such list per point
+        when given arrays
+        """
+        nodes, _ = self.spatial_index().nearest(latitude, longitude, k=k)
+        graph = self.compile()
+        found = [[graph.location(n) for n in row if n >= 0] for row in nodes.tolist()]
+        return found if np.ndim(latitude) else found[0]
+
+    def within_radius(
+        self, latitude: float, longitude: float, radius: float
+    ) -> list[Location]:
+        """
+        Finds the locations within a great-circle distance of coordinates.
+
+        Parameters
+        ----------
+        latitude: float
+            Latitude in degrees
+        longitude: float
+            Longitude in degrees
+        radius: float
+            Maximum distance in kilometers
+
+        Returns
+        -------
+        List of locations, nearest first
+        """
+        nodes, _ = self.spatial_index().within_radius(latitude, longitude, radius)
+        graph = self.compile()
+        return [graph.location(n) for n in nodes.tolist()]
+
+    def route(
+        self,
+        start: Location | str | tuple,
+        end: Location | str | tuple,
+        method: str = "dijkstra",
+        depart_at: float | None = None,
+    ) -> Route:
+        """
+        Finds the minimum duration route.
+
+        Parameters
+        ----------
+        start: Location | str | tuple
+            Starting location, or (latitude, longitude) to start from the nearest
+        end: Location | str | tuple
+            Ending location, or (latitude, longitude) to end at the nearest
+        method: str
+            Search algorithm to use: "dijkstra" searches forward from start using
+            the shortest-path tree cache, "bidirectional" searches from both ends,
+            "astar" is guided by the great-circle distance to end (falling back to
+            "dijkstra" when any location lacks coordinates), "ch" queries the
+            contraction hierarchy from Map.contract, "alt" is guided by the
+            landmark index from Map.landmarks
+        depart_at: float | None
+            Time of day to leave start, so routes with a profile from
+            Map.set_profile take as long as it gives for when they are entered.
+            Only the "dijkstra" method supports it.
+
+        Returns
+        -------
+        Route object holding the duration, path and search statistics
+        """
+        start, end = self._resolve(start), self._resolve(end)
+        graph = self.compile()
+        start_id, end_id = graph.index[start.name], graph.index[end.name]
+        # Locations in different components are unreachable without a search
+        if depart_at is None and not self.components().connected(start.name, end.name):
+            return Route(duration=float("inf"))
+        if depart_at is not None:
+            if method != "dijkstra":
+                raise ValueError(f"Search method {method} does not support depart_at")
+            duration, path, settled = time_dependent_dijkstra(
+                graph,
+                self._pool,
+                self._profile_ids(),
+                start_id,
+                end_id,
+                depart_at,
+            )
+            return Route(
+                duration=duration,
+                path=[graph.location(i) for i in path],
+                settled=settled,
+            )
+        if method == "astar" and not graph.located:
+            method = "dijkstra"
+        if method == "dijkstra":
+            tree = self._tree(start_id)
+            settled = tree.settle(end_id)
+            duration, path = tree.duration(end_id), tree.path(end_id)
+        elif method == "bidirectional":
+            duration, path, settled = bidirectional(graph, start_id, end_id)
+        elif method == "ch":
+            duration, path, settled = self.contract().query(start_id, end_id)
+        elif method == "alt":
+            duration, path, settled = astar(
+                graph, start_id, end_id, self.landmarks().heuristic(end_id)
+            )
+        elif method == "astar":
+            duration, path, settled = astar(
+                graph,
+                start_id,
+                end_id,
+                great_circle_heuristic(graph, end_id, max_speed=self.max_speed),
+            )
+        else:
+            raise ValueError(f"Unknown search method {method}")
+        return Route(
+            duration=duration,
+            path=[graph.location(i) for i in path],
+            settled=settled,
+        )
+
+    def reachable_within(
+        self,
+        start: Location | str | tuple | list,
+        budget: float | list[float],
+    ) -> list:
+        """
+        Finds every location reachable from start within a duration budget, with
+        a single search that stops at the largest budget.
+
+        Parameters
+        ----------
+        start: Location | str | tuple | list
+            Starting location, (latitude, longitude) to start from the nearest,
+            or a list of these for a multi-source isochrone, where each location
+            is measured from its nearest start
+        budget: float | list[float]
+            Maximum duration, or a list of them to answer at once
+
+        Returns
+        -------
+        List of (location, duration) pairs in order of duration, or one such
+        list per budget when given a list
+        """
+        starts = start if isinstance(start, list) else [start]
+        budgets = np.atleast_1d(np.asarray(budget, dtype=np.float64))
+        graph = self.compile()
+        nodes, durations = reachable_within(
+            graph,
+            [self._node_id(s) for s in starts],
+            budgets.max() if len(budgets) else float("-inf"),
+        )
+        reached = list(zip([graph.location(n) for n in nodes], durations))
+        # Nodes come in order of duration, so each budget keeps a prefix
+        counts = np.searchsorted(durations, budgets, side="right")
+        found = [reached[:count] for count in counts.tolist()]
+        return found if np.ndim(budget) else found[0]
+
+    def nearest_of(
+        self,
+        start: Location | str | tuple,
+        targets: list,
+        k: int = 1,
+    ) -> list[Route]:
+        """
+        Finds the routes to the k nearest of many targets with a single search,
+        which stops once k targets are settled. The search resumes the cached
+        shortest-path tree from start.
+
+        Parameters
+        ----------
+        start: Location | str | tuple
+            Starting location, or (latitude, longitude) to start from the nearest
+        targets: list
+            Candidate locations, location names or coordinates
+        k: int
+            Number of targets to find
+
+        Returns
+        -------
+        List of Route objects to up to k targets, nearest first, with fewer
+        only if the rest are unreachable
+        """
+        graph = self.compile()
+        tree = self._tree(self._node_id(start))
+        found, settled = tree.nearest({self._node_id(t) for t in targets}, k=k)
+        return [
+            Route(
+                duration=tree.duration(target),
+                path=[graph.location(i) for i in tree.path(target)],
+                settled=settled,
+            )
+            for target in found
+        ]
+
+    def voronoi(self, facilities: list) -> dict[Location, tuple[Location, float]]:
+        """
+        Labels every location with its nearest facility in a single search from
+        all facilities at once, partitioning the map by facility.
+
+        Parameters
+        ----------
+        facilities: list
+            Facility locations, location names or coordinates
+
+        Returns
+        -------
+        Dictionary of each reachable location to its nearest facility and the
+        duration between them
+        """
+        graph = self.compile()
+        facilities = [self._resolve(f) for f in facilities]
+        labels, durations = voronoi(graph, [graph.index[f.name] for f in facilities])
+        return {
+            graph.location(node): (facilities[label], duration)
+            for node, (label, duration) in enumerate(zip(labels, durations))
+            if label >= 0
+        }
+
+    def k_shortest_paths(
+        self, start: Location | str | tuple, end: Location | str | tuple, k: int
+    ) -> list[Route]:
+        """
+        Finds up to k alternative routes without repeated locations, shortest
+        first, using Yen's algorithm. Searches share the cached shortest-path
+        tree from end.
+
+        Parameters
+        ----------
+        start: Location | str | tuple
+            Starting location, or (latitude, longitude) to start from the nearest
+        end: Location | str | tuple
+            Ending location, or (latitude, longitude) to end at the nearest
+        k: int
+            Maximum number of routes
+
+        Returns
+        -------
+        List of Route objects, fewer than k if no more routes exist and empty if
+        end is unreachable
         """
-        # Convert strings to Locations
-        start_node = [n for n in self._adjacency_list if n == start][0]
-        end_node = [n for n in self._adjacency_list if n == end][0]
+        start, end = self._resolve(start), self._resolve(end)
+        if not self.components().connected(start.name, end.name):
+            return []
+        start_id, end_id = self._node_id(start), self._node_id(end)
+        graph = self.compile()
+        return [
+            Route(
+                duration=duration,
+                path=[graph.location(i) for i in path],
+                settled=settled,
+            )
+            for duration, path, settled in k_shortest_paths(
+                graph, start_id, end_id, k, tree=self._tree(end_id)
+            )
+        ]
 
-        distances = {node: float("inf") for node in self._adjacency_list}
-        distances[start_node] = 0
-        prev = {node: None for node in self._adjacency_list}
-        visited = set()
-        counter = 0
-        pq = [(0, counter, start_node)]
+    def route_many(self, pairs: list[tuple], workers: int = 1) -> list[Route]:
+        """
+        Finds the minimum duration routes for many (start, end) pairs.
+        Pairs are grouped by start so each distinct start is searched once, stopping
+        when all of its ends are settled.
 
-        while pq:
-            curr_time, _, curr_node = heapq.heappop(pq)
+        Parameters
+        ----------
+        pairs: list[tuple]
+            (start, end) pairs of locations, location names or coordinates
+        workers: int
+            Number of worker processes to spread the searches across. With 1, the
+            searches run in this process and use the shortest-path tree cache.
 
-            if curr_node in visited:
+        Returns
+        -------
+        List of Route objects in the same order as pairs
+        """
+        # Group the position of each pair by its start node, answering pairs in
+        # different components without a search
+        components = self.components()
+        routes = [None] * len(pairs)
+        groups = {}
+        for i, (start, end) in enumerate(pairs):
+            start, end = self._resolve(start), self._resolve(end)
+            if not components.connected(start.name, end.name):
+                routes[i] = Route(duration=float("inf"))
                 continue
-            visited.add(curr_node)
+            groups.setdefault(self._node_id(start), []).append((i, self._node_id(end)))
 
-            if curr_node == end_node:
-                return curr_time, prev
-            for neighbor, weight in self._adjacency_list[curr_node].items():
-                if neighbor in visited:
-                    continue
-                total_time = curr_time + weight
-                if total_time < distances[neighbor]:
-                    distances[neighbor] = total_time
-                    prev[neighbor] = curr_node
-                    counter += 1
-                    heapq.heappush(pq, (total_time, counter, neighbor))
+        graph = self.compile()
+        if workers <= 1:
+            for source, group in groups.items():
+                tree = self._tree(source)
+                for i, target in group:
+                    settled = tree.settle(target)
+                    routes[i] = Route(
+                        duration=tree.duration(target),
+                        path=[graph.location(n) for n in tree.path(target)],
+                        settled=settled,
+                    )
+            return routes
+
+        tasks = [(source, [t for _, t in group]) for source, group in groups.items()]
+        results = map_over_graph(settle_targets, tasks, graph, workers=workers)
+        for group, result in zip(groups.values(), results):
+            for (i, _), (duration, path, settled) in zip(group, result):
+                routes[i] = Route(
+                    duration=duration,
+                    path=[graph.location(n) for n in path],
+                    settled=settled,
+                )
+        return routes
+
+    def distance_matrix(
+        self, method: str = "auto", workers: int | None = None, out: str | None = None
+    ) -> tuple[np.ndarray, list[Location]]:
+        """
+        Calculates the minimum duration between every pair of locations.
+
+        Parameters
+        ----------
+        method: str
+            "floyd-warshall" for small graphs, "dijkstra" to run one search per
+            location across worker processes, or "auto" to choose by size
+        workers: int | None
+            Number of worker processes for the Dijkstra method
+        out: str | None
+            Path of a .npy file to write the matrix to as a memory map
+
+        Returns
+        -------
+        Array of minimum durations indexed by [start, end]
+        List of locations labelling the rows and columns
+        """
+        graph = self.compile()
+        matrix = distance_matrix(graph, method=method, workers=workers, out=out)
+        return matrix, [graph.location(i) for i in range(graph.n_nodes)]
+
+    def calculate_duration(
+        self,
+        start: Location | str | tuple,
+        end: Location | str | tuple,
+        method: str = "dijkstra",
+        depart_at: float | None = None,
+    ) -> float:
+        """
+        Calculates the minimum duration required for a route using Dijkstra's algorithm.
+
+        Parameters
+        ----------
+        start: Location | str | tuple
+            Starting location, or (latitude, longitude) to start from the nearest
+        end: Location | str | tuple
+            Ending location, or (latitude, longitude) to end at the nearest
+        method: str
+            Search algorithm to use, as in Map.route
+        depart_at: float | None
+            Time of day to leave start, as in Map.route
+
+        Returns
+        -------
+        Minimum duration from start to end as a float
+        """
+        return self.route(start, end, method=method, depart_at=depart_at).duration
+
+    def construct_path(
+        self,
+        start: Location | str | tuple,
+        end: Location | str | tuple,
+        method: str = "dijkstra",
+        depart_at: float | None = None,
+    ) -> list:
+        """
+        Reconstructs the path from start to end
+
+        Parameters
+        ----------
+        start: Location | str | tuple
+            Starting location, or (latitude, longitude) to start from the nearest
+        end: Location | str | tuple
+            Ending location, or (latitude, longitude) to end at the nearest
+        method: str
+            Search algorithm to use, as in Map.route
+        depart_at: float | None
+            Time of day to leave start, as in Map.route
+
+        Returns
+        -------
+        List of locations from start to end
+        """
+        return self.route(start, end, method=method, depart_at=depart_at).path
+
+    def _resolve(self, location: Location | str | tuple) -> Location:
+        """
+        Look up a location in the map by name in constant time, or snap
+        coordinates to the nearest location.
+
+        Parameters
+        ----------
+        location: Location | str | tuple
+            Location, location name or (latitude, longitude) pair
+
+        Returns
+        -------
+        The matching Location object stored in the map
+        """
+        if isinstance(location, tuple):
+            nearest = self.nearest(*location)
+            if not nearest:
+                raise KeyError(f"No location with coordinates in map near {location}")
+            return nearest[0]
+        name = location.name if isinstance(location, Location) else location
+        if self._adjacency is None:
+            # A loaded map looks names up in its compiled graph instead
+            node = self._compiled.index.get(name)
+            node = None if node is None else self._compiled.location(node)
+        else:
+            node = self._locations.get(name)
+        # A Location object must match all attributes, as with Location.__eq__
+        if node is None or (isinstance(location, Location) and node != location):
+            raise KeyError(f"Location {location} not in map")
+        return node
+
+    def _node_id(self, location: Location | str | tuple) -> int:
+        """
+        Look up the node ID of a location in the compiled snapshot.
+
+        Parameters
+        ----------
+        location: Location | str | tuple
+            Location, location name or (latitude, longitude) pair
+
+        Returns
+        -------
+        Node ID as an integer
+        """
+        return self.compile().index[self._resolve(location).name]
+
+    def _tree(self, source: int) -> ShortestPathTree:
+        """
+        Get the cached shortest-path tree for a source, creating it if necessary.
+        Trees are evicted in least-recently-used order and discarded whenever the
+        map version changes.
+
+        Parameters
+        ----------
+        source: int
+            Starting node ID
+
+        Returns
+        -------
+        ShortestPathTree object
+        """
+        if self._trees_version != self._version:
+            self._trees.clear()
+            self._trees_version = self._version
+        tree = self._trees.get(source)
+        if tree is None:
+            tree = ShortestPathTree(self.compile(), source)
+            if self.cache_size > 0:
+                self._trees[source] = tree
+                if len(self._trees) > self.cache_size:
+                    self._trees.popitem(last=False)
+        else:
+            self._trees.move_to_end(source)
+        return tree
+
+    def _update_components(self, start: str, end: str, old: float | None, new: float):
+        """
+        Keep the component labelling current after a route is added or changed.
+
+        Parameters
+        ----------
+        start: str
+            Starting location name
+        end: str
+            Ending location name
+        old: float | None
+            Previous duration of the route, None if it is new
+        new: float
+            Duration of the route
+        """
+        if self._components is None:
+            return
+        # Blocking a route may split a component, which union-find cannot undo,
+        # so the labelling is rebuilt when next needed
+        if new == float("inf") and old is not None and old != float("inf"):
+            self._components = None
+        else:
+            self._components.add_route(start, end, new)
+
+    def _profile_ids(self) -> list[int]:
+        """
+        Profile ID of each route in the compiled snapshot's order, -1 for routes
+        without a profile. The list is cached until the routes or profiles change.
+
+        Returns
+        -------
+        List of profile IDs
+        """
+        if (
+            self._route_profiles is None
+            or self._route_profiles_version != self._version
+        ):
+            graph = self.compile()
+            offsets, targets, _ = graph.as_lists()
+            ids = [-1] * len(targets)
+            for (start, end), profile in self._profiles.items():
+                u, v = graph.index[start], graph.index[end]
+                for i in range(offsets[u], offsets[u + 1]):
+                    if targets[i] == v:
+                        ids[i] = profile
+            self._route_profiles = ids
+            self._route_profiles_version = self._version
+        return self._route_profiles
@@ -0,0 +1,116 @@
+from __future__ import annotations
+import os
+import numpy as np
+from route_calc.graph import CompiledGraph
+from route_calc.search import ShortestPathTree
+from route_calc.parallel import map_over_graph, split
+
+# Largest graph for which the O(V^3) Floyd-Warshall beats one Dijkstra per source
+FLOYD_WARSHALL_MAX_NODES = 512
+
+
+def floyd_warshall(graph: CompiledGraph, out: np.ndarray | None = None) -> np.ndarray:
+    """
+    All-pairs minimum durations with a vectorized Floyd-Warshall algorithm.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    out: np.ndarray | None
+        Square array to fill in place, allocated if None
+
+    Returns
+    -------
+    Array of minimum durations, indexed by [start node ID, end node ID]
+    """
+    n = graph.n_nodes
+    if out is None:
+        out = np.empty((n, n), dtype=np.float64)
+    out.fill(np.inf)
+    rows = np.repeat(np.arange(n), np.diff(graph.offsets))
+    np.minimum.at(out, (rows, graph.targets), graph.weights)
+    np.fill_diagonal(out, 0.0)
+    # Relax every pair through each intermediate node in turn
+    for k in range(n):
+        np.minimum(out, out[:, k, None] + out[None, k, :], out=out)
+    return out
+
+
+def dijkstra_rows(graph: CompiledGraph, sources: list[int]) -> np.ndarray:
+    """
+    One-to-all minimum durations with one Dijkstra search per source.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    sources: list[int]
+        Starting node IDs
+
+    Returns
+    -------
+    Array of minimum durations, indexed by [position in sources, end node ID]
+    """
+    rows = np.full((len(sources), graph.n_nodes), np.inf)
+    for row, source in zip(rows, sources):
+        tree = ShortestPathTree(graph, source)
+        tree.settle()
+        row[list(tree.settled)] = list(tree.settled.values())
+    return rows
+
+
+def distance_matrix(
+    graph: CompiledGraph,
+    method: str = "auto",
+    workers: int | None = None,
+    out: str | None = None,
+) -> np.ndarray:
+    """
+    All-pairs minimum durations, choosing an algorithm by graph size.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    method: str
+        "floyd-warshall", "dijkstra", or "auto" to use Floyd-Warshall for graphs
+        of at most FLOYD_WARSHALL_MAX_NODES nodes and Dijkstra otherwise
+    workers: int | None
+        Number of worker processes for the Dijkstra method. Defaults to the
+        number of CPUs.
+    out: str | None
+        Path of a .npy file to write the matrix to as a memory map, so that it
+        does not have to fit in memory
+
+    Returns
+    -------
+    Array of minimum durations, indexed by [start node ID, end node ID]
+    """
+    n = graph.n_nodes
+    if method == "auto":
+        method = "floyd-warshall" if n <= FLOYD_WARSHALL_MAX_NODES else "dijkstra"
+    if method not in ("floyd-warshall", "dijkstra"):
+        raise ValueError(f"Unknown distance matrix method {method}")
+
+    if out is None:
+        matrix = np.empty((n, n), dtype=np.float64)
+    else:
+        matrix = np.lib.format.open_memmap(
+            out, mode="w+", dtype=np.float64, shape=(n, n)
+        )
+
+    if method == "floyd-warshall":
+        floyd_warshall(graph, out=matrix)
+    else:
+        if workers is None:
+            workers = os.cpu_count() or 1
+        # Several chunks per worker keeps the pool busy when searches vary in cost
+        chunks = split(list(range(n)), 4 * workers)
+        lo = 0
+        for rows in map_over_graph(dijkstra_rows, chunks, graph, workers=workers):
+            matrix[lo : lo + len(rows)] = rows
+            lo += len(rows)
+    if out is not None:
+        matrix.flush()
+    return matrix
@@ -0,0 +1,82 @@
+from __future__ import annotations
+import os
+from functools import partial
+from typing import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
+from route_calc.graph import CompiledGraph
+
+# Graph shared by every task in a worker process, set once by the pool initializer
+_graph = None
+
+
+def _init_worker(graph: CompiledGraph):
+    global _graph
+    _graph = graph
+
+
+def _run_task(function: Callable, task):
+    return function(_graph, task)
+
+
+def map_over_graph(
+    function: Callable,
+    tasks: Iterable,
+    graph: CompiledGraph,
+    workers: int | None = None,
+) -> Iterator:
+    """
+    Apply a function to each task across a pool of worker processes.
+    The graph is sent to each worker once, rather than with every task, and
+    results are yielded as they arrive so they need not all be held in memory.
+
+    Parameters
+    ----------
+    function: Callable
+        Module-level function called as `function(graph, task)`
+    tasks: Iterable
+        Arguments to apply the function to
+    graph: CompiledGraph
+        Read-only graph shared by all tasks
+    workers: int | None
+        Number of worker processes. Defaults to the number of CPUs, and 1 runs
+        every task in the current process.
+
+    Yields
+    ------
+    Results in task order
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1:
+        for task in tasks:
+            yield function(graph, task)
+        return
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_worker, initargs=(graph,)
+    ) as pool:
+        yield from pool.map(partial(_run_task, function), tasks)
+
+
+def split(items: list, chunks: int) -> list[list]:
+    """
+    Split a list into at most `chunks` contiguous, evenly sized pieces.
+
+    Parameters
+    ----------
+    items: list
+        Items to split
+    chunks: int
+        Maximum number of pieces
+
+    Returns
+    -------
+    List of non-empty lists
+    """
+    chunks = max(1, min(chunks, len(items)))
+    size, extra = divmod(len(items), chunks)
+    pieces, lo = [], 0
+    for i in range(chunks):
+        hi = lo + size + (i < extra)
+        pieces.append(items[lo:hi])
+        lo = hi
+    return [p for p in pieces if p]
@@ -243,8 +243,8 @@ def plot_route(
         return G
 
     def subplot_shortest_path(ax, map_obj, start, end, scenario_label):
-        dist = map_obj.calculate_duration(start, end)
-        path = map_obj.construct_path(start, end)
+        route = map_obj.route(start, end)
+        dist, path = route.duration, route.path
         G = build_nx_graph(map_obj._adjacency_list)
         path_edges = set(zip(path, path[1:]))
         pos = nx.spring_layout(G, seed=42, k=1.2, iterations=100)
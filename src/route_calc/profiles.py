@@ -0,0 +1,408 @@
+from __future__ import annotations
+import heapq
+import numpy as np
+from array import array
+from bisect import bisect_right
+from route_calc.graph import CompiledGraph
+from route_calc.search import unwind
+
+# Length of the day in each supported time unit
+DAY_LENGTHS = {"seconds": 86400.0, "minutes": 1440.0, "hours": 24.0}
+# Tolerance for comparing arrival times in profile searches
+EPSILON = 1e-9
+
+
+class ProfilePool:
+    """
+    Piecewise-linear travel-time profiles that repeat every period, such as a
+    day. Breakpoints of all profiles are stored in shared arrays, and identical
+    profiles are stored once, so many routes can share a few rush-hour shapes.
+
+    Profiles must satisfy the FIFO property: departing later never means
+    arriving earlier, so a duration may fall by at most the time that passes.
+    """
+
+    def __init__(self, period: float = DAY_LENGTHS["minutes"]):
+        """
+        Parameters
+        ----------
+        period: float
+            Length of time after which every profile repeats
+        """
+        if not period > 0:
+            raise ValueError(f"Profile period must be positive, got {period}")
+        self.period = float(period)
+        # Each profile's breakpoints with one wrapped around from either end, so
+        # any time within the period lies between two of them
+        self.offsets = [0]
+        self.times = array("d")
+        self.durations = array("d")
+        self._ids = {}
+
+    def __repr__(self):
+        return f"ProfilePool of {len(self)} profiles with period {self.period}"
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def add(self, times: list[float], durations: list[float]) -> int:
+        """
+        Store a profile, or find an identical one already stored.
+
+        Parameters
+        ----------
+        times: list[float]
+            Increasing times of day of the breakpoints, within [0, period)
+        durations: list[float]
+            Duration of the route when departing at each breakpoint, with
+            linear interpolation in between and around the end of the period
+
+        Returns
+        -------
+        Profile ID as an integer
+        """
+        times = np.asarray(times, dtype=np.float64)
+        durations = np.asarray(durations, dtype=np.float64)
+        if times.ndim != 1 or not len(times) or times.shape != durations.shape:
+            raise ValueError("Expected one duration per breakpoint time")
+        if (times[0] < 0) or (times[-1] >= self.period) or (np.diff(times) <= 0).any():
+            raise ValueError(
+                f"Breakpoint times must be increasing and within [0, {self.period})"
+            )
+        if not (np.isfinite(durations) & (durations >= 0)).all():
+            raise ValueError("Durations must be finite and non-negative")
+        # Arrival times must not decrease, including across the end of the period
+        wrapped = np.append(times, times[0] + self.period)
+        arrivals = wrapped + np.append(durations, durations[0])
+        if (np.diff(arrivals) < -EPSILON).any():
+            raise ValueError(
+                "Profile violates FIFO: a later departure would arrive earlier"
+            )
+
+        key = (times.tobytes(), durations.tobytes())
+        if key not in self._ids:
+            self._ids[key] = len(self)
+            self.times.extend([times[-1] - self.period, *times, times[0] + self.period])
+            self.durations.extend([durations[-1], *durations, durations[0]])
+            self.offsets.append(len(self.times))
+        return self._ids[key]
+
+    def breakpoints(self, profile: int) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Breakpoints of a profile within one period.
+
+        Parameters
+        ----------
+        profile: int
+            Profile ID
+
+        Returns
+        -------
+        Times of the breakpoints
+        Durations at the breakpoints
+        """
+        start, end = self.offsets[profile] + 1, self.offsets[profile + 1] - 1
+        return np.array(self.times[start:end]), np.array(self.durations[start:end])
+
+    def duration(self, profile: int, time: float) -> float:
+        """
+        Duration of a route when departing at a time.
+
+        Parameters
+        ----------
+        profile: int
+            Profile ID
+        time: float
+            Departure time, which may lie in any period
+
+        Returns
+        -------
+        Duration as a float
+        """
+        times, durations = self.times, self.durations
+        time %= self.period
+        # Rounding can leave the time at the period itself
+        end = self.offsets[profile + 1] - 1
+        i = min(bisect_right(times, time, self.offsets[profile], end), end)
+        t0, t1, d0, d1 = times[i - 1], times[i], durations[i - 1], durations[i]
+        return d0 + (d1 - d0) * (time - t0) / (t1 - t0)
+
+    def evaluate(self, profile: int, times: np.ndarray) -> np.ndarray:
+        """
+        Durations of a route when departing at each of many times.
+
+        Parameters
+        ----------
+        profile: int
+            Profile ID
+        times: np.ndarray
+            Departure times, which may lie in any period
+
+        Returns
+        -------
+        Durations as an array
+        """
+        start, end = self.offsets[profile], self.offsets[profile + 1]
+        return np.interp(
+            np.asarray(times) % self.period,
+            np.frombuffer(self.times)[start:end],
+            np.frombuffer(self.durations)[start:end],
+        )
+
+
+def time_dependent_dijkstra(
+    graph: CompiledGraph,
+    pool: ProfilePool,
+    profiles: list[int],
+    source: int,
+    target: int,
+    depart_at: float,
+) -> tuple[float, list[int], int]:
+    """
+    Implementation of Dijkstra's algorithm on earliest arrival times, where
+    routes with a profile take as long as it gives for the time they are
+    entered. This is exact because every profile is FIFO.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    pool: ProfilePool
+        Profiles of the routes
+    profiles: list[int]
+        Profile ID of each route in the graph's order, -1 to use its duration
+    source: int
+        Starting node ID
+    target: int
+        Ending node ID
+    depart_at: float
+        Departure time from the source
+
+    Returns
+    -------
+    Duration from source to target as a float (inf if unreachable)
+    List of node IDs from source to target, empty if unreachable
+    Number of settled nodes
+    """
+    offsets, targets, weights = graph.as_lists()
+    arrivals = {source: depart_at}
+    prev = {source: None}
+    settled = set()
+    counter = 0
+    pq = [(depart_at, counter, source)]
+
+    while pq:
+        curr_time, _, curr_node = heapq.heappop(pq)
+
+        if curr_node in settled:
+            continue
+        settled.add(curr_node)
+
+        if curr_node == target:
+            return curr_time - depart_at, unwind(prev, target), len(settled)
+        for i in range(offsets[curr_node], offsets[curr_node + 1]):
+            neighbor = targets[i]
+            if neighbor in settled:
+                continue
+            profile = profiles[i]
+            if profile < 0:
+                arrival = curr_time + weights[i]
+            else:
+                arrival = curr_time + pool.duration(profile, curr_time)
+            if arrival < arrivals.get(neighbor, float("inf")):
+                arrivals[neighbor] = arrival
+                prev[neighbor] = curr_node
+                counter += 1
+                heapq.heappush(pq, (arrival, counter, neighbor))
+    return float("inf"), [], len(settled)
+
+
+def arrival_profile(
+    graph: CompiledGraph,
+    pool: ProfilePool,
+    profiles: list[int],
+    source: int,
+    target: int,
+    depart_from: float,
+    depart_until: float,
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Earliest arrival time at a target as a function of the departure time over
+    a window, found by a single label-correcting search over piecewise-linear
+    arrival functions rather than one search per departure time.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    pool: ProfilePool
+        Profiles of the routes
+    profiles: list[int]
+        Profile ID of each route in the graph's order, -1 to use its duration
+    source: int
+        Starting node ID
+    target: int
+        Ending node ID
+    depart_from: float
+        Start of the departure window
+    depart_until: float
+        End of the departure window
+
+    Returns
+    -------
+    Departure times at the breakpoints of the arrival function
+    Earliest arrival time at each of those departure times (inf if unreachable),
+    linear in between
+    """
+    if depart_until < depart_from:
+        raise ValueError(
+            f"Departure window ends at {depart_until} before it starts at {depart_from}"
+        )
+    offsets, targets, weights = graph.as_lists()
+    window = np.unique([depart_from, depart_until]).astype(np.float64)
+    # Arrival function at each node as (departure times, arrival times), which
+    # never decreases, so its first arrival is its earliest
+    labels = {source: (window, window.copy())}
+    queued = {source: depart_from}
+    pq = [(depart_from, 0, source)]
+    counter = 0
+
+    while pq:
+        key, _, curr_node = heapq.heappop(pq)
+        if queued.get(curr_node) != key:
+            continue
+        del queued[curr_node]
+        # Nothing left can reach the target sooner than its latest arrival
+        if target in labels and key >= labels[target][1][-1]:
+            break
+
+        times, arrivals = labels[curr_node]
+        for i in range(offsets[curr_node], offsets[curr_node + 1]):
+            neighbor = targets[i]
+            profile = profiles[i]
+            if profile < 0:
+                if weights[i] == float("inf"):
+                    continue
+                candidate = (times, arrivals + weights[i])
+            else:
+                candidate = _follow(pool, profile, times, arrivals)
+            if neighbor in labels:
+                candidate = _lower_envelope(labels[neighbor], candidate)
+                if candidate is None:
+                    continue
+            labels[neighbor] = candidate
+            earliest = candidate[1][0]
+            if earliest < queued.get(neighbor, float("inf")):
+                queued[neighbor] = earliest
+                counter += 1
+                heapq.heappush(pq, (earliest, counter, neighbor))
+
+    if target not in labels:
+        return window, np.full(len(window), np.inf)
+    return labels[target]
+
+
+def _follow(
+    pool: ProfilePool, profile: int, times: np.ndarray, arrivals: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Arrival function after following a route with a profile, entered at the
+    times given by another arrival function.
+
+    Parameters
+    ----------
+    pool: ProfilePool
+        Profiles of the routes
+    profile: int
+        Profile ID of the route
+    times: np.ndarray
+        Departure times at the breakpoints of the arrival function
+    arrivals: np.ndarray
+        Arrival times at the start of the route
+
+    Returns
+    -------
+    Departure times at the breakpoints of the new arrival function
+    Arrival times at the end of the route
+    """
+    # The result also bends where the route is entered at one of its breakpoints
+    period = pool.period
+    start, end = pool.offsets[profile], pool.offsets[profile + 1]
+    bends = np.frombuffer(pool.times)[start + 1 : end - 1]
+    cycles = np.arange(
+        np.floor(arrivals[0] / period) - 1, np.floor(arrivals[-1] / period) + 2
+    )
+    bends = (bends[None, :] + period * cycles[:, None]).ravel()
+    bends = bends[(bends > arrivals[0]) & (bends < arrivals[-1])]
+    if len(bends):
+        merged = np.union1d(times, np.interp(bends, arrivals, times))
+        times, arrivals = merged, np.interp(merged, times, arrivals)
+    return _simplify(times, arrivals + pool.evaluate(profile, arrivals))
+
+
+def _lower_envelope(
+    current: tuple[np.ndarray, np.ndarray], candidate: tuple[np.ndarray, np.ndarray]
+) -> tuple[np.ndarray, np.ndarray] | None:
+    """
+    Pointwise minimum of two arrival functions over the same departure window.
+
+    Parameters
+    ----------
+    current: tuple[np.ndarray, np.ndarray]
+        Departure and arrival times of the breakpoints of the current function
+    candidate: tuple[np.ndarray, np.ndarray]
+        Departure and arrival times of the breakpoints of a new function
+
+    Returns
+    -------
+    Departure and arrival times of the minimum's breakpoints, or None if the
+    new function is nowhere earlier
+    """
+    times = np.union1d(current[0], candidate[0])
+    old, new = np.interp(times, *current), np.interp(times, *candidate)
+    # Both are linear between the merged times, so they differ most at one
+    if not (new < old - EPSILON).any():
+        return None
+    # Add the points where the functions cross
+    gaps = new - old
+    crossing = np.flatnonzero(gaps[:-1] * gaps[1:] < 0)
+    if len(crossing):
+        fractions = gaps[crossing] / (gaps[crossing] - gaps[crossing + 1])
+        times = np.union1d(
+            times,
+            times[crossing] + fractions * (times[crossing + 1] - times[crossing]),
+        )
+        old, new = np.interp(times, *current), np.interp(times, *candidate)
+    return _simplify(times, np.minimum(old, new))
+
+
+def _simplify(times: np.ndarray, arrivals: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Drop the breakpoints of an arrival function that lie on a straight line
+    between their neighbors.
+
+    Parameters
+    ----------
+    times: np.ndarray
+        Increasing departure times of the breakpoints
+    arrivals: np.ndarray
+        Arrival times at the breakpoints
+
+    Returns
+    -------
+    Departure and arrival times of the remaining breakpoints
+    """
+    if len(times) < 3:
+        return times, arrivals
+    fractions = (times[1:-1] - times[:-2]) / (times[2:] - times[:-2])
+    line = arrivals[:-2] + fractions * (arrivals[2:] - arrivals[:-2])
+    keep = np.ones(len(times), dtype=bool)
+    keep[1:-1] = np.abs(arrivals[1:-1] - line) > EPSILON
+    # Neighbors dropped together may not be on one line, as when two points are
+    # nearly at the same time, so restore any point the result no longer fits
+    while True:
+        misfits = np.abs(np.interp(times, times[keep], arrivals[keep]) - arrivals)
+        misfits = misfits > EPSILON
+        if not misfits.any():
+            return times[keep], arrivals[keep]
+        keep |= misfits
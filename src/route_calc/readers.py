@@ -1,7 +1,15 @@
-from csv import DictReader
+from __future__ import annotations
+import numpy as np
+from csv import DictReader, reader
+from itertools import chain, islice
+from typing import Iterator
 from route_calc.map import Map
+from route_calc.graph import CompiledGraph
 from route_calc.location import Location
 
+# Number of CSV rows parsed at a time when streaming routes
+CHUNK_SIZE = 65536
+
 
 def read_locations(path: str) -> list:
     """
@@ -26,9 +34,10 @@ def read_locations(path: str) -> list:
 
 def read_routes(
     path: str,
-    locations: list | None = None,
+    locations: list | dict | None = None,
     time_units: str = "minutes",
     verbose: bool = False,
+    chunk_size: int = CHUNK_SIZE,
 ) -> Map:
     """
     Read a CSV into a Map object.
@@ -38,34 +47,189 @@ def read_routes(
     ----------
     path: str
         Path to the CSV file
-    locations: list | None
-        List of Location objects with additional information populated
+    locations: list | dict | None
+        Location objects with additional information populated, as a list or as
+        a dictionary keyed by name
     time_units: str
         The units to use for tracking the route durations
     verbose: bool
         Toggles verbosity of print statements
+    chunk_size: int
+        Number of rows to parse and insert at a time
 
     Returns
     -------
     Map object
     """
     points_of_interest = Map(time_units=time_units, verbose=verbose)
-    with open(path, "r") as f:
-        for row in DictReader(f):
-            # Configure start and end locations
-            try:
-                start_location = locations[locations.index(row["start"])]
-            except:
-                start_location = Location(name=row["start"])
-            try:
-                end_location = locations[locations.index(row["end"])]
-            except:
-                end_location = Location(name=row["end"])
-
-            # Add route to map
-            points_of_interest.add_route(
-                start=start_location,
-                end=end_location,
-                duration=float(row["duration"]),
+    lookup = _index_locations(locations)
+    for starts, ends, durations in _route_chunks(path, chunk_size):
+        # Locations missing from the lookup are created once and then reused
+        for names in (starts, ends):
+            for name in names:
+                if name not in lookup:
+                    lookup[name] = Location(name=name)
+        points_of_interest.add_routes(
+            zip(
+                [lookup[name] for name in starts],
+                [lookup[name] for name in ends],
+                durations.tolist(),
             )
+        )
     return points_of_interest
+
+
+def read_compiled(
+    path: str,
+    locations: list | dict | None = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> CompiledGraph:
+    """
+    Read a CSV straight into a CompiledGraph, without building a Map or any
+    per-route objects. The result matches read_routes(...).compile() up to the
+    order of each location's routes.
+    NOTE: Makes assumptions about the CSV header titles and data types
+
+    Parameters
+    ----------
+    path: str
+        Path to the CSV file
+    locations: list | dict | None
+        Location objects providing coordinates, as a list or as a dictionary
+        keyed by name
+    chunk_size: int
+        Number of rows to parse at a time
+
+    Returns
+    -------
+    CompiledGraph object
+    """
+    lookup = _index_locations(locations)
+    # Node IDs in order of first appearance, as in Map.compile
+    ids = {}
+    start_chunks, end_chunks, duration_chunks = [], [], []
+    for starts, ends, durations in _route_chunks(path, chunk_size):
+        # Only the distinct names of a chunk are numbered in Python
+        for name in dict.fromkeys(chain.from_iterable(zip(starts, ends))):
+            if name not in ids:
+                ids[name] = len(ids)
+        start_chunks.append(np.fromiter(map(ids.__getitem__, starts), dtype=np.int64))
+        end_chunks.append(np.fromiter(map(ids.__getitem__, ends), dtype=np.int64))
+        duration_chunks.append(durations)
+    n = len(ids)
+    starts = np.concatenate(start_chunks or [np.zeros(0, dtype=np.int64)])
+    ends = np.concatenate(end_chunks or [np.zeros(0, dtype=np.int64)])
+    durations = np.concatenate(duration_chunks or [np.zeros(0)])
+
+    # A later row for the same pair of locations replaces the earlier one
+    keys = np.minimum(starts, ends) * n + np.maximum(starts, ends)
+    _, last = np.unique(keys[::-1], return_index=True)
+    keep = np.sort(len(keys) - 1 - last)
+    starts, ends, durations = starts[keep], ends[keep], durations[keep]
+    # Store both directions of every route, and each loop only once
+    reverse = starts != ends
+    names = list(ids)
+    known = [lookup.get(name) for name in names]
+    return CompiledGraph.from_edges(
+        names=names,
+        starts=np.concatenate([starts, ends[reverse]]),
+        ends=np.concatenate([ends, starts[reverse]]),
+        weights=np.concatenate([durations, durations[reverse]]),
+        latitudes=[
+            np.nan if l is None or l.latitude is None else l.latitude for l in known
+        ],
+        longitudes=[
+            np.nan if l is None or l.longitude is None else l.longitude for l in known
+        ],
+    )
+
+
+def convert_csv(
+    routes_path: str,
+    path: str,
+    locations_path: str | None = None,
+    time_units: str = "minutes",
+    chunk_size: int = CHUNK_SIZE,
+):
+    """
+    Convert route and location CSVs into a binary map file for Map.load.
+
+    Parameters
+    ----------
+    routes_path: str
+        Path to the routes CSV file
+    path: str
+        Path to the binary file to write
+    locations_path: str | None
+        Path to the locations CSV file, if any
+    time_units: str
+        The units of the route durations
+    chunk_size: int
+        Number of rows to parse at a time
+    """
+    locations = None if locations_path is None else read_locations(locations_path)
+    graph = read_compiled(routes_path, locations=locations, chunk_size=chunk_size)
+    graph.save(path, time_units=time_units, max_speed=None)
+
+
+def _index_locations(locations: list | dict | None) -> dict[str, Location]:
+    """
+    Key locations by name for constant-time lookup.
+
+    Parameters
+    ----------
+    locations: list | dict | None
+        Location objects as a list or as a dictionary keyed by name
+
+    Returns
+    -------
+    Dictionary of location name to Location object
+    """
+    if locations is None:
+        return {}
+    if isinstance(locations, dict):
+        return dict(locations)
+    return {location.name: location for location in locations}
+
+
+def _route_chunks(
+    path: str, chunk_size: int
+) -> Iterator[tuple[list[str], list[str], np.ndarray]]:
+    """
+    Stream the routes of a CSV in chunks of rows.
+
+    Parameters
+    ----------
+    path: str
+        Path to the CSV file
+    chunk_size: int
+        Number of rows per chunk
+
+    Returns
+    -------
+    Generator of (start names, end names, durations) for each chunk
+    """
+    with open(path, "r", newline="") as f:
+        # Blank lines are skipped, as with DictReader
+        rows = filter(None, reader(f))
+        header = next(rows, [])
+        try:
+            columns = [header.index(title) for title in ("start", "end", "duration")]
+        except ValueError:
+            raise ValueError(
+                f"Expected start, end and duration columns in {path}, got {header}"
+            ) from None
+        count = 0
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                break
+            try:
+                starts, ends, durations = ([row[i] for row in chunk] for i in columns)
+                durations = np.array(durations, dtype=np.float64)
+            except (IndexError, ValueError) as e:
+                raise ValueError(
+                    f"Invalid route in rows {count + 1} to {count + len(chunk)} of {path}: {e}"
+                ) from e
+            yield starts, ends, durations
+            count += len(chunk)
@@ -0,0 +1,177 @@
+from __future__ import annotations
+import numpy as np
+from route_calc.map import Map
+from route_calc.location import Location
+from route_calc.graph import CompiledGraph
+from route_calc.geo import great_circle_heuristic
+from route_calc.search import Route, ShortestPathTree, astar, bidirectional
+
+
+class Scenario:
+    """
+    Alternative route durations overlaid on a Map, such as one traffic scenario.
+    Shares the map's locations and routes, and holds only the durations.
+    """
+
+    def __init__(
+        self,
+        map: Map,
+        weights: np.ndarray | None = None,
+        changes: dict[tuple, float] | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        map: Map
+            The base map
+        weights: np.ndarray | None
+            Duration of every route, aligned with the weights of map.compile().
+            Shared rather than copied. Defaults to a copy of the map's own
+            durations, so that later updates to the map do not change the scenario.
+        changes: dict[tuple, float] | None
+            Durations of changed routes as {(start, end): duration}, applied in
+            both directions on top of weights
+        """
+        self.map = map
+        self.base = map.compile()
+        self.time_units = map.time_units
+        if weights is not None and np.shape(weights) != self.base.weights.shape:
+            raise ValueError(
+                f"Expected {self.base.n_routes} route durations, got {np.shape(weights)}"
+            )
+        # The map updates its compiled weights in place, so keep a copy of them
+        if weights is None:
+            self._weights = self.base.weights.copy()
+        else:
+            self._weights = np.asarray(weights, dtype=np.float64)
+        self.changes = dict(changes) if changes else {}
+        self._graph = None
+
+    def __repr__(self):
+        return f"Scenario of {self.base.n_nodes} locations and {len(self.changes)} changed routes"
+
+    @property
+    def graph(self) -> CompiledGraph:
+        """The base map's compiled graph with this scenario's durations."""
+        if self._graph is None:
+            weights = self._weights
+            if self.changes:
+                weights = weights.copy()
+                offsets, targets, _ = self.base.as_lists()
+                for (start, end), duration in self.changes.items():
+                    u, v = self._node_id(start), self._node_id(end)
+                    found = False
+                    for a, b in ((u, v), (v, u)):
+                        for i in range(offsets[a], offsets[a + 1]):
+                            if targets[i] == b:
+                                weights[i] = duration
+                                found = True
+                    if not found:
+                        raise KeyError(f"No route between {start} and {end} in map")
+            self._graph = self.base.with_weights(weights)
+        return self._graph
+
+    def route(
+        self, start: Location | str, end: Location | str, method: str = "dijkstra"
+    ) -> Route:
+        """
+        Finds the minimum duration route under this scenario.
+
+        Parameters
+        ----------
+        start: Location | str
+            Starting location
+        end: Location | str
+            Ending location
+        method: str
+            Search algorithm to use: "dijkstra", "bidirectional" or "astar", as in
+            Map.route
+
+        Returns
+        -------
+        Route object holding the duration, path and search statistics
+        """
+        start_id, end_id = self._node_id(start), self._node_id(end)
+        graph = self.graph
+        if method == "astar" and not graph.located:
+            method = "dijkstra"
+        if method == "dijkstra":
+            tree = ShortestPathTree(graph, start_id)
+            settled = tree.settle(end_id)
+            duration, path = tree.duration(end_id), tree.path(end_id)
+        elif method == "bidirectional":
+            duration, path, settled = bidirectional(graph, start_id, end_id)
+        elif method == "astar":
+            duration, path, settled = astar(
+                graph,
+                start_id,
+                end_id,
+                great_circle_heuristic(graph, end_id, max_speed=self.map.max_speed),
+            )
+        else:
+            raise ValueError(f"Unknown search method {method}")
+        return Route(
+            duration=duration,
+            path=[graph.location(i) for i in path],
+            settled=settled,
+        )
+
+    def calculate_duration(
+        self, start: Location | str, end: Location | str, method: str = "dijkstra"
+    ) -> float:
+        """
+        Calculates the minimum duration required for a route under this scenario.
+
+        Parameters
+        ----------
+        start: Location | str
+            Starting location
+        end: Location | str
+            Ending location
+        method: str
+            Search algorithm to use, as in Scenario.route
+
+        Returns
+        -------
+        Minimum duration from start to end as a float
+        """
+        return self.route(start, end, method=method).duration
+
+    def construct_path(
+        self, start: Location | str, end: Location | str, method: str = "dijkstra"
+    ) -> list:
+        """
+        Reconstructs the path from start to end under this scenario.
+
+        Parameters
+        ----------
+        start: Location | str
+            Starting location
+        end: Location | str
+            Ending location
+        method: str
+            Search algorithm to use, as in Scenario.route
+
+        Returns
+        -------
+        List of locations from start to end
+        """
+        return self.route(start, end, method=method).path
+
+    def _node_id(self, location: Location | str) -> int:
+        """
+        Look up the node ID of a location in the base graph.
+
+        Parameters
+        ----------
+        location: Location | str
+            Location or location name
+
+        Returns
+        -------
+        Node ID as an integer
+        """
+        name = location.name if isinstance(location, Location) else location
+        if name not in self.base.index:
+            raise KeyError(f"Location {location} not in map")
+        return self.base.index[name]
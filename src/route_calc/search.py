@@ -0,0 +1,806 @@
+from __future__ import annotations
+import heapq
+from typing import Callable
+from dataclasses import dataclass, field
+from route_calc.location import Location
+from route_calc.graph import CompiledGraph
+
+
+@dataclass
+class Route:
+    """
+    The result of a single route query.
+
+    Attributes
+    ----------
+    duration: float
+        Minimum duration from start to end (inf if unreachable)
+    path: list[Location]
+        Locations from start to end, empty if unreachable
+    settled: int
+        Number of nodes settled by the search
+    """
+
+    duration: float
+    path: list[Location] = field(default_factory=list)
+    settled: int = 0
+
+
+class ShortestPathTree:
+    """
+    A resumable Dijkstra search from a single source.
+
+    Settled distances and predecessors are kept between calls, so a later query
+    for a farther target continues the search where the last one stopped. When a
+    route's duration changes, update_route repairs only the affected part of the
+    tree.
+    NOTE: Repairs assume every route is stored in both directions with the same
+    duration, so the routes leaving a node are also the routes entering it.
+    """
+
+    def __init__(self, graph: CompiledGraph, source: int):
+        """
+        Parameters
+        ----------
+        graph: CompiledGraph
+            Graph to search
+        source: int
+            Starting node ID
+        """
+        self.graph = graph
+        self.source = source
+        self.distances = {source: 0.0}
+        self.prev = {source: None}
+        self.settled = {}
+        self._counter = 0
+        self._pq = [(0.0, self._counter, source)]
+        self._children = None
+        # Duration of the last settled node, which no settled node exceeds
+        self._radius = float("-inf")
+
+    def __repr__(self):
+        return f"ShortestPathTree from node {self.source} with {len(self.settled)} settled nodes"
+
+    @property
+    def complete(self) -> bool:
+        """Whether every reachable node has been settled."""
+        return not self._pq
+
+    def settle(self, target: int | None = None) -> int:
+        """
+        Continue the search until a target is settled.
+
+        Parameters
+        ----------
+        target: int | None
+            Ending node ID. Explores every reachable node if None.
+
+        Returns
+        -------
+        Number of nodes settled by this call
+        """
+        if target in self.settled:
+            return 0
+        return self._search(target)
+
+    def nearest(self, targets: set[int], k: int = 1) -> tuple[list[int], int]:
+        """
+        Continue the search until k of the targets are settled, which are then
+        the k nearest.
+
+        Parameters
+        ----------
+        targets: set[int]
+            Candidate node IDs
+        k: int
+            Number of targets to find
+
+        Returns
+        -------
+        List of up to k node IDs of targets, nearest first, with fewer only if
+        the rest are unreachable
+        Number of nodes settled by this call
+        """
+        # Every settled node is nearer than every unsettled one
+        found = [t for t in targets if t in self.settled]
+        remaining = set(targets).difference(found)
+        settled = 0
+        while len(found) < k and remaining and self._pq:
+            count = len(self.settled)
+            settled += self._search(any_of=remaining)
+            # Only the last settled node can be one of the remaining targets
+            node = next(reversed(self.settled)) if len(self.settled) > count else None
+            if node in remaining:
+                remaining.discard(node)
+                found.append(node)
+        found.sort(key=self.settled.__getitem__)
+        return found[:k], settled
+
+    def _search(
+        self,
+        target: int | None = None,
+        limit: float = float("inf"),
+        any_of: set[int] | None = None,
+    ) -> int:
+        """
+        Run the search until a target is settled or the next node is no closer
+        than a limit.
+
+        Parameters
+        ----------
+        target: int | None
+            Ending node ID, or None to not stop at any node
+        limit: float
+            Duration at which to stop
+        any_of: set[int] | None
+            Node IDs to stop at, whichever is settled first
+
+        Returns
+        -------
+        Number of nodes settled by this call
+        """
+        offsets, targets, weights = self.graph.as_lists()
+        distances, prev, settled, pq = self.distances, self.prev, self.settled, self._pq
+        children = self._children
+        count = len(settled)
+
+        while pq and pq[0][0] < limit:
+            curr_time, _, curr_node = heapq.heappop(pq)
+
+            # Skip settled nodes and entries made stale by a repair
+            if curr_node in settled or curr_time != distances.get(curr_node):
+                continue
+            settled[curr_node] = curr_time
+            # A repair may settle nodes nearer than the radius, which stays put
+            self._radius = max(self._radius, curr_time)
+
+            for i in range(offsets[curr_node], offsets[curr_node + 1]):
+                neighbor = targets[i]
+                if neighbor in settled:
+                    continue
+                total_time = curr_time + weights[i]
+                if total_time < distances.get(neighbor, float("inf")):
+                    distances[neighbor] = total_time
+                    # Keep the children index of an updated tree current
+                    if children is not None:
+                        if neighbor in prev:
+                            children[prev[neighbor]].discard(neighbor)
+                        children.setdefault(curr_node, set()).add(neighbor)
+                    prev[neighbor] = curr_node
+                    self._counter += 1
+                    heapq.heappush(pq, (total_time, self._counter, neighbor))
+
+            # Stop after relaxing the target so the search can be resumed later
+            if curr_node == target or (any_of is not None and curr_node in any_of):
+                break
+        return len(settled) - count
+
+    def duration(self, target: int) -> float:
+        """
+        Duration from the source to a target, settling it first if necessary.
+
+        Parameters
+        ----------
+        target: int
+            Ending node ID
+
+        Returns
+        -------
+        Minimum duration as a float (inf if unreachable)
+        """
+        self.settle(target)
+        return self.settled.get(target, float("inf"))
+
+    def path(self, target: int) -> list[int]:
+        """
+        Path from the source to a target, settling it first if necessary.
+
+        Parameters
+        ----------
+        target: int
+            Ending node ID
+
+        Returns
+        -------
+        List of node IDs from the source to target, empty if unreachable
+        """
+        self.settle(target)
+        if target not in self.settled:
+            return []
+        return unwind(self.prev, target)
+
+    def update_route(self, u: int, v: int, old: float, new: float):
+        """
+        Repair the tree after the duration of the route between two nodes changed.
+        NOTE: The graph's weights must already hold the new duration.
+
+        Parameters
+        ----------
+        u: int
+            Node ID at one end of the route
+        v: int
+            Node ID at the other end of the route
+        old: float
+            Previous duration of the route
+        new: float
+            New duration of the route
+        """
+        if new > old:
+            self._increase(u, v)
+        elif new < old:
+            self._decrease(u, v, new)
+        else:
+            return
+        # Settle the repaired nodes again, so every settled node stays no farther
+        # than any node still waiting in the queue
+        self._search(limit=self._radius)
+
+    def _increase(self, u: int, v: int):
+        """
+        Repair the tree after a route became slower. Only the subtrees hanging
+        from the route are reset, then reattached to the rest of the tree.
+
+        Parameters
+        ----------
+        u: int
+            Node ID at one end of the route
+        v: int
+            Node ID at the other end of the route
+        """
+        roots = [b for a, b in ((u, v), (v, u)) if b in self.prev and self.prev[b] == a]
+        if not roots:
+            return
+        children = self._children_index()
+        offsets, targets, weights = self.graph.as_lists()
+        distances, prev, settled = self.distances, self.prev, self.settled
+
+        # Every node whose route from the source uses the slower route
+        affected = set()
+        stack = list(roots)
+        while stack:
+            node = stack.pop()
+            affected.add(node)
+            stack.extend(children.pop(node, ()))
+        for node in affected:
+            settled.pop(node, None)
+            del distances[node]
+            children.get(prev.pop(node), set()).discard(node)
+
+        # Reattach each affected node through its best unaffected settled neighbor
+        for node in affected:
+            best, parent = float("inf"), None
+            for i in range(offsets[node], offsets[node + 1]):
+                neighbor = targets[i]
+                if neighbor in settled and settled[neighbor] + weights[i] < best:
+                    best, parent = settled[neighbor] + weights[i], neighbor
+            if parent is not None:
+                self._set_parent(node, parent, best)
+                self._counter += 1
+                heapq.heappush(self._pq, (best, self._counter, node))
+
+    def _decrease(self, u: int, v: int, new: float):
+        """
+        Repair the tree after a route became faster, by propagating the improved
+        durations outward from the route in order. Nodes that end up nearer than
+        the radius are settled, and the rest are only queued at their improved
+        duration, so the repair stays within the explored part of the graph.
+
+        Parameters
+        ----------
+        u: int
+            Node ID at one end of the route
+        v: int
+            Node ID at the other end of the route
+        new: float
+            New duration of the route
+        """
+        self._children_index()
+        offsets, targets, weights = self.graph.as_lists()
+        distances, settled = self.distances, self.settled
+        improved = []
+        for a, b in ((u, v), (v, u)):
+            # An unsettled end relaxes the route itself when it is settled later
+            if a in settled and settled[a] + new < distances.get(b, float("inf")):
+                self._set_parent(b, a, settled[a] + new)
+                heapq.heappush(improved, (distances[b], b))
+
+        while improved:
+            curr_time, curr_node = heapq.heappop(improved)
+            if curr_time != distances[curr_node]:
+                continue
+            if curr_node not in settled and curr_time >= self._radius:
+                # The resumed search relaxes its routes once it is settled
+                self._counter += 1
+                heapq.heappush(self._pq, (curr_time, self._counter, curr_node))
+                continue
+            settled[curr_node] = curr_time
+            for i in range(offsets[curr_node], offsets[curr_node + 1]):
+                neighbor = targets[i]
+                total_time = curr_time + weights[i]
+                if total_time < distances.get(neighbor, float("inf")):
+                    self._set_parent(neighbor, curr_node, total_time)
+                    heapq.heappush(improved, (total_time, neighbor))
+
+    def _children_index(self) -> dict[int, set]:
+        """
+        Children of each node in the tree, built on first use and kept up to date
+        by repairs.
+
+        Returns
+        -------
+        Dictionary of node ID to the set of its children's node IDs
+        """
+        if self._children is None:
+            self._children = {}
+            for node, parent in self.prev.items():
+                if parent is not None:
+                    self._children.setdefault(parent, set()).add(node)
+        return self._children
+
+    def _set_parent(self, node: int, parent: int, duration: float):
+        """
+        Point a node at a new predecessor during a repair.
+
+        Parameters
+        ----------
+        node: int
+            Node ID
+        parent: int
+            Node ID of the new predecessor
+        duration: float
+            Duration from the source through the new predecessor
+        """
+        old = self.prev.get(node)
+        if old is not None:
+            self._children.get(old, set()).discard(node)
+        self.prev[node] = parent
+        self.distances[node] = duration
+        self._children.setdefault(parent, set()).add(node)
+
+
+def settle_targets(
+    graph: CompiledGraph, task: tuple[int, list[int]]
+) -> list[tuple[float, list[int], int]]:
+    """
+    Search from one source until all of its targets are settled.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    task: tuple[int, list[int]]
+        Starting node ID and ending node IDs
+
+    Returns
+    -------
+    List of (duration, path of node IDs, settled count) tuples, one per target
+    """
+    source, targets = task
+    tree = ShortestPathTree(graph, source)
+    results = []
+    for target in targets:
+        settled = tree.settle(target)
+        results.append((tree.duration(target), tree.path(target), settled))
+    return results
+
+
+def bidirectional(
+    graph: CompiledGraph, source: int, target: int
+) -> tuple[float, list[int], int]:
+    """
+    Implementation of bidirectional Dijkstra's algorithm.
+    NOTE: Searches backward on the same graph, which is valid because every route
+    is stored in both directions with the same duration.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    source: int
+        Starting node ID
+    target: int
+        Ending node ID
+
+    Returns
+    -------
+    Minimum duration from source to target as a float (inf if unreachable)
+    List of node IDs from source to target, empty if unreachable
+    Number of nodes settled by both searches
+    """
+    if source == target:
+        return 0.0, [source], 1
+    offsets, targets, weights = graph.as_lists()
+    distances = ({source: 0.0}, {target: 0.0})
+    prev = ({source: None}, {target: None})
+    settled = (set(), set())
+    pqs = ([(0.0, 0, source)], [(0.0, 0, target)])
+    counter = 0
+    best, meeting = float("inf"), None
+
+    while pqs[0] and pqs[1]:
+        # Neither frontier can improve on a path shorter than both radii combined
+        if pqs[0][0][0] + pqs[1][0][0] >= best:
+            break
+        # Expand the side with the smaller radius
+        side = 0 if pqs[0][0][0] <= pqs[1][0][0] else 1
+        curr_time, _, curr_node = heapq.heappop(pqs[side])
+
+        if curr_node in settled[side]:
+            continue
+        settled[side].add(curr_node)
+
+        dist, other = distances[side], distances[1 - side]
+        for i in range(offsets[curr_node], offsets[curr_node + 1]):
+            neighbor = targets[i]
+            if neighbor in settled[side]:
+                continue
+            total_time = curr_time + weights[i]
+            if total_time < dist.get(neighbor, float("inf")):
+                dist[neighbor] = total_time
+                prev[side][neighbor] = curr_node
+                counter += 1
+                heapq.heappush(pqs[side], (total_time, counter, neighbor))
+            # Check for a shorter path through the frontiers' meeting point
+            # (a blocked route of infinite duration may leave neighbor unreached)
+            if neighbor in other and neighbor in dist:
+                if dist[neighbor] + other[neighbor] < best:
+                    best = dist[neighbor] + other[neighbor]
+                    meeting = neighbor
+
+    if meeting is None:
+        return float("inf"), [], len(settled[0]) + len(settled[1])
+    path = unwind(prev[0], meeting) + unwind(prev[1], meeting)[::-1][1:]
+    return best, path, len(settled[0]) + len(settled[1])
+
+
+def astar(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    heuristic: Callable[[int], float],
+) -> tuple[float, list[int], int]:
+    """
+    Implementation of the A* algorithm.
+    NOTE: Assumes the heuristic is consistent, i.e. it never overestimates the
+    remaining duration and obeys the triangle inequality along every route.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    source: int
+        Starting node ID
+    target: int
+        Ending node ID
+    heuristic: Callable[[int], float]
+        Lower bound on the duration from a node ID to the target
+
+    Returns
+    -------
+    Minimum duration from source to target as a float (inf if unreachable)
+    List of node IDs from source to target, empty if unreachable
+    Number of settled nodes
+    """
+    offsets, targets, weights = graph.as_lists()
+    distances = {source: 0.0}
+    prev = {source: None}
+    settled = set()
+    counter = 0
+    pq = [(heuristic(source), counter, source)]
+
+    while pq:
+        _, _, curr_node = heapq.heappop(pq)
+
+        if curr_node in settled:
+            continue
+        settled.add(curr_node)
+
+        if curr_node == target:
+            return distances[target], unwind(prev, target), len(settled)
+        curr_time = distances[curr_node]
+        for i in range(offsets[curr_node], offsets[curr_node + 1]):
+            neighbor = targets[i]
+            if neighbor in settled:
+                continue
+            total_time = curr_time + weights[i]
+            if total_time < distances.get(neighbor, float("inf")):
+                distances[neighbor] = total_time
+                prev[neighbor] = curr_node
+                counter += 1
+                heapq.heappush(
+                    pq, (total_time + heuristic(neighbor), counter, neighbor)
+                )
+    return float("inf"), [], len(settled)
+
+
+def reachable_within(
+    graph: CompiledGraph, sources: list[int], budget: float
+) -> tuple[list[int], list[float]]:
+    """
+    Implementation of Dijkstra's algorithm bounded by a duration budget, from one
+    or more sources at once. Routes leading past the budget are never queued, so
+    the work is proportional to the reachable region.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    sources: list[int]
+        Starting node IDs. Each node is measured from its nearest source.
+    budget: float
+        Maximum duration
+
+    Returns
+    -------
+    List of node IDs within the budget, in order of duration
+    Minimum duration to each of those node IDs
+    """
+    offsets, targets, weights = graph.as_lists()
+    distances = {source: 0.0 for source in sources}
+    settled = {}
+    pq = [(0.0, i, source) for i, source in enumerate(distances) if budget >= 0]
+    counter = len(pq)
+
+    while pq:
+        curr_time, _, curr_node = heapq.heappop(pq)
+
+        if curr_node in settled:
+            continue
+        settled[curr_node] = curr_time
+
+        for i in range(offsets[curr_node], offsets[curr_node + 1]):
+            neighbor = targets[i]
+            if neighbor in settled:
+                continue
+            total_time = curr_time + weights[i]
+            if total_time <= budget and total_time < distances.get(
+                neighbor, float("inf")
+            ):
+                distances[neighbor] = total_time
+                counter += 1
+                heapq.heappush(pq, (total_time, counter, neighbor))
+    return list(settled), list(settled.values())
+
+
+def voronoi(graph: CompiledGraph, sources: list[int]) -> tuple[list[int], list[float]]:
+    """
+    Label every node with its nearest source in a single multi-source Dijkstra
+    search, partitioning the graph into one region per source.
+    NOTE: Durations from each source are also durations to it, because every
+    route is stored in both directions with the same duration.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    sources: list[int]
+        Node IDs of the sources
+
+    Returns
+    -------
+    Index into sources of the nearest source to each node ID, -1 if unreachable
+    Duration from the nearest source to each node ID, inf if unreachable
+    """
+    offsets, targets, weights = graph.as_lists()
+    labels = [-1] * graph.n_nodes
+    durations = [float("inf")] * graph.n_nodes
+    settled = [False] * graph.n_nodes
+    pq = []
+    for i, source in enumerate(sources):
+        if labels[source] < 0:
+            labels[source], durations[source] = i, 0.0
+            pq.append((0.0, len(pq), source))
+    counter = len(pq)
+
+    while pq:
+        curr_time, _, curr_node = heapq.heappop(pq)
+
+        if settled[curr_node]:
+            continue
+        settled[curr_node] = True
+
+        label = labels[curr_node]
+        for i in range(offsets[curr_node], offsets[curr_node + 1]):
+            neighbor = targets[i]
+            if settled[neighbor]:
+                continue
+            total_time = curr_time + weights[i]
+            if total_time < durations[neighbor]:
+                durations[neighbor] = total_time
+                labels[neighbor] = label
+                counter += 1
+                heapq.heappush(pq, (total_time, counter, neighbor))
+    return labels, durations
+
+
+def k_shortest_paths(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    k: int,
+    tree: ShortestPathTree | None = None,
+) -> list[tuple[float, list[int], int]]:
+    """
+    Implementation of Yen's algorithm for the k shortest loopless paths.
+    Each spur search runs on the graph with the root path's nodes and the used
+    routes masked out rather than removed, and only spurs from where a path
+    first left the one it was derived from (Lawler's refinement). The
+    shortest-path tree from the target guides every spur search as an A*
+    heuristic, and answers it outright when its path avoids the mask.
+    NOTE: Treats the tree from the target as distances to it, which is valid
+    because every route is stored in both directions with the same duration.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    source: int
+        Starting node ID
+    target: int
+        Ending node ID
+    k: int
+        Maximum number of paths to find
+    tree: ShortestPathTree | None
+        Shortest-path tree from the target to resume, for example from a cache
+
+    Returns
+    -------
+    List of (duration, path of node IDs, settled count) tuples, shortest first,
+    with fewer than k when no more loopless paths exist
+    """
+    if tree is None:
+        tree = ShortestPathTree(graph, target)
+    settled = tree.settle(source)
+    if source not in tree.settled or k < 1:
+        return []
+    if source == target:
+        return [(0.0, [source], settled)]
+
+    # Each path is kept with the duration to each of its nodes and the index of
+    # its spur node, before which it matches the path it was derived from
+    path = tree.path(source)[::-1]
+    found = [([tree.settled[source] - tree.settled[n] for n in path], path, 0)]
+    results = [(tree.settled[source], path, settled)]
+    candidates, seen, counter = [], {tuple(path)}, 0
+
+    while len(results) < k:
+        durations, path, deviation = found[-1]
+        for i in range(deviation, len(path) - 1):
+            spur, root = path[i], path[: i + 1]
+            # Routes out of the spur node already taken by a path with this root
+            avoid = {p[i + 1] for _, p, _ in found if p[: i + 1] == root}
+            banned = set(root[:-1])
+            settled = tree.settle(spur)
+            detour = tree.path(spur)[::-1]
+            if detour and detour[1] not in avoid and banned.isdisjoint(detour):
+                # The unmasked shortest path from the spur node is allowed
+                spur_durations = [tree.settled[spur] - tree.settled[n] for n in detour]
+            else:
+                spur_durations, detour, searched = _masked_astar(
+                    graph, spur, target, tree, banned, avoid
+                )
+                settled += searched
+            if not detour:
+                continue
+            candidate = root[:-1] + detour
+            if tuple(candidate) in seen:
+                continue
+            seen.add(tuple(candidate))
+            candidate_durations = durations[:i] + [
+                durations[i] + d for d in spur_durations
+            ]
+            counter += 1
+            heapq.heappush(
+                candidates,
+                (
+                    candidate_durations[-1],
+                    counter,
+                    candidate_durations,
+                    candidate,
+                    i,
+                    settled,
+                ),
+            )
+        if not candidates:
+            break
+        duration, _, durations, path, deviation, settled = heapq.heappop(candidates)
+        found.append((durations, path, deviation))
+        results.append((duration, path, settled))
+    return results
+
+
+def _masked_astar(
+    graph: CompiledGraph,
+    source: int,
+    target: int,
+    tree: ShortestPathTree,
+    banned: set,
+    avoid: set,
+) -> tuple[list[float], list[int], int]:
+    """
+    A* search that skips some nodes and some routes out of the source, guided by
+    a shortest-path tree from the target.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to search
+    source: int
+        Starting node ID
+    target: int
+        Ending node ID, the source of tree
+    tree: ShortestPathTree
+        Shortest-path tree from the target. Its settled durations are lower
+        bounds with the mask too, and no unsettled node is nearer than the last
+        settled one.
+    banned: set
+        Node IDs the path may not visit
+    avoid: set
+        Node IDs the path may not step to directly from the source
+
+    Returns
+    -------
+    Duration from the source to each node of the path
+    List of node IDs from source to target, empty if unreachable
+    Number of settled nodes
+    """
+    offsets, targets, weights = graph.as_lists()
+    bounds, radius = tree.settled, tree._radius if tree._pq else float("inf")
+    distances = {source: 0.0}
+    prev = {source: None}
+    settled = set()
+    counter = 0
+    pq = [(bounds.get(source, radius), counter, source)]
+
+    while pq:
+        _, _, curr_node = heapq.heappop(pq)
+
+        if curr_node in settled:
+            continue
+        settled.add(curr_node)
+
+        if curr_node == target:
+            path = unwind(prev, target)
+            return [distances[n] for n in path], path, len(settled)
+        curr_time = distances[curr_node]
+        for i in range(offsets[curr_node], offsets[curr_node + 1]):
+            neighbor = targets[i]
+            if neighbor in settled or neighbor in banned:
+                continue
+            if curr_node == source and neighbor in avoid:
+                continue
+            total_time = curr_time + weights[i]
+            if total_time < distances.get(neighbor, float("inf")):
+                distances[neighbor] = total_time
+                prev[neighbor] = curr_node
+                counter += 1
+                heapq.heappush(
+                    pq, (total_time + bounds.get(neighbor, radius), counter, neighbor)
+                )
+    return [], [], len(settled)
+
+
+def unwind(prev: dict, target: int) -> list[int]:
+    """
+    Follow predecessors back from a target to the source of a search.
+
+    Parameters
+    ----------
+    prev: dict
+        Previous node in shortest path
+    target: int
+        Ending node ID
+
+    Returns
+    -------
+    List of node IDs from the source to target, empty if target was not reached
+    """
+    if target not in prev:
+        return []
+    path = []
+    cur = target
+    while cur is not None:
+        path.append(cur)
+        cur = prev[cur]
+    path.reverse()
+    return path
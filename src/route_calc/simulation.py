@@ -1,4 +1,13 @@
+import numpy as np
+from collections import Counter
+from statistics import NormalDist
+from dataclasses import dataclass, field
 from route_calc.map import Map
+from route_calc.location import Location
+from route_calc.graph import CompiledGraph
+from route_calc.scenario import Scenario
+from route_calc.search import bidirectional
+from route_calc.parallel import map_over_graph
 from random import normalvariate, random, shuffle
 
 
@@ -97,3 +106,760 @@ def simulate_traffic(
                 )
                 counter += 1
     return new_map
+
+
+def simulate_traffic_batch(
+    map: Map,
+    n_scenarios: int,
+    min_delay: float = 1.0,
+    max_delay: float = 1.0,
+    risk: float = 0.0,
+    risk_count: int = 3,
+    seed: int | np.random.Generator | None = None,
+) -> np.ndarray:
+    """
+    Simulate traffic for many scenarios at once, with the same distribution as
+    simulate_traffic but without building a Map per scenario.
+    NOTE: Assumes traffic is the same in both directions!
+
+    Parameters
+    ----------
+    map: Map
+        The map to simulate traffic on
+    n_scenarios: int
+        Number of scenarios to simulate
+    min_delay: float
+        The minimum number by which to scale the amount of random traffic throughout the map routes
+    max_delay: float
+        The maximum number by which to scale the amount of random traffic throughout the map routes
+    risk: float
+        The chance that a route will experience an extreme event, as in simulate_traffic
+    risk_count: int
+        Number of events to apply the risk factor to
+    seed: int | np.random.Generator | None
+        Seed or generator for the random draws
+
+    Returns
+    -------
+    Array of route durations indexed by [scenario, route], aligned with the
+    `weights` of map.compile()
+    """
+    # Assert risk to be bounded between 0 and 1, inclusive
+    assert (
+        risk <= 1 and risk >= 0
+    ), f"Invalid risk factor {risk}. Please use a number between 0 and 1, inclusive"
+
+    return _traffic_weights(
+        map.compile(),
+        np.random.default_rng(seed),
+        n_scenarios,
+        min_delay,
+        max_delay,
+        risk,
+        risk_count,
+    )
+
+
+def simulate_scenarios(
+    map: Map,
+    n_scenarios: int,
+    min_delay: float = 1.0,
+    max_delay: float = 1.0,
+    risk: float = 0.0,
+    risk_count: int = 3,
+    seed: int | np.random.Generator | None = None,
+) -> list[Scenario]:
+    """
+    Simulate traffic for many scenarios as overlays on the map, each holding only
+    its route durations.
+
+    Parameters
+    ----------
+    map: Map
+        The map to simulate traffic on
+    n_scenarios: int
+        Number of scenarios to simulate
+    min_delay: float
+        The minimum number by which to scale the amount of random traffic throughout the map routes
+    max_delay: float
+        The maximum number by which to scale the amount of random traffic throughout the map routes
+    risk: float
+        The chance that a route will experience an extreme event, as in simulate_traffic
+    risk_count: int
+        Number of events to apply the risk factor to
+    seed: int | np.random.Generator | None
+        Seed or generator for the random draws
+
+    Returns
+    -------
+    List of Scenario objects
+    """
+    weights = simulate_traffic_batch(
+        map,
+        n_scenarios,
+        min_delay=min_delay,
+        max_delay=max_delay,
+        risk=risk,
+        risk_count=risk_count,
+        seed=seed,
+    )
+    return [Scenario(map, weights=row) for row in weights]
+
+
+@dataclass
+class DurationDistribution:
+    """
+    The distribution of a route's minimum duration over simulated traffic.
+
+    Attributes
+    ----------
+    durations: np.ndarray
+        Minimum duration in each scenario (inf if blocked)
+    percentiles: dict[float, float]
+        Duration at each requested percentile
+    blocked: float
+        Probability that no route is open
+    paths: dict[tuple, float]
+        Probability of each path, as a tuple of location names, being the fastest
+    """
+
+    durations: np.ndarray
+    percentiles: dict[float, float] = field(default_factory=dict)
+    blocked: float = 0.0
+    paths: dict[tuple, float] = field(default_factory=dict)
+
+
+def route_duration_distribution(
+    map: Map,
+    start: Location | str,
+    end: Location | str,
+    n: int,
+    min_delay: float = 1.0,
+    max_delay: float = 1.0,
+    risk: float = 0.0,
+    risk_count: int = 3,
+    percentiles: tuple[float, ...] = (5, 50, 95),
+    seed: int | None = None,
+    workers: int | None = None,
+    chunk_size: int = 256,
+) -> DurationDistribution:
+    """
+    Monte-Carlo distribution of the minimum duration between two locations under
+    simulated traffic, spread across worker processes.
+    Scenarios are simulated in chunks, each with its own random stream spawned from
+    the seed, so results do not depend on the number of workers.
+
+    Parameters
+    ----------
+    map: Map
+        The map to simulate traffic on
+    start: Location | str
+        Starting location
+    end: Location | str
+        Ending location
+    n: int
+        Number of scenarios to simulate
+    min_delay: float
+        The minimum number by which to scale the amount of random traffic throughout the map routes
+    max_delay: float
+        The maximum number by which to scale the amount of random traffic throughout the map routes
+    risk: float
+        The chance that a route will experience an extreme event, as in simulate_traffic
+    risk_count: int
+        Number of events to apply the risk factor to
+    percentiles: tuple[float, ...]
+        Percentiles of the duration to report, between 0 and 100
+    seed: int | None
+        Seed for the random streams
+    workers: int | None
+        Number of worker processes. Defaults to the number of CPUs.
+    chunk_size: int
+        Number of scenarios simulated per task
+
+    Returns
+    -------
+    DurationDistribution object
+    """
+    # Assert risk to be bounded between 0 and 1, inclusive
+    assert (
+        risk <= 1 and risk >= 0
+    ), f"Invalid risk factor {risk}. Please use a number between 0 and 1, inclusive"
+
+    graph = map.compile()
+    source, target = map._node_id(start), map._node_id(end)
+    sizes = [chunk_size] * (n // chunk_size) + (
+        [n % chunk_size] if n % chunk_size else []
+    )
+    streams = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [
+        (source, target, size, stream, min_delay, max_delay, risk, risk_count)
+        for size, stream in zip(sizes, streams)
+    ]
+
+    durations, paths = [], Counter()
+    for chunk_durations, chunk_paths in map_over_graph(
+        _simulate_routes, tasks, graph, workers=workers
+    ):
+        durations.append(chunk_durations)
+        paths.update(chunk_paths)
+
+    durations = np.concatenate(durations) if durations else np.empty(0)
+    names = graph.names
+    return DurationDistribution(
+        durations=durations,
+        percentiles=(
+            dict(
+                zip(
+                    percentiles,
+                    np.percentile(
+                        durations, percentiles, method="inverted_cdf"
+                    ).tolist(),
+                )
+            )
+            if n
+            else {}
+        ),
+        blocked=float(np.isinf(durations).mean()) if n else 0.0,
+        paths={
+            tuple(names[i] for i in path): count / n
+            for path, count in paths.most_common()
+        },
+    )
+
+
+@dataclass
+class SampleEstimate:
+    """
+    A statistic estimated by adaptive sampling, with its confidence interval.
+
+    Attributes
+    ----------
+    estimate: float
+        Point estimate of the statistic
+    lower: float
+        Lower end of the confidence interval
+    upper: float
+        Upper end of the confidence interval
+    n_samples: int
+        Number of traffic scenarios simulated
+    converged: bool
+        Whether the interval reached the target width before max_samples
+    """
+
+    estimate: float
+    lower: float
+    upper: float
+    n_samples: int
+    converged: bool
+
+    @property
+    def width(self) -> float:
+        """Width of the confidence interval."""
+        return self.upper - self.lower
+
+
+def estimate_route_statistic(
+    map: Map,
+    start: Location | str,
+    end: Location | str,
+    statistic: str = "mean",
+    width: float = 1.0,
+    compare_to: tuple | None = None,
+    confidence: float = 0.95,
+    batch_size: int = 100,
+    max_samples: int = 100_000,
+    common_random_numbers: bool = True,
+    antithetic: bool = False,
+    min_delay: float = 1.0,
+    max_delay: float = 1.0,
+    risk: float = 0.0,
+    risk_count: int = 3,
+    seed: int | np.random.Generator | None = None,
+) -> SampleEstimate:
+    """
+    Estimate a statistic of a route's minimum duration under simulated traffic,
+    drawing scenarios in batches until its confidence interval is narrow enough.
+
+    Parameters
+    ----------
+    map: Map
+        The map to simulate traffic on
+    start: Location | str
+        Starting location
+    end: Location | str
+        Ending location
+    statistic: str
+        "mean" for the mean duration of open routes, "p95" for the 95th percentile
+        of the duration (inf when blocked), or "blocked" for the probability that
+        no route is open
+    width: float
+        Target width of the confidence interval
+    compare_to: tuple | None
+        A second (map, start, end) route. If given, the statistic is the
+        difference between the first route and this one ("mean" and "blocked"
+        only). The mean difference uses scenarios where both routes are open.
+    confidence: float
+        Confidence level of the interval
+    batch_size: int
+        Number of scenarios drawn between checks of the interval, at least 2 with
+        antithetic sampling
+    max_samples: int
+        Maximum number of scenarios to draw
+    common_random_numbers: bool
+        Simulate both routes of a comparison under the same traffic, which reduces
+        the variance of the difference. Routes are matched between the maps by
+        the names of their ends, and routes only in the second map get draws of
+        their own.
+    antithetic: bool
+        Pair every scenario with its mirror image, with negated normal draws and
+        complemented uniform draws ("mean" and "blocked" only)
+    min_delay: float
+        The minimum number by which to scale the amount of random traffic throughout the map routes
+    max_delay: float
+        The maximum number by which to scale the amount of random traffic throughout the map routes
+    risk: float
+        The chance that a route will experience an extreme event, as in simulate_traffic
+    risk_count: int
+        Number of events to apply the risk factor to
+    seed: int | np.random.Generator | None
+        Seed or generator for the random draws
+
+    Returns
+    -------
+    SampleEstimate object
+    """
+    # Assert risk to be bounded between 0 and 1, inclusive
+    assert (
+        risk <= 1 and risk >= 0
+    ), f"Invalid risk factor {risk}. Please use a number between 0 and 1, inclusive"
+    if statistic not in ("mean", "p95", "blocked"):
+        raise ValueError(f"Unknown statistic {statistic}")
+    if statistic == "p95" and (compare_to is not None or antithetic):
+        raise ValueError("p95 supports neither comparisons nor antithetic sampling")
+    if batch_size < (2 if antithetic else 1):
+        raise ValueError(f"Invalid batch size {batch_size}")
+
+    routes = [(map, start, end)] + ([compare_to] if compare_to is not None else [])
+    routes = [(m.compile(), m._node_id(s), m._node_id(e)) for m, s, e in routes]
+    # Each map reads its routes' draws from these columns of the shared draws
+    if common_random_numbers and len(routes) == 2:
+        columns, n_columns = _match_routes(routes[0][0], routes[1][0])
+    else:
+        columns, n_columns = [None] * len(routes), None
+
+    rng = np.random.default_rng(seed)
+    z = NormalDist().inv_cdf((1 + confidence) / 2)
+    # The running moments of the mean and blocked statistics take constant
+    # memory, while the order statistics of p95 need every duration
+    moments, durations, n_samples = (0, 0.0, 0.0), [], 0
+    while True:
+        size = batch_size // 2 if antithetic else batch_size
+        # Each row holds one sample per route, or one antithetic pair per route
+        batch = np.empty((size, len(routes), 2 if antithetic else 1))
+        shared = None
+        for r, (graph, source, target) in enumerate(routes):
+            if shared is None or not common_random_numbers:
+                if n_columns is None:
+                    draws = _draw_traffic(rng, size, graph.route_ids()[1], risk_count)
+                else:
+                    draws = _draw_traffic(rng, size, n_columns, risk_count)
+                shared = [draws] + ([_antithetic(draws)] if antithetic else [])
+            for k, draws in enumerate(shared):
+                multipliers = _traffic_multipliers(draws, min_delay, max_delay, risk)
+                if columns[r] is not None:
+                    multipliers = multipliers[:, columns[r]]
+                weights = _apply_multipliers(graph, multipliers)
+                batch[:, r, k] = [
+                    bidirectional(graph.with_weights(row), source, target)[0]
+                    for row in weights
+                ]
+        n_samples += batch.size // len(routes)
+
+        if statistic == "p95":
+            durations.append(batch.ravel())
+            estimate, lower, upper = _quantile_interval(
+                np.concatenate(durations), 0.95, z
+            )
+        else:
+            moments = _update_moments(moments, _scenario_values(batch, statistic))
+            wilson = statistic == "blocked" and batch.shape[1:] == (1, 1)
+            estimate, lower, upper = _confidence_interval(moments, z, wilson)
+        converged = upper - lower <= width
+        if converged or n_samples >= max_samples:
+            return SampleEstimate(
+                estimate=estimate,
+                lower=lower,
+                upper=upper,
+                n_samples=n_samples,
+                converged=converged,
+            )
+
+
+def _match_routes(
+    first: CompiledGraph, second: CompiledGraph
+) -> tuple[list[np.ndarray], int]:
+    """
+    Match the undirected routes of two graphs by the names of their ends, so
+    that common random numbers put the same traffic on the same roads.
+
+    Parameters
+    ----------
+    first: CompiledGraph
+        Graph whose route IDs number the first columns
+    second: CompiledGraph
+        Graph to match against the first
+
+    Returns
+    -------
+    Column of the shared draws for each route ID of either graph
+    Number of columns, with one more for each route only in the second graph
+    """
+    route_ids, count = first.route_ids()
+    starts = np.repeat(np.arange(first.n_nodes), np.diff(first.offsets))
+    known = dict(zip(zip(starts.tolist(), first.targets.tolist()), route_ids.tolist()))
+
+    route_ids, n_routes = second.route_ids()
+    starts = np.repeat(np.arange(second.n_nodes), np.diff(second.offsets))
+    names, index = second.names, first.index
+    columns = [-1] * n_routes
+    for u, v, route in zip(
+        starts.tolist(), second.targets.tolist(), route_ids.tolist()
+    ):
+        if columns[route] >= 0:
+            continue
+        column = known.get((index.get(names[u]), index.get(names[v])))
+        if column is None:
+            column, count = count, count + 1
+        columns[route] = column
+    own = np.arange(first.route_ids()[1])
+    return [own, np.array(columns, dtype=np.int64)], count
+
+
+def _antithetic(draws: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Mirror image of a set of traffic draws, negatively correlated with it.
+
+    Parameters
+    ----------
+    draws: dict[str, np.ndarray]
+        Random draws from _draw_traffic
+
+    Returns
+    -------
+    Dictionary of draws with negated normals and complemented uniforms
+    """
+    return {
+        "normal": -draws["normal"],
+        "risk": 1 - draws["risk"],
+        "blockage": 1 - draws["blockage"],
+        "positions": draws["positions"],
+    }
+
+
+def _scenario_values(samples: np.ndarray, statistic: str) -> np.ndarray:
+    """
+    One value per scenario, whose mean is the statistic.
+
+    Parameters
+    ----------
+    samples: np.ndarray
+        Durations indexed by [scenario, route, antithetic pair member]
+    statistic: str
+        "mean" or "blocked"
+
+    Returns
+    -------
+    Array of values
+    """
+    if statistic == "blocked":
+        values = np.isinf(samples).astype(np.float64)
+    else:
+        # Mean durations are taken over scenarios where every route is open
+        values = samples[np.isfinite(samples).all(axis=(1, 2))]
+    # Differences between routes, averaged over each antithetic pair
+    if values.shape[1] == 2:
+        values = values[:, 0] - values[:, 1]
+    else:
+        values = values[:, 0]
+    return values.mean(axis=1)
+
+
+def _update_moments(
+    moments: tuple[int, float, float], values: np.ndarray
+) -> tuple[int, float, float]:
+    """
+    Merge a batch of values into running moments, with the pairwise update of
+    Chan, Golub and LeVeque, which stays accurate for large means.
+
+    Parameters
+    ----------
+    moments: tuple[int, float, float]
+        Count, mean and sum of squared deviations from the mean so far
+    values: np.ndarray
+        Values of the batch
+
+    Returns
+    -------
+    Updated count, mean and sum of squared deviations
+    """
+    count, mean, m2 = moments
+    n = len(values)
+    if not n:
+        return moments
+    batch_mean = float(values.mean())
+    total = count + n
+    delta = batch_mean - mean
+    mean += delta * n / total
+    m2 += float(((values - batch_mean) ** 2).sum()) + delta**2 * count * n / total
+    return total, mean, m2
+
+
+def _confidence_interval(
+    moments: tuple[int, float, float], z: float, wilson: bool = False
+) -> tuple[float, float, float]:
+    """
+    Estimate a mean and its normal-approximation confidence interval.
+
+    Parameters
+    ----------
+    moments: tuple[int, float, float]
+        Count, mean and sum of squared deviations from the mean of the values
+    z: float
+        Standard normal quantile of the confidence level
+    wilson: bool
+        Use the Wilson score interval for a proportion
+
+    Returns
+    -------
+    Estimate, lower and upper end of the interval
+    """
+    n, estimate, m2 = moments
+    if n < 2:
+        return float("nan"), -float("inf"), float("inf")
+    if wilson:
+        # Wilson score interval, which stays honest when no blockage is observed
+        center = (estimate + z**2 / (2 * n)) / (1 + z**2 / n)
+        half_width = (
+            z
+            * np.sqrt(estimate * (1 - estimate) / n + z**2 / (4 * n**2))
+            / (1 + z**2 / n)
+        )
+        return estimate, float(center - half_width), float(center + half_width)
+    half_width = z * float(np.sqrt(m2 / (n - 1))) / np.sqrt(n)
+    return estimate, estimate - half_width, estimate + half_width
+
+
+def _quantile_interval(
+    durations: np.ndarray, q: float, z: float
+) -> tuple[float, float, float]:
+    """
+    Estimate a quantile and its distribution-free confidence interval, from the
+    order statistics around it.
+
+    Parameters
+    ----------
+    durations: np.ndarray
+        Sampled durations
+    q: float
+        Quantile, between 0 and 1
+    z: float
+        Standard normal quantile of the confidence level
+
+    Returns
+    -------
+    Estimate, lower and upper end of the interval
+    """
+    durations = np.sort(durations)
+    n = len(durations)
+    spread = z * np.sqrt(n * q * (1 - q))
+    lo = int(np.clip(np.floor(q * n - spread), 0, n - 1))
+    hi = int(np.clip(np.ceil(q * n + spread), 0, n - 1))
+    estimate = float(np.quantile(durations, q, method="inverted_cdf"))
+    return estimate, float(durations[lo]), float(durations[hi])
+
+
+def _simulate_routes(graph: CompiledGraph, task: tuple) -> tuple[np.ndarray, Counter]:
+    """
+    Simulate one chunk of scenarios and search each for the minimum duration route.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph shared by every chunk
+    task: tuple
+        Starting and ending node IDs, number of scenarios, seed sequence and the
+        traffic parameters
+
+    Returns
+    -------
+    Minimum duration in each scenario
+    Count of each path of node IDs, blocked scenarios excluded
+    """
+    source, target, size, stream, min_delay, max_delay, risk, risk_count = task
+    weights = _traffic_weights(
+        graph,
+        np.random.default_rng(stream),
+        size,
+        min_delay,
+        max_delay,
+        risk,
+        risk_count,
+    )
+    durations = np.empty(size)
+    paths = Counter()
+    for i, row in enumerate(weights):
+        durations[i], path, _ = bidirectional(graph.with_weights(row), source, target)
+        if path:
+            paths[tuple(path)] += 1
+    return durations, paths
+
+
+def _traffic_weights(
+    graph: CompiledGraph,
+    rng: np.random.Generator,
+    n_scenarios: int,
+    min_delay: float,
+    max_delay: float,
+    risk: float,
+    risk_count: int,
+) -> np.ndarray:
+    """
+    Simulate route durations for a batch of traffic scenarios.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to simulate traffic on
+    rng: np.random.Generator
+        Random number generator
+    n_scenarios: int
+        Number of scenarios
+    min_delay: float
+        The minimum number by which to scale the amount of random traffic
+    max_delay: float
+        The maximum number by which to scale the amount of random traffic
+    risk: float
+        The chance that a route will experience an extreme event
+    risk_count: int
+        Number of events to apply the risk factor to
+
+    Returns
+    -------
+    Array of route durations indexed by [scenario, route]
+    """
+    draws = _draw_traffic(rng, n_scenarios, graph.route_ids()[1], risk_count)
+    return _apply_multipliers(
+        graph, _traffic_multipliers(draws, min_delay, max_delay, risk)
+    )
+
+
+def _apply_multipliers(graph: CompiledGraph, multipliers: np.ndarray) -> np.ndarray:
+    """
+    Scale a graph's route durations by per-route traffic multipliers.
+
+    Parameters
+    ----------
+    graph: CompiledGraph
+        Graph to simulate traffic on
+    multipliers: np.ndarray
+        Multipliers indexed by [scenario, undirected route ID]
+
+    Returns
+    -------
+    Array of route durations indexed by [scenario, route]
+    """
+    route_ids, number_of_routes = graph.route_ids()
+    if multipliers.shape[1] != number_of_routes:
+        raise ValueError(
+            f"Expected multipliers for {number_of_routes} routes, got {multipliers.shape[1]}"
+        )
+    # Both directions of a route share its multiplier
+    with np.errstate(invalid="ignore"):
+        return graph.weights * multipliers[:, route_ids]
+
+
+def _draw_traffic(
+    rng: np.random.Generator, n_scenarios: int, number_of_routes: int, risk_count: int
+) -> dict[str, np.ndarray]:
+    """
+    Draw the standard random numbers behind a batch of traffic scenarios.
+
+    Parameters
+    ----------
+    rng: np.random.Generator
+        Random number generator
+    n_scenarios: int
+        Number of scenarios
+    number_of_routes: int
+        Number of undirected routes
+    risk_count: int
+        Number of routes the risk factor applies to
+
+    Returns
+    -------
+    Dictionary of standard normal draws for every route, then uniform risk and
+    blockage draws and distinct random positions for the routes at risk
+    """
+    risk_count = max(0, min(risk_count, number_of_routes))
+    # simulate_traffic shuffles all multipliers, but only the routes at risk are
+    # distributed differently, so it suffices to scatter those to random positions.
+    # Floyd's algorithm picks risk_count distinct positions per scenario.
+    positions = np.empty((n_scenarios, risk_count), dtype=np.int64)
+    for j in range(risk_count):
+        high = number_of_routes - risk_count + j
+        candidates = rng.integers(0, high + 1, size=n_scenarios)
+        taken = (positions[:, :j] == candidates[:, None]).any(axis=1)
+        positions[:, j] = np.where(taken, high, candidates)
+    return {
+        "normal": rng.standard_normal((n_scenarios, number_of_routes)),
+        "risk": rng.random((n_scenarios, risk_count)),
+        "blockage": rng.random((n_scenarios, risk_count)),
+        "positions": positions,
+    }
+
+
+def _traffic_multipliers(
+    draws: dict[str, np.ndarray], min_delay: float, max_delay: float, risk: float
+) -> np.ndarray:
+    """
+    Turn standard random draws into traffic multipliers, applying the same
+    clipping, risk and blockage rules as simulate_traffic.
+
+    Parameters
+    ----------
+    draws: dict[str, np.ndarray]
+        Random draws from _draw_traffic
+    min_delay: float
+        The minimum number by which to scale the amount of random traffic
+    max_delay: float
+        The maximum number by which to scale the amount of random traffic
+    risk: float
+        The chance that a route will experience an extreme event
+
+    Returns
+    -------
+    Array of multipliers indexed by [scenario, route]
+    """
+    # Calculate mean and standard deviation for 99.7% containment
+    mean = (min_delay + max_delay) / 2
+    stdev = (max_delay - min_delay) / 6
+    multipliers = mean + stdev * draws["normal"]
+
+    # Routes at risk are not capped at the maximum delay
+    positions = draws["positions"]
+    at_risk = np.take_along_axis(multipliers, positions, axis=1)
+    # Hard-coding a 20% chance an extreme event will be a blockage
+    at_risk = np.where(draws["blockage"] < 0.2, np.inf, at_risk + 10)
+    np.minimum(multipliers, max_delay, out=multipliers)
+    np.put_along_axis(
+        multipliers,
+        positions,
+        np.where(
+            draws["risk"] < risk,
+            at_risk,
+            np.take_along_axis(multipliers, positions, axis=1),
+        ),
+        axis=1,
+    )
+    np.maximum(multipliers, min_delay, out=multipliers)
+    return multipliers
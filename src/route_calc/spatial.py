@@ -0,0 +1,439 @@
+from __future__ import annotations
+import numpy as np
+from route_calc.geo import EARTH_RADIUS
+
+# Average number of points per occupied grid cell
+POINTS_PER_CELL = 2
+# Queries with no k points within a ring of this many cells are compared
+# against every point instead
+MAX_RING_CELLS = 4096
+
+
+class SpatialIndex:
+    """
+    A uniform grid over points on the Earth for nearest-neighbor and radius queries.
+
+    Points are stored as unit vectors in 3D, where the straight-line (chord)
+    distance ranks points exactly as the great-circle distance does, at any scale
+    and across the antimeridian. Queries work on whole arrays of points at once.
+    """
+
+    def __init__(
+        self,
+        latitudes: np.ndarray,
+        longitudes: np.ndarray,
+        nodes: np.ndarray | None = None,
+    ):
+        """
+        Parameters
+        ----------
+        latitudes: np.ndarray
+            Latitude of each point, in degrees. Points with NaN are left out.
+        longitudes: np.ndarray
+            Longitude of each point, in degrees
+        nodes: np.ndarray | None
+            Node ID of each point, returned by queries. Defaults to the positions.
+        """
+        latitudes = np.asarray(latitudes, dtype=np.float64)
+        longitudes = np.asarray(longitudes, dtype=np.float64)
+        if nodes is None:
+            nodes = np.arange(len(latitudes))
+        located = ~(np.isnan(latitudes) | np.isnan(longitudes))
+        points = _unit_vectors(latitudes[located], longitudes[located])
+        nodes = np.asarray(nodes, dtype=np.int64)[located]
+
+        # Rotate so the points' mean direction is the last axis. A regional map
+        # then lies flat in one layer of cells, and rotating keeps distances.
+        normal = points.sum(axis=0)
+        if not np.linalg.norm(normal) > 0:
+            normal = np.array([0.0, 0.0, 1.0])
+        normal /= np.linalg.norm(normal)
+        # Line the other axes up with east and north, as maps tend to be
+        first = np.cross([0.0, 0.0, 1.0], normal)
+        if not np.linalg.norm(first) > 1e-9:
+            first = np.array([1.0, 0.0, 0.0]) - normal[0] * normal
+        first /= np.linalg.norm(first)
+        self.rotation = np.stack([first, np.cross(normal, first), normal])
+        points = points @ self.rotation.T
+
+        # Size the cells by the area the points span, as they lie on a surface
+        self.origin = points.min(axis=0) if len(points) else np.zeros(3)
+        self.upper = points.max(axis=0) if len(points) else np.zeros(3)
+        extent = self.upper - self.origin
+        area = np.prod(np.sort(extent)[1:])
+        self.cell_size = float(np.sqrt(area * POINTS_PER_CELL / max(len(points), 1)))
+        if not self.cell_size > 0:
+            self.cell_size = 1.0
+        self.shape = (extent // self.cell_size).astype(np.int64) + 1
+
+        # Sort the points by cell, with the range of each occupied cell
+        keys = self._keys(self._cell_coords(points))
+        order = np.argsort(keys, kind="stable")
+        self.points, self.nodes = points[order], nodes[order]
+        self._cells, self._starts = np.unique(keys[order], return_index=True)
+        self._starts = np.append(self._starts, len(keys))
+
+    def __repr__(self):
+        return f"SpatialIndex of {len(self)} points in {len(self._cells)} cells"
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def nearest(
+        self, latitudes: np.ndarray, longitudes: np.ndarray, k: int = 1
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find the k nearest points to each query point.
+
+        Parameters
+        ----------
+        latitudes: np.ndarray
+            Latitude of each query point, in degrees
+        longitudes: np.ndarray
+            Longitude of each query point, in degrees
+        k: int
+            Number of points to find per query point
+
+        Returns
+        -------
+        Node IDs indexed by [query, rank], nearest first, or -1 past the last point
+        Great-circle distances in kilometers, matching the node IDs (inf for -1)
+        """
+        queries = _unit_vectors(
+            np.atleast_1d(np.asarray(latitudes, dtype=np.float64)),
+            np.atleast_1d(np.asarray(longitudes, dtype=np.float64)),
+        )
+        queries = queries @ self.rotation.T
+        best = np.full((len(queries), k), np.inf)
+        found = np.full((len(queries), k), -1, dtype=np.int64)
+        valid = np.flatnonzero(~np.isnan(queries).any(axis=1)) if len(self) else []
+        if not len(valid) or k < 1:
+            return found, np.full(found.shape, np.inf)
+        # Search outward from the nearest cell of the grid's bounding box until
+        # k points are found, doubling the Chebyshev radius around it each pass
+        clipped = np.clip(queries, self.origin, self.upper)
+        # Query points without coordinates are never searched, but need a cell
+        clipped[np.isnan(clipped).any(axis=1)] = self.origin
+        coords = np.minimum(self._cell_coords(clipped), self.shape - 1)
+        # Rings beyond this one hold no cells of the grid
+        last = np.maximum(coords, self.shape - 1 - coords).max(axis=1)
+        searched = np.full(len(queries), -1, dtype=np.int64)
+        active = valid
+        while len(active):
+            inner = searched[active].min()
+            batch = active[searched[active] == inner]
+            radius = max(2 * inner, inner + 1)
+            # Only offsets that lead into the grid from some query in the batch
+            offsets = _ring(
+                inner,
+                radius,
+                tuple(-coords[batch].max(axis=0)),
+                tuple(self.shape - 1 - coords[batch].min(axis=0)),
+            )
+            if len(offsets) > MAX_RING_CELLS:
+                # Left without a bound, to be compared against every point
+                active = np.setdiff1d(active, batch, assume_unique=True)
+                continue
+            rows = max(1, 2**20 // max(len(offsets), 1))
+            for chunk in np.array_split(batch, -(-len(batch) // rows)):
+                cells = (coords[chunk, None, :] + offsets[None, :, :]).reshape(-1, 3)
+                owners, points = self._points_in(cells)
+                self._merge(queries, chunk, owners // len(offsets), points, best, found)
+            searched[batch] = radius
+            done = (found[batch, -1] >= 0) | (last[batch] <= radius)
+            active = np.setdiff1d(active, batch[done], assume_unique=True)
+
+        # Every point nearer than the k-th found so far lies in the box bounding
+        # the ball of that radius where it meets the grid's bounding box. Far
+        # from the grid the ball only grazes it, so the box stays small.
+        bound = best[valid, -1] * (1 + 1e-9) + 1e-12
+        best[valid], found[valid] = np.inf, -1
+        lo, hi = self._box(queries[valid], clipped[valid], bound)
+        sizes = np.prod(hi - lo + 1, axis=1)
+        # Queries whose box holds more cells than there are points compare all
+        brute = sizes > len(self)
+        rows = max(1, 2**20 // len(self))
+        for chunk in np.array_split(valid[brute], max(1, -(-brute.sum() // rows))):
+            owners = np.repeat(np.arange(len(chunk)), len(self))
+            points = np.tile(np.arange(len(self)), len(chunk))
+            self._merge(queries, chunk, owners, points, best, found)
+        boxed = np.flatnonzero(~brute)
+        ends = np.cumsum(sizes[boxed])
+        groups = (
+            np.searchsorted(ends, np.arange(2**20, ends[-1], 2**20))
+            if len(ends)
+            else []
+        )
+        for chunk in np.split(boxed, groups):
+            owners, cells = _box_cells(lo[chunk], hi[chunk])
+            cell_owners, points = self._points_in(cells)
+            self._merge(queries, valid[chunk], owners[cell_owners], points, best, found)
+
+        distances = 2 * EARTH_RADIUS * np.arcsin(np.minimum(best / 2, 1.0))
+        missing = found < 0
+        return np.where(missing, -1, self.nodes[found]), np.where(
+            missing, np.inf, distances
+        )
+
+    def within_radius(
+        self, latitude: float, longitude: float, radius: float
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Find every point within a great-circle distance of a query point.
+
+        Parameters
+        ----------
+        latitude: float
+            Latitude of the query point, in degrees
+        longitude: float
+            Longitude of the query point, in degrees
+        radius: float
+            Maximum distance in kilometers
+
+        Returns
+        -------
+        Node IDs ordered by distance, nearest first
+        Great-circle distances in kilometers, matching the node IDs
+        """
+        query = _unit_vectors(np.array([latitude]), np.array([longitude]))
+        query = query @ self.rotation.T
+        if not len(self) or np.isnan(query).any():
+            return np.zeros(0, dtype=np.int64), np.zeros(0)
+        chord = 2 * np.sin(min(radius / (2 * EARTH_RADIUS), np.pi / 2))
+        lo, hi = self._box(
+            query, np.clip(query, self.origin, self.upper), np.array([chord])
+        )
+        if np.prod(hi - lo + 1) > len(self):
+            candidates = np.arange(len(self))
+        else:
+            candidates = self._points_in(_box_cells(lo, hi)[1])[1]
+        chords = np.linalg.norm(self.points[candidates] - query, axis=1)
+        distances = 2 * EARTH_RADIUS * np.arcsin(np.minimum(chords / 2, 1.0))
+        inside = distances <= radius
+        candidates, distances = candidates[inside], distances[inside]
+        order = np.argsort(distances, kind="stable")
+        return self.nodes[candidates[order]], distances[order]
+
+    def _merge(
+        self,
+        queries: np.ndarray,
+        active: np.ndarray,
+        ranks: np.ndarray,
+        points: np.ndarray,
+        best: np.ndarray,
+        found: np.ndarray,
+    ):
+        """
+        Merge candidate points into the k best found so far for each query.
+
+        Parameters
+        ----------
+        queries: np.ndarray
+            Unit vectors of all query points
+        active: np.ndarray
+            Positions of the queries being updated
+        ranks: np.ndarray
+            Index into active of the query each candidate is for, in order
+        points: np.ndarray
+            Position of each candidate point
+        best: np.ndarray
+            Chord distances of the best points, updated in place
+        found: np.ndarray
+            Positions of the best points, updated in place
+        """
+        k = best.shape[1]
+        offsets = self.points[points] - queries[active[ranks]]
+        chords = np.sqrt(np.einsum("ij,ij->i", offsets, offsets))
+        ranks = np.concatenate([np.repeat(np.arange(len(active)), k), ranks])
+        chords = np.concatenate([best[active].ravel(), chords])
+        points = np.concatenate([found[active].ravel(), points])
+        # Sort by query then distance in one pass, as chords never exceed 2, then
+        # keep the first k of each query
+        order = np.argsort(ranks * 4.0 + np.minimum(chords, 3.0))
+        firsts = np.searchsorted(ranks[order], np.arange(len(active)))
+        sizes = np.diff(np.append(firsts, len(order)))
+        keep = order[np.arange(len(order)) - np.repeat(firsts, sizes) < k]
+        best[active] = chords[keep].reshape(-1, k)
+        found[active] = points[keep].reshape(-1, k)
+
+    def _box(
+        self, queries: np.ndarray, clipped: np.ndarray, bounds: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Cells bounding the part of each ball around a query point that lies in
+        the grid's bounding box.
+
+        Parameters
+        ----------
+        queries: np.ndarray
+            Unit vectors of the query points, indexed by [query, axis]
+        clipped: np.ndarray
+            Query points clipped to the grid's bounding box
+        bounds: np.ndarray
+            Chord radius of each ball
+
+        Returns
+        -------
+        Lowest cell coordinates of each box, indexed by [query, axis]
+        Highest cell coordinates of each box, indexed by [query, axis]
+        """
+        # Along each axis, a point in the ball and the box is at most as far as
+        # the radius allows after the distance to the box along the other axes
+        gaps = (queries - clipped) ** 2
+        others = gaps.sum(axis=1, keepdims=True) - gaps
+        half = np.sqrt(np.maximum(bounds[:, None] ** 2 - others, 0))
+        lo = self._cell_coords(np.maximum(queries - half, self.origin))
+        hi = self._cell_coords(np.minimum(queries + half, self.upper))
+        return np.clip(lo, 0, self.shape - 1), np.clip(hi, 0, self.shape - 1)
+
+    def _points_in(self, cells: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Positions of the sorted points in each of a list of cells.
+
+        Parameters
+        ----------
+        cells: np.ndarray
+            Cell coordinates indexed by [cell, axis], possibly outside the grid
+
+        Returns
+        -------
+        Index into cells of the cell holding each point, in order
+        Position of each point
+        """
+        starts, ends = self._ranges(cells)
+        counts = ends - starts
+        owners = np.repeat(np.arange(len(cells)), counts)
+        points = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        return owners, points + np.repeat(starts, counts)
+
+    def _cell_coords(self, points: np.ndarray) -> np.ndarray:
+        """
+        Integer grid coordinates of the cells holding points, which may lie
+        outside the grid.
+
+        Parameters
+        ----------
+        points: np.ndarray
+            Unit vectors indexed by [point, axis]
+
+        Returns
+        -------
+        Cell coordinates indexed by [point, axis]
+        """
+        return np.floor((points - self.origin) / self.cell_size).astype(np.int64)
+
+    def _keys(self, coords: np.ndarray) -> np.ndarray:
+        """
+        Flatten cell coordinates inside the grid into single integer keys.
+
+        Parameters
+        ----------
+        coords: np.ndarray
+            Cell coordinates indexed by [cell, axis]
+
+        Returns
+        -------
+        Key of each cell
+        """
+        return (coords[:, 0] * self.shape[1] + coords[:, 1]) * self.shape[2] + coords[
+            :, 2
+        ]
+
+    def _ranges(self, coords: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Range of sorted points in each cell, empty for unoccupied cells.
+
+        Parameters
+        ----------
+        coords: np.ndarray
+            Cell coordinates indexed by [cell, axis], possibly outside the grid
+
+        Returns
+        -------
+        Start of each cell's points
+        End of each cell's points
+        """
+        inside = ((coords >= 0) & (coords < self.shape)).all(axis=1)
+        keys = np.where(inside, self._keys(coords), -1)
+        positions = np.minimum(np.searchsorted(self._cells, keys), len(self._cells) - 1)
+        occupied = inside & (self._cells[positions] == keys)
+        starts = np.where(occupied, self._starts[positions], 0)
+        ends = np.where(occupied, self._starts[positions + 1], 0)
+        return starts, ends
+
+
+def _ring(inner: int, radius: int, lo: tuple, hi: tuple) -> np.ndarray:
+    """
+    Offsets of the cells at a Chebyshev distance from a cell above inner and up
+    to radius, within bounds along each axis.
+
+    Parameters
+    ----------
+    inner: int
+        Chebyshev distance already searched
+    radius: int
+        Chebyshev distance to search up to
+    lo: tuple
+        Smallest offset along each axis
+    hi: tuple
+        Largest offset along each axis
+
+    Returns
+    -------
+    Cell offsets indexed by [cell, axis]
+    """
+    axes = [np.arange(max(-radius, a), min(radius, b) + 1) for a, b in zip(lo, hi)]
+    if np.prod([len(axis) for axis in axes]) > 64 * MAX_RING_CELLS:
+        # Too many to list, and any more than MAX_RING_CELLS are not searched
+        return np.zeros((MAX_RING_CELLS + 1, 3), dtype=np.int64)
+    offsets = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, 3)
+    return offsets[np.abs(offsets).max(axis=1) > inner]
+
+
+def _box_cells(lo: np.ndarray, hi: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """
+    List the cells of boxes of different sizes.
+
+    Parameters
+    ----------
+    lo: np.ndarray
+        Lowest cell coordinates of each box, indexed by [box, axis]
+    hi: np.ndarray
+        Highest cell coordinates of each box, indexed by [box, axis]
+
+    Returns
+    -------
+    Index of the box holding each cell, in order
+    Cell coordinates indexed by [cell, axis]
+    """
+    dims = hi - lo + 1
+    sizes = np.prod(dims, axis=1)
+    owners = np.repeat(np.arange(len(lo)), sizes)
+    i = np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+    dims = dims[owners]
+    steps = np.stack(
+        [i // (dims[:, 1] * dims[:, 2]), i // dims[:, 2] % dims[:, 1], i % dims[:, 2]],
+        axis=1,
+    )
+    return owners, lo[owners] + steps
+
+
+def _unit_vectors(latitudes: np.ndarray, longitudes: np.ndarray) -> np.ndarray:
+    """
+    Points on the unit sphere for coordinates in degrees.
+
+    Parameters
+    ----------
+    latitudes: np.ndarray
+        Latitude of each point
+    longitudes: np.ndarray
+        Longitude of each point
+
+    Returns
+    -------
+    Unit vectors indexed by [point, axis]
+    """
+    phi, lam = np.radians(latitudes), np.radians(longitudes)
+    return np.stack(
+        [np.cos(phi) * np.cos(lam), np.cos(phi) * np.sin(lam), np.sin(phi)], axis=-1
+    )
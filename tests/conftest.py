@@ -0,0 +1,33 @@
+import random
+import pytest
+from route_calc.graph import CompiledGraph
+
+
+@pytest.fixture
+def random_graph():
+    def random_graph(n=60, seed=0):
+        # Random connected graph with both directions of every route stored
+        rng = random.Random(seed)
+        edges = {}
+        for i in range(1, n):
+            edges[(rng.randrange(i), i)] = rng.uniform(1, 10)
+        for _ in range(2 * n):
+            u, v = rng.sample(range(n), 2)
+            edges[(min(u, v), max(u, v))] = rng.uniform(1, 10)
+        starts = [u for u, v in edges] + [v for u, v in edges]
+        ends = [v for u, v in edges] + [u for u, v in edges]
+        weights = list(edges.values()) * 2
+        return CompiledGraph.from_edges(
+            [str(i) for i in range(n)], starts, ends, weights
+        )
+
+    return random_graph
+
+
+@pytest.fixture
+def path_duration():
+    def path_duration(graph, path):
+        # Total duration of a path of node IDs along the graph's routes
+        return sum(dict(graph.neighbors(u))[v] for u, v in zip(path, path[1:]))
+
+    return path_duration
@@ -0,0 +1,26 @@
+from route_calc.components import ComponentIndex
+from route_calc.graph import CompiledGraph
+
+
+def test_component_index():
+    # A and B are joined, C and D only by a blocked route, E stands alone
+    graph = CompiledGraph.from_edges(
+        ["A", "B", "C", "D", "E"],
+        [0, 1, 2, 3],
+        [1, 0, 3, 2],
+        [1.0, 1.0, float("inf"), float("inf")],
+    )
+    index = ComponentIndex.from_graph(graph)
+    assert index.n_components == 4
+    assert index.connected("A", "B")
+    assert not index.connected("C", "D")
+    assert not index.connected("A", "E")
+
+    # New routes join components and add new locations
+    index.add_route("B", "C", 2.0)
+    index.add_route("E", "F", 1.0)
+    index.add_route("F", "G", float("inf"))
+    assert index.connected("A", "C")
+    assert index.connected("E", "F")
+    assert not index.connected("F", "G")
+    assert index.n_components == 4
@@ -0,0 +1,29 @@
+import numpy as np
+from route_calc.graph import CompiledGraph
+from route_calc.geo import great_circle_heuristic, haversine
+
+
+def test_haversine():
+    # Fenway Park to Faneuil Hall is about 3.7 km
+    assert abs(haversine(42.346268, -71.095764, 42.360031, -71.054749) - 3.70) < 0.01
+    assert haversine(10, 20, 10, 20) == 0
+
+    # One degree of latitude is about 111 km anywhere on Earth
+    distances = haversine(np.array([0, 45]), 90, np.array([1, 46]), 90)
+    assert np.allclose(distances, 111.2, atol=0.1)
+
+
+def test_great_circle_heuristic():
+    graph = CompiledGraph.from_edges(
+        names=["A", "B", "C"],
+        starts=[0, 1, 1, 2],
+        ends=[1, 0, 2, 1],
+        weights=[10, 10, 1, 1],
+        latitudes=[0, 1, 2],
+        longitudes=[0, 0, 0],
+    )
+    # The fastest route covers 111 km per time unit
+    heuristic = great_circle_heuristic(graph, 2)
+    assert heuristic(2) == 0
+    assert abs(heuristic(0) - 2) < 1e-6
+    assert abs(great_circle_heuristic(graph, 2, max_speed=222.4)(0) - 1) < 1e-3
@@ -0,0 +1,114 @@
+import pickle
+import pytest
+import numpy as np
+from route_calc.graph import CompiledGraph
+from route_calc.location import Location
+
+
+def test_from_edges():
+    graph = CompiledGraph.from_edges(
+        names=["A", "B", "C"],
+        starts=[1, 0, 2, 0],
+        ends=[0, 1, 0, 2],
+        weights=[5, 5, 10.5, 10.5],
+        latitudes=[1, 2, np.nan],
+        longitudes=[1, 2, np.nan],
+    )
+    assert graph.n_nodes == 3
+    assert graph.n_routes == 4
+    assert graph.index == {"A": 0, "B": 1, "C": 2}
+    assert graph.offsets.tolist() == [0, 2, 3, 4]
+    assert graph.neighbors(0) == [(1, 5.0), (2, 10.5)]
+    assert graph.neighbors(1) == [(0, 5.0)]
+    assert graph.neighbors(2) == [(0, 10.5)]
+
+    # Locations are rebuilt from the coordinate arrays
+    assert graph.location(0) == Location(name="A", latitude=1, longitude=1)
+    assert graph.location(2) == Location(name="C", latitude=None, longitude=None)
+
+
+def test_max_speed():
+    graph = CompiledGraph.from_edges(
+        names=["A", "B", "C"],
+        starts=[0, 1, 1, 2],
+        ends=[1, 0, 2, 1],
+        weights=[10, 10, 1, 1],
+        latitudes=[0, 1, 1],
+        longitudes=[0, 0, 0],
+    )
+    assert graph.located
+    assert abs(graph.max_speed() - 11.12) < 0.01
+
+    # Speeds are unknown without coordinates
+    graph = CompiledGraph.from_edges(["A", "B"], [0, 1], [1, 0], [1, 1])
+    assert not graph.located
+    assert np.isnan(graph.max_speed())
+
+
+def test_route_ids():
+    graph = CompiledGraph.from_edges(
+        names=["A", "B", "C"],
+        starts=[1, 0, 2, 0],
+        ends=[0, 1, 0, 2],
+        weights=[5, 5, 10.5, 10.5],
+    )
+    route_ids, count = graph.route_ids()
+    assert count == 2
+    assert route_ids.tolist() == [0, 1, 0, 1]
+
+
+def test_save_load(tmp_path):
+    graph = CompiledGraph.from_edges(
+        names=["A", "B", "C"],
+        starts=[0, 1, 0, 2, 1, 2],
+        ends=[1, 0, 2, 0, 2, 1],
+        weights=[5, 5, 10.5, 10.5, 2, 2],
+    )
+    path = tmp_path / "graph.bin"
+    graph.save(path, time_units="hours")
+    header = CompiledGraph.read_header(path)
+    assert header["content_hash"] == graph.content_hash()
+    assert header["metadata"] == {"time_units": "hours"}
+
+    for mmap in [True, False]:
+        loaded = CompiledGraph.load(path, mmap=mmap)
+        assert isinstance(loaded.weights.base, np.memmap) == mmap
+        assert loaded.names == graph.names
+        assert [values[:] for values in loaded.as_lists()] == [
+            [0, 2, 4, 6],
+            [1, 2, 0, 2, 0, 1],
+            [5.0, 10.5, 5.0, 2.0, 10.5, 2.0],
+        ]
+        assert np.isnan(loaded.latitudes).all()
+        assert loaded.content_hash() == graph.content_hash()
+
+    # A mapped graph is pickled by path, until it stops matching the file
+    loaded = CompiledGraph.load(path)
+    assert len(pickle.dumps(loaded)) < 1000
+    unpickled = pickle.loads(pickle.dumps(loaded))
+    assert [values[:] for values in unpickled.as_lists()] == list(graph.as_lists())
+    loaded.update_weight(0, 1, 100.0)
+    assert pickle.loads(pickle.dumps(loaded)).neighbors(0) == [(1, 100.0), (2, 10.5)]
+    assert CompiledGraph.load(path).neighbors(0) == [(1, 5.0), (2, 10.5)]
+
+    # Other files are rejected
+    path.write_bytes(b"start,end,duration\n")
+    with pytest.raises(ValueError):
+        CompiledGraph.load(path)
+
+
+def test_with_weights():
+    graph = CompiledGraph.from_edges(
+        names=["A", "B", "C"],
+        starts=[1, 0, 2, 0],
+        ends=[0, 1, 0, 2],
+        weights=[5, 5, 10.5, 10.5],
+    )
+    offsets, targets, _ = graph.as_lists()
+    overlay = graph.with_weights(graph.weights * 2)
+    assert overlay.neighbors(0) == [(1, 10.0), (2, 21.0)]
+    assert graph.neighbors(0) == [(1, 5.0), (2, 10.5)]
+    # The overlay shares the topology lists rather than copying them
+    assert overlay.as_lists()[1] is targets
+    with pytest.raises(ValueError):
+        graph.with_weights(graph.weights[1:])
@@ -0,0 +1,63 @@
+import pytest
+from route_calc.graph import CompiledGraph
+from route_calc.hierarchy import ContractionHierarchy
+from route_calc.map import Map
+from route_calc.location import Location
+from route_calc.search import ShortestPathTree
+
+
+def example_graph():
+    # A-B-C-D takes 3, beating both the direct A-D route and the B-D route.
+    # Locations A to D are numbered 0 to 3.
+    test_map = Map()
+    A, B, C, D = (Location(name=name) for name in "ABCD")
+    test_map.add_route(start=A, end=B, duration=1)
+    test_map.add_route(start=B, end=C, duration=1)
+    test_map.add_route(start=C, end=D, duration=1)
+    test_map.add_route(start=A, end=D, duration=5)
+    test_map.add_route(start=B, end=D, duration=3)
+    return test_map.compile()
+
+
+def test_query():
+    graph = example_graph()
+    hierarchy = ContractionHierarchy.build(graph)
+    assert sorted(hierarchy.rank.tolist()) == [0, 1, 2, 3]
+
+    # Paths through shortcuts are unpacked into the original routes
+    assert hierarchy.query(0, 3)[:2] == (3, [0, 1, 2, 3])
+    assert hierarchy.query(3, 1)[:2] == (2, [3, 2, 1])
+    assert hierarchy.query(2, 2)[:2] == (0, [2])
+
+    # Unreachable targets have no path
+    graph = CompiledGraph.from_edges(["A", "B", "C"], [0, 1], [1, 0], [1, 1])
+    assert ContractionHierarchy.build(graph).query(0, 2)[:2] == (float("inf"), [])
+
+
+def test_random_graph(random_graph, path_duration):
+    # Queries agree with Dijkstra's algorithm on a larger graph
+    graph = random_graph()
+    hierarchy = ContractionHierarchy.build(graph)
+    for source in range(0, graph.n_nodes, 7):
+        tree = ShortestPathTree(graph, source)
+        for target in range(graph.n_nodes):
+            duration, path, settled = hierarchy.query(source, target)
+            assert abs(duration - tree.duration(target)) < 1e-9
+            assert path[0] == source and path[-1] == target
+            assert abs(path_duration(graph, path) - duration) < 1e-9
+
+
+def test_save_load(tmp_path):
+    graph = example_graph()
+    hierarchy = ContractionHierarchy.build(graph)
+    path = tmp_path / "hierarchy.npz"
+    hierarchy.save(path)
+
+    loaded = ContractionHierarchy.load(path, graph=graph)
+    assert loaded.graph_hash == graph.content_hash()
+    assert loaded.n_shortcuts == hierarchy.n_shortcuts
+    assert loaded.query(0, 3) == hierarchy.query(0, 3)
+
+    # Hierarchies of other maps are rejected
+    with pytest.raises(ValueError):
+        ContractionHierarchy.load(path, graph=graph.with_weights(graph.weights * 2))
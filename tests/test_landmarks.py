@@ -0,0 +1,74 @@
+import numpy as np
+from route_calc.graph import CompiledGraph
+from route_calc.landmarks import LandmarkIndex
+from route_calc.map import Map
+from route_calc.location import Location
+from route_calc.matrix import dijkstra_rows, floyd_warshall
+from route_calc.search import astar
+
+
+def test_build():
+    # On a line the two landmarks farthest apart are its ends, A and E
+    test_map = Map()
+    A, B, C, D, E = (Location(name=name) for name in "ABCDE")
+    test_map.add_route(start=A, end=B, duration=1)
+    test_map.add_route(start=B, end=C, duration=2)
+    test_map.add_route(start=C, end=D, duration=3)
+    test_map.add_route(start=D, end=E, duration=4)
+    index = LandmarkIndex.build(test_map.compile(), k=2)
+    assert dict(zip(index.landmarks.tolist(), index.distances.tolist())) == {
+        0: [0, 1, 3, 6, 10],
+        4: [10, 9, 7, 4, 0],
+    }
+    # Bounds between points on the line are exact
+    assert index.lower_bound(1, 3) == 5
+
+
+def test_heuristic():
+    # A cycle A-B-C-D with one landmark at A, which is 0, 1, 3 and 3 away from
+    # A, B, C and D
+    test_map = Map()
+    A, B, C, D = (Location(name=name) for name in "ABCD")
+    test_map.add_route(start=A, end=B, duration=1)
+    test_map.add_route(start=B, end=C, duration=2)
+    test_map.add_route(start=C, end=D, duration=3)
+    test_map.add_route(start=D, end=A, duration=3)
+    graph = test_map.compile()
+    index = LandmarkIndex([0], dijkstra_rows(graph, [0]))
+
+    # Bounds are exact when the landmark lies behind the start, and never
+    # overestimate otherwise
+    assert index.heuristic(2)(1) == 2
+    assert index.heuristic(2)(3) == 0
+    assert index.lower_bound(3, 1) == 2
+
+    # ALT search finds the minimum duration
+    assert astar(graph, 1, 3, index.heuristic(3))[:2] == (4, [1, 0, 3])
+
+    # Separate components are told apart without a search
+    graph = CompiledGraph.from_edges(
+        ["A", "B", "C", "D"], [0, 1, 2, 3], [1, 0, 3, 2], [1, 1, 1, 1]
+    )
+    index = LandmarkIndex.build(graph, k=2)
+    assert index.lower_bound(0, 2) == float("inf")
+    assert index.lower_bound(0, 1) == 1
+
+
+def test_random_graph(random_graph):
+    # Bounds never overestimate on a larger graph, and ALT search stays exact
+    graph = random_graph()
+    index = LandmarkIndex.build(graph, k=4)
+    matrix = floyd_warshall(graph)
+    assert len(set(index.landmarks.tolist())) == 4
+    assert np.allclose(index.distances, matrix[index.landmarks])
+    for target in range(0, graph.n_nodes, 5):
+        heuristic = index.heuristic(target)
+        for node in range(graph.n_nodes):
+            assert heuristic(node) <= matrix[node, target] + 1e-9
+        landmark = int(index.landmarks[0])
+        assert (
+            abs(index.lower_bound(landmark, target) - matrix[landmark, target]) < 1e-9
+        )
+    for source, target in [(0, 59), (12, 40), (33, 7)]:
+        duration, path, _ = astar(graph, source, target, index.heuristic(target))
+        assert abs(duration - matrix[source, target]) < 1e-9
@@ -1,5 +1,7 @@
+import pickle
+import numpy as np
 import pytest
-from route_calc.location import Location
+from route_calc.location import Location, LocationTable, LocationView
 
 
 def test_init():
@@ -52,3 +54,39 @@ def test_eq():
     assert f"Cannot establish equality between Location and {int} objects" == str(
         exception.value
     )
+
+
+def test_slots():
+    test_location = Location(name="Location Name")
+    assert not hasattr(test_location, "__dict__")
+    assert pickle.loads(pickle.dumps(test_location)) == test_location
+
+
+def test_location_table():
+    locations = [
+        Location(name="A", latitude=1.0, longitude=2.0),
+        Location(name="B", latitude=None, longitude=None),
+    ]
+    table = LocationTable.from_locations(locations)
+    assert len(table) == 2
+    assert np.isnan(table.latitudes[1])
+    assert table.index("B") == 1
+    with pytest.raises(KeyError):
+        table.index("C")
+
+    # Views compare, hash and pickle like the locations they stand for
+    views = list(table)
+    assert views == locations
+    assert table[-1] == locations[1]
+    assert isinstance(views[0], LocationView)
+    assert {views[0]: 1}[locations[0]] == 1
+    assert type(pickle.loads(pickle.dumps(views[0]))) is Location
+    assert pickle.loads(pickle.dumps(views[0])) == locations[0]
+
+    # Views read through to the table
+    table.latitudes[0] = 5.0
+    assert views[0].latitude == 5.0
+    with pytest.raises(IndexError):
+        table[2]
+    with pytest.raises(ValueError):
+        LocationTable(names=["A"], latitudes=[1.0, 2.0])
@@ -1,6 +1,9 @@
 import pytest
+import numpy as np
 from route_calc.map import Map
+from route_calc.search import Route
 from route_calc.location import Location
+from route_calc.readers import read_locations, read_routes
 
 
 def test_init():
@@ -89,6 +92,111 @@ def test_add_route():
     }
 
 
+def test_add_routes(capsys):
+    A = Location(name="A", latitude=None, longitude=None)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=None, longitude=None)
+    expected_map = Map()
+    expected_map.add_route(start=A, end=B, duration=5)
+    expected_map.add_route(start=A, end=C, duration=10.5)
+
+    test_map = Map(verbose=True)
+    test_map.add_routes([(A, B, 5), (A, C, 10.5)])
+    assert test_map == expected_map
+    assert test_map._version == 1
+    assert test_map.calculate_duration("B", "C") == 15.5
+    assert capsys.readouterr().out == "Added 2 routes and 3 new locations\n"
+
+    # Arrays of names reuse existing locations
+    test_map = Map()
+    test_map.add_routes(
+        starts=np.array(["A", "A"]), ends=np.array(["B", "C"]), durations=[5, 10.5]
+    )
+    assert test_map == expected_map
+    test_map.add_routes(starts=["C"], ends=[A], durations=np.array([1.0]))
+    assert test_map._locations["C"] is test_map.construct_path("C", "A")[0]
+    assert test_map.calculate_duration("A", "C") == 1
+
+    # No routes leave the map and its cached searches alone
+    for routes in [[], iter([])]:
+        test_map.add_routes(routes)
+    test_map.add_routes(starts=[], ends=[], durations=[])
+    assert test_map._version == 2 and test_map.calculate_duration("A", "C") == 1
+
+    # Repeated routes in either direction follow the duplicate policy
+    routes = [(A, B, 5), (B, A, 3), (A, B, 4)]
+    for duplicates, duration, updated in [("last", 4, 3.5), ("min", 3, 3)]:
+        test_map = Map()
+        test_map.add_routes(routes, duplicates=duplicates)
+        assert test_map._adjacency_list[B][A] == duration
+        test_map.add_routes([("A", "B", 3.5)], duplicates=duplicates)
+        assert test_map._adjacency_list[A][B] == updated
+    test_map = Map()
+    with pytest.raises(ValueError):
+        test_map.add_routes(routes, duplicates="error")
+    test_map.add_routes([(A, B, 5)], duplicates="error")
+    with pytest.raises(ValueError):
+        test_map.add_routes([(A, C, 1), (B, A, 5)], duplicates="error")
+    assert C not in test_map._adjacency_list
+
+    # Routes are given one way or the other
+    with pytest.raises(ValueError):
+        test_map.add_routes([(A, B, 5)], starts=["A"])
+    with pytest.raises(ValueError):
+        test_map.add_routes(starts=["A"], ends=["B"], durations=[1, 2])
+
+
+def test_save_load(tmp_path):
+    city_map = read_routes(
+        "data/routes.csv", locations=read_locations("data/locations.csv")
+    )
+    city_map.time_units = "seconds"
+    path = tmp_path / "city.bin"
+    city_map.save(path)
+
+    # Queries run on the mapped graph without building the routes
+    loaded = Map.load(path)
+    assert loaded.time_units == "seconds"
+    assert loaded._adjacency is None
+    assert repr(loaded) == repr(city_map)
+    start, end = "Fenway Park", "Old North Church"
+    assert loaded.route(start, end) == city_map.route(start, end)
+    assert loaded._adjacency is None
+    # The searches read the mapped arrays rather than private copies of them
+    graph = loaded.compile()
+    assert graph._topology_lists is None and graph._weight_list is None
+    with pytest.raises(KeyError):
+        loaded.route("Fenway Park", "Nowhere")
+
+    # The routes are built when needed
+    assert loaded == city_map
+    loaded.add_route(start=Location(name="A"), end=Location(name="B"), duration=1)
+    assert loaded.calculate_duration("A", "B") == 1
+
+
+def test_compile():
+    test_map = Map()
+    A = Location(name="A", latitude=1, longitude=1)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=3, longitude=3)
+    test_map.add_route(start=A, end=B, duration=5)
+    test_map.add_route(start=A, end=C, duration=10.5)
+
+    graph = test_map.compile()
+    assert graph.names == ["A", "B", "C"]
+    assert graph.offsets.tolist() == [0, 2, 3, 4]
+    assert graph.targets.tolist() == [1, 2, 0, 0]
+    assert graph.weights.tolist() == [5, 10.5, 5, 10.5]
+    assert graph.location(1) is B
+    assert np.isnan(graph.latitudes[1])
+
+    # The snapshot is cached until the map changes
+    assert test_map.compile() is graph
+    test_map.add_route(start=C, end=B, duration=50)
+    assert test_map.compile() is not graph
+    assert test_map.compile().neighbors(2) == [(0, 10.5), (1, 50.0)]
+
+
 def test_calculate_duration():
     # Initialize Map object
     test_map = Map()
@@ -136,6 +244,20 @@ def test_calculate_duration():
     assert test_map.calculate_duration("0", "3") == 9
     assert test_map.calculate_duration("0", "4") == 10
 
+    # Every search method agrees
+    for method in ["dijkstra", "bidirectional", "ch", "alt"]:
+        assert test_map.calculate_duration("0", "3", method=method) == 9
+        assert test_map.construct_path("0", "4", method=method) == [loc0, loc1, loc4]
+    with pytest.raises(ValueError):
+        test_map.calculate_duration("0", "3", method="unknown")
+
+    # Check that KeyErrors are raised for unknown locations
+    with pytest.raises(KeyError) as exception:
+        test_map.calculate_duration("0", "5")
+    assert "Location 5 not in map" in str(exception.value)
+    with pytest.raises(KeyError):
+        test_map.calculate_duration(Location(name="0", latitude=9, longitude=9), "2")
+
 
 def test_construct_path():
     # Initialize Map object
@@ -183,3 +305,344 @@ def test_construct_path():
     assert test_map.construct_path(loc0, loc2) == [loc0, loc1, loc2]
     assert test_map.construct_path(loc0, loc3) == [loc0, loc1, loc2, loc3]
     assert test_map.construct_path(loc0, loc4) == [loc0, loc1, loc4]
+
+
+def test_route():
+    test_map = Map()
+    loc0 = Location(name="0", latitude=0, longitude=0)
+    loc1 = Location(name="1", latitude=1, longitude=1)
+    loc2 = Location(name="2", latitude=2, longitude=2)
+    loc3 = Location(name="3", latitude=3, longitude=3)
+    test_map.add_route(start=loc0, end=loc1, duration=4)
+    test_map.add_route(start=loc0, end=loc2, duration=8)
+    test_map.add_route(start=loc1, end=loc2, duration=3)
+
+    route = test_map.route("0", "2")
+    assert route.duration == 7
+    assert route.path == [loc0, loc1, loc2]
+    assert route.settled == 3
+
+    # Unreachable locations have no path
+    test_map.add_route(start=loc3, end=loc3, duration=0)
+    route = test_map.route("0", "3")
+    assert route.duration == float("inf")
+    assert route.path == []
+
+
+def test_tree_cache():
+    test_map = Map(cache_size=2)
+    loc0 = Location(name="0", latitude=0, longitude=0)
+    loc1 = Location(name="1", latitude=1, longitude=1)
+    loc2 = Location(name="2", latitude=2, longitude=2)
+    loc3 = Location(name="3", latitude=3, longitude=3)
+    test_map.add_route(start=loc0, end=loc1, duration=4)
+    test_map.add_route(start=loc1, end=loc2, duration=3)
+    test_map.add_route(start=loc2, end=loc3, duration=2)
+
+    # A repeated query is answered from the cached tree
+    assert test_map.route("0", "1").settled == 2
+    assert test_map.route("0", "1").settled == 0
+
+    # A farther target resumes the partial search
+    route = test_map.route("0", "3")
+    assert route.duration == 9
+    assert route.settled == 2
+    assert test_map.route("0", "2").settled == 0
+
+    # Least recently used trees are evicted
+    test_map.route("1", "0")
+    test_map.route("2", "0")
+    assert list(test_map._trees) == [1, 2]
+
+    # Adding a route invalidates the cache
+    test_map.add_route(start=loc0, end=loc3, duration=1)
+    route = test_map.route("0", "3")
+    assert route.duration == 1
+    assert route.settled > 0
+    assert list(test_map._trees) == [0]
+
+
+def test_update_route():
+    test_map = Map()
+    A = Location(name="A", latitude=None, longitude=None)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=None, longitude=None)
+    test_map.add_route(start=A, end=B, duration=5)
+    test_map.add_route(start=B, end=C, duration=5)
+    test_map.add_route(start=A, end=C, duration=20)
+    assert test_map.calculate_duration("A", "C") == 10
+
+    # Cached trees are repaired rather than discarded
+    tree = test_map._tree(0)
+    test_map.update_route("B", "C", float("inf"))
+    assert test_map._tree(0) is tree
+    assert test_map.construct_path("A", "C") == [A, C]
+    test_map.update_route(C, B, 1)
+    assert test_map.route("A", "C").path == [A, B, C]
+    assert test_map.calculate_duration("C", "B") == 1
+    assert test_map._adjacency_list[B][C] == test_map._adjacency_list[C][B] == 1
+
+    # Derived indexes see the new durations
+    assert test_map.calculate_duration("A", "C", method="ch") == 6
+    assert test_map.calculate_duration("A", "C", method="alt") == 6
+
+    # Only existing routes can be updated
+    test_map.add_route(start=C, end=Location(name="D"), duration=1)
+    with pytest.raises(KeyError):
+        test_map.update_route("A", "D", 1)
+    with pytest.raises(KeyError):
+        test_map.update_route("A", "E", 1)
+
+
+def test_distance_matrix():
+    test_map = Map()
+    A = Location(name="A", latitude=None, longitude=None)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=None, longitude=None)
+    test_map.add_route(start=A, end=B, duration=5)
+    test_map.add_route(start=A, end=C, duration=10.5)
+    test_map.add_route(start=C, end=B, duration=50)
+
+    matrix, labels = test_map.distance_matrix()
+    assert labels == [A, B, C]
+    assert matrix.tolist() == [[0, 5, 10.5], [5, 0, 15.5], [10.5, 15.5, 0]]
+    assert np.array_equal(
+        test_map.distance_matrix(method="dijkstra", workers=1)[0], matrix
+    )
+
+
+def test_route_many():
+    test_map = Map()
+    loc0 = Location(name="0", latitude=0, longitude=0)
+    loc1 = Location(name="1", latitude=1, longitude=1)
+    loc2 = Location(name="2", latitude=2, longitude=2)
+    loc3 = Location(name="3", latitude=3, longitude=3)
+    test_map.add_route(start=loc0, end=loc1, duration=4)
+    test_map.add_route(start=loc1, end=loc2, duration=3)
+    test_map.add_route(start=loc2, end=loc3, duration=2)
+
+    pairs = [("0", "3"), ("2", "0"), (loc0, "1"), ("0", loc2)]
+    expected = [test_map.route(start, end) for start, end in pairs]
+    for workers in [1, 2]:
+        routes = test_map.route_many(pairs, workers=workers)
+        assert [r.duration for r in routes] == [9, 7, 4, 7]
+        assert [r.path for r in routes] == [r.path for r in expected]
+
+    # One search per distinct start settles each node at most once
+    test_map.add_route(start=loc3, end=loc0, duration=100)
+    routes = test_map.route_many(pairs, workers=2)
+    assert sum(r.settled for r in routes) == 4 + 4
+
+
+def test_astar():
+    city_map = read_routes(
+        "data/routes.csv", locations=read_locations("data/locations.csv")
+    )
+    names = list(city_map._locations)
+    for start in names:
+        for end in names:
+            expected = city_map.route(start, end, method="bidirectional")
+            route = city_map.route(start, end, method="astar")
+            assert abs(route.duration - expected.duration) < 1e-9
+            assert route.path[0] == start and route.path[-1] == end
+
+    # A configured maximum speed is used in place of the fastest route
+    city_map.max_speed = 1.0
+    assert city_map.calculate_duration(names[0], names[-1], method="astar") == (
+        city_map.calculate_duration(names[0], names[-1])
+    )
+
+    # Maps without coordinates fall back to Dijkstra
+    test_map = Map()
+    test_map.add_route(start=Location(name="A"), end=Location(name="B"), duration=5)
+    assert test_map.calculate_duration("A", "B", method="astar") == 5
+
+
+def test_contract(tmp_path):
+    city_map = read_routes(
+        "data/routes.csv", locations=read_locations("data/locations.csv")
+    )
+    path = tmp_path / "hierarchy.npz"
+    hierarchy = city_map.contract(path=path)
+    assert city_map.contract() is hierarchy
+    assert path.exists()
+
+    # A fresh map with the same routes loads the saved hierarchy
+    same_map = read_routes(
+        "data/routes.csv", locations=read_locations("data/locations.csv")
+    )
+    assert same_map.contract(path=path).n_shortcuts == hierarchy.n_shortcuts
+
+    # Adding a route rebuilds the hierarchy
+    city_map.add_route(start=Location(name="A"), end=Location(name="B"), duration=1)
+    assert city_map.contract() is not hierarchy
+    assert city_map.calculate_duration("A", "B", method="ch") == 1
+
+
+def test_landmarks():
+    test_map = Map()
+    A = Location(name="A", latitude=None, longitude=None)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=None, longitude=None)
+    test_map.add_route(start=A, end=B, duration=5)
+    test_map.add_route(start=B, end=C, duration=50)
+
+    index = test_map.landmarks(k=2)
+    assert test_map.landmarks() is index
+    assert sorted(index.landmarks.tolist()) == [0, 2]
+    assert test_map.calculate_duration("A", "C", method="alt") == 55
+
+    # Adding a route rebuilds the index
+    test_map.add_route(start=A, end=C, duration=10.5)
+    assert test_map.landmarks() is not index
+    assert test_map.route("B", "C", method="alt").path == [B, A, C]
+
+
+def test_nearest():
+    test_map = Map()
+    A = Location(name="A", latitude=42.0, longitude=-71.0)
+    B = Location(name="B", latitude=42.1, longitude=-71.0)
+    C = Location(name="C", latitude=42.0, longitude=-71.2)
+    D = Location(name="D", latitude=None, longitude=None)
+    test_map.add_route(start=A, end=B, duration=5)
+    test_map.add_route(start=B, end=C, duration=10)
+    test_map.add_route(start=C, end=D, duration=1)
+
+    assert test_map.nearest(42.01, -71.01) == [A]
+    assert test_map.nearest(42.09, -71.0, k=2) == [B, A]
+    # Only located nodes are found, and arrays give one list per point
+    assert test_map.nearest([42.0, 42.0], [-71.19, -71.0], k=5) == [
+        [C, A, B],
+        [A, B, C],
+    ]
+    assert test_map.within_radius(42.0, -71.0, 12) == [A, B]
+    assert test_map.within_radius(0.0, 0.0, 12) == []
+    assert test_map.spatial_index() is test_map.spatial_index()
+
+    # Route queries accept coordinates
+    assert test_map.route((42.09, -71.0), (42.0, -71.19)).path == [B, C]
+    assert test_map.calculate_duration((42.0, -71.0), "D") == 16
+
+    # Changing a duration keeps the index, but adding a route rebuilds it
+    index = test_map.spatial_index()
+    test_map.update_route("B", "C", 12)
+    assert test_map.spatial_index() is index
+    E = Location(name="E", latitude=42.09, longitude=-71.0)
+    test_map.add_route(start=B, end=E, duration=1)
+    assert test_map.spatial_index() is not index
+    assert test_map.nearest(42.09, -71.0) == [E]
+
+
+def test_k_shortest_paths():
+    test_map = Map()
+    A, B, C, D = (Location(name=name) for name in "ABCD")
+    test_map.add_route(start=A, end=B, duration=1)
+    test_map.add_route(start=B, end=D, duration=1)
+    test_map.add_route(start=A, end=C, duration=2.5)
+    test_map.add_route(start=C, end=D, duration=2)
+    test_map.add_route(start=B, end=C, duration=0.5)
+
+    routes = test_map.k_shortest_paths("A", "D", k=5)
+    assert [route.duration for route in routes] == [2, 3.5, 4, 4.5]
+    assert [route.path for route in routes] == [
+        [A, B, D],
+        [A, B, C, D],
+        [A, C, B, D],
+        [A, C, D],
+    ]
+    # The shortest route matches a plain route query
+    assert test_map.route("A", "D").path == routes[0].path
+    assert test_map.k_shortest_paths("A", "D", k=0) == []
+
+
+def test_reachable_within():
+    test_map = Map()
+    A, B, C, D = (Location(name=name) for name in "ABCD")
+    test_map.add_route(start=A, end=B, duration=5)
+    test_map.add_route(start=B, end=C, duration=5)
+    test_map.add_route(start=C, end=D, duration=5)
+
+    assert test_map.reachable_within("A", 10) == [(A, 0), (B, 5), (C, 10)]
+    assert test_map.reachable_within("A", [0, 7, 100]) == [
+        [(A, 0)],
+        [(A, 0), (B, 5)],
+        [(A, 0), (B, 5), (C, 10), (D, 15)],
+    ]
+    # Several starts form one isochrone
+    assert test_map.reachable_within(["A", "D"], 5) == [(A, 0), (D, 0), (B, 5), (C, 5)]
+
+
+def test_nearest_of():
+    test_map = Map()
+    A, B, C, D, E = (Location(name=name) for name in "ABCDE")
+    test_map.add_route(start=A, end=B, duration=5)
+    test_map.add_route(start=B, end=C, duration=5)
+    test_map.add_route(start=A, end=D, duration=7)
+    test_map.add_route(start=D, end=E, duration=7)
+
+    routes = test_map.nearest_of("A", ["C", "D", "E"], k=2)
+    assert [(route.duration, route.path) for route in routes] == [
+        (7, [A, D]),
+        (10, [A, B, C]),
+    ]
+    assert [route.path[-1] for route in test_map.nearest_of("A", [E, C])] == [C]
+
+    # Each location is labelled with its nearest facility
+    assert test_map.voronoi(["C", "E"]) == {
+        A: (C, 10),
+        B: (C, 5),
+        C: (C, 0),
+        D: (E, 7),
+        E: (E, 0),
+    }
+
+
+def test_profiles():
+    test_map = Map(time_units="hours")
+    A, B, C = (Location(name=name) for name in "ABC")
+    test_map.add_route(start=A, end=B, duration=1)
+    test_map.add_route(start=B, end=C, duration=1)
+    test_map.add_route(start=A, end=C, duration=2.5)
+
+    # Rush hour on A to B makes the direct route faster around 8:00
+    rush = test_map.set_profile("A", "B", [6, 8, 10], [1, 3, 1])
+    assert test_map.set_profile("B", "A", [6, 8, 10], [1, 3, 1]) == rush
+    assert test_map.calculate_duration("A", "C", depart_at=3) == 2
+    assert test_map.calculate_duration("C", "A", depart_at=27) == 2
+    assert test_map.route("A", "C", depart_at=8).path == [A, C]
+    assert test_map.calculate_duration("A", "C", depart_at=8) == 2.5
+    # Static queries keep the stored durations
+    assert test_map.calculate_duration("A", "C") == 2
+
+    times, arrivals = test_map.arrival_profile("A", "C", 5, 9)
+    assert np.allclose(np.interp([5, 7, 8], times, arrivals), [7, 9.5, 10.5])
+    with pytest.raises(ValueError):
+        test_map.route("A", "C", method="ch", depart_at=8)
+    with pytest.raises(KeyError):
+        test_map.set_profile("A", "D", [0], [1])
+
+
+def test_components():
+    test_map = Map()
+    A, B, C, D = (Location(name=name) for name in "ABCD")
+    test_map.add_route(start=A, end=B, duration=1)
+    test_map.add_route(start=C, end=D, duration=1)
+
+    # Unreachable queries are answered without a search
+    assert test_map.route("A", "D") == Route(duration=float("inf"))
+    assert test_map.calculate_duration("A", "D") == float("inf")
+    assert test_map.k_shortest_paths("A", "D", k=2) == []
+    assert test_map.route_many([("A", "D"), ("A", "B")])[0].settled == 0
+
+    # Routes are joined incrementally, and a blocked route splits them again
+    index = test_map.components()
+    test_map.add_route(start=B, end=C, duration=1)
+    assert test_map.components() is index
+    assert test_map.calculate_duration("A", "D") == 3
+    test_map.update_route("B", "C", float("inf"))
+    assert test_map.route("A", "D").settled == 0
+    test_map.update_route("B", "C", 2)
+    assert test_map.calculate_duration("A", "D") == 4
+    test_map.add_routes([(B, C, float("inf")), (A, D, 5)])
+    assert test_map.route("A", "D").path == [A, D]
+    assert test_map.route("B", "C").path == [B, A, D, C]
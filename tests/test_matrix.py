@@ -0,0 +1,44 @@
+import numpy as np
+from route_calc.graph import CompiledGraph
+from route_calc.matrix import distance_matrix, dijkstra_rows, floyd_warshall
+
+
+def example_graph():
+    # 0 - 1 - 2 - 3 plus a shortcut 0 - 2, and an isolated node 4
+    starts = [0, 1, 1, 2, 2, 3, 0, 2]
+    ends = [1, 0, 2, 1, 3, 2, 2, 0]
+    weights = [4, 4, 3, 3, 2, 2, 8, 8]
+    return CompiledGraph.from_edges(["0", "1", "2", "3", "4"], starts, ends, weights)
+
+
+def test_floyd_warshall():
+    expected = np.array(
+        [
+            [0, 4, 7, 9, np.inf],
+            [4, 0, 3, 5, np.inf],
+            [7, 3, 0, 2, np.inf],
+            [9, 5, 2, 0, np.inf],
+            [np.inf, np.inf, np.inf, np.inf, 0],
+        ]
+    )
+    assert np.array_equal(floyd_warshall(example_graph()), expected)
+    assert np.array_equal(dijkstra_rows(example_graph(), [0, 1, 2, 3, 4]), expected)
+    assert np.array_equal(dijkstra_rows(example_graph(), [3]), expected[[3]])
+
+
+def test_distance_matrix(tmp_path):
+    graph = example_graph()
+    expected = floyd_warshall(graph)
+
+    # Every method agrees, in or out of process
+    assert np.array_equal(
+        distance_matrix(graph, method="dijkstra", workers=1), expected
+    )
+    assert np.array_equal(
+        distance_matrix(graph, method="dijkstra", workers=2), expected
+    )
+
+    # Matrices can be written straight to disk
+    path = tmp_path / "matrix.npy"
+    distance_matrix(graph, out=str(path))
+    assert np.array_equal(np.load(path, mmap_mode="r"), expected)
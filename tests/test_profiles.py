@@ -0,0 +1,88 @@
+import random
+import pytest
+import numpy as np
+from route_calc.profiles import ProfilePool, arrival_profile, time_dependent_dijkstra
+
+
+def test_profile_pool():
+    pool = ProfilePool(period=100.0)
+    rush = pool.add([20.0, 30.0, 40.0], [5.0, 12.0, 5.0])
+    assert pool.add([20.0, 30.0, 40.0], [5.0, 12.0, 5.0]) == rush
+    assert pool.add([0.0], [3.0]) == 1
+    assert len(pool) == 2
+
+    # Interpolated between breakpoints and around the end of the period
+    assert pool.duration(rush, 25.0) == pytest.approx(8.5)
+    assert pool.duration(rush, 125.0) == pytest.approx(8.5)
+    assert pool.duration(rush, 90.0) == pytest.approx(5.0)
+    assert pool.duration(1, 42.0) == 3.0
+    assert np.allclose(pool.evaluate(rush, [25.0, 35.0, 70.0]), [8.5, 8.5, 5.0])
+    times, durations = pool.breakpoints(rush)
+    assert times.tolist() == [20.0, 30.0, 40.0]
+
+    # A duration may not fall faster than time passes
+    with pytest.raises(ValueError):
+        pool.add([0.0, 10.0], [30.0, 5.0])
+    with pytest.raises(ValueError):
+        pool.add([10.0, 5.0], [1.0, 1.0])
+    with pytest.raises(ValueError):
+        pool.add([10.0, 100.0], [1.0, 1.0])
+    with pytest.raises(ValueError):
+        pool.add([10.0], [-1.0])
+
+
+def test_time_dependent_search(random_graph):
+    graph = random_graph(n=30, seed=1)
+    rng = random.Random(0)
+    pool = ProfilePool(period=100.0)
+    shapes = [
+        pool.add([10.0, 30.0, 50.0], [2.0, 15.0, 2.0]),
+        pool.add([0.0, 60.0], [8.0, 1.0]),
+    ]
+    # Give each route in both directions the same random profile or none
+    offsets, targets, _ = graph.as_lists()
+    chosen = {}
+    profiles = []
+    for u in range(graph.n_nodes):
+        for i in range(offsets[u], offsets[u + 1]):
+            key = (min(u, targets[i]), max(u, targets[i]))
+            if key not in chosen:
+                chosen[key] = rng.choice(shapes + [-1])
+            profiles.append(chosen[key])
+
+    def earliest(source, depart_at):
+        # Relax every route until no arrival time improves
+        arrivals = [float("inf")] * graph.n_nodes
+        arrivals[source] = depart_at
+        changed = True
+        while changed:
+            changed = False
+            for u in range(graph.n_nodes):
+                for i in range(offsets[u], offsets[u + 1]):
+                    duration = (
+                        graph.weights[i]
+                        if profiles[i] < 0
+                        else pool.duration(profiles[i], arrivals[u])
+                    )
+                    if arrivals[u] + duration < arrivals[targets[i]] - 1e-12:
+                        arrivals[targets[i]] = arrivals[u] + duration
+                        changed = True
+        return arrivals
+
+    for depart_at in [0.0, 17.5, 42.0, 180.0]:
+        arrivals = earliest(0, depart_at)
+        for target in [5, 17, 29]:
+            duration, path, _ = time_dependent_dijkstra(
+                graph, pool, profiles, 0, target, depart_at
+            )
+            assert abs(duration - (arrivals[target] - depart_at)) < 1e-9
+            assert path[0] == 0 and path[-1] == target
+
+    # The arrival function matches a search at every departure time
+    times, arrivals = arrival_profile(graph, pool, profiles, 0, 29, 5.0, 160.0)
+    assert times[0] == 5.0 and times[-1] == 160.0
+    for depart_at in np.concatenate([np.linspace(5.0, 160.0, 100), times]):
+        duration, _, _ = time_dependent_dijkstra(
+            graph, pool, profiles, 0, 29, depart_at
+        )
+        assert abs(np.interp(depart_at, times, arrivals) - depart_at - duration) < 1e-6
@@ -1,7 +1,8 @@
 import pytest
+import numpy as np
 from route_calc.map import Map
 from route_calc.location import Location
-from route_calc.readers import read_locations, read_routes
+from route_calc.readers import convert_csv, read_compiled, read_locations, read_routes
 
 
 def test_read_locations():
@@ -82,3 +83,46 @@ def test_read_routes(tmp_path):
     expected_map.add_route(start=C, end=B, duration=50)
 
     assert read_routes(temp_file) == expected_map
+
+
+def test_read_routes_chunks(tmp_path):
+    temp_file = tmp_path / "test_readers.csv"
+    temp_file.write_text(
+        "\n".join(["start,end,duration", "A,B,5", "", "A,C,10.5", "C,B,50", "B,A,7"])
+    )
+    locations = {"A": Location(name="A", latitude=1.0, longitude=2.0)}
+
+    # Parsing in chunks gives the same map, reusing the given locations
+    city_map = read_routes(temp_file, locations=locations, chunk_size=2)
+    assert city_map == read_routes(temp_file, locations=list(locations.values()))
+    assert city_map._locations["A"] is locations["A"]
+    assert city_map.calculate_duration("A", "B") == 7
+
+    # Malformed files are reported rather than skipped
+    temp_file.write_text("start,end,duration\nA,B,5\nA,C,fast")
+    with pytest.raises(ValueError, match="rows 2 to 2"):
+        read_routes(temp_file, chunk_size=1)
+    temp_file.write_text("from,to,duration\nA,B,5")
+    with pytest.raises(ValueError):
+        read_routes(temp_file)
+
+
+def test_read_compiled():
+    locations = read_locations("data/locations.csv")
+    graph = read_compiled("data/routes.csv", locations=locations, chunk_size=7)
+    expected = read_routes("data/routes.csv", locations=locations).compile()
+    assert graph.names == expected.names
+    assert np.array_equal(graph.latitudes, expected.latitudes)
+    assert np.array_equal(graph.offsets, expected.offsets)
+    for node in range(graph.n_nodes):
+        assert sorted(graph.neighbors(node)) == sorted(expected.neighbors(node))
+    assert graph.location(0) == locations[0]
+
+
+def test_convert_csv(tmp_path):
+    path = tmp_path / "city.bin"
+    convert_csv("data/routes.csv", path, locations_path="data/locations.csv")
+    city_map = read_routes(
+        "data/routes.csv", locations=read_locations("data/locations.csv")
+    )
+    assert Map.load(path) == city_map
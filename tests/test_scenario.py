@@ -0,0 +1,63 @@
+import pytest
+import numpy as np
+from route_calc.map import Map
+from route_calc.location import Location
+from route_calc.scenario import Scenario
+
+
+def example_map():
+    test_map = Map()
+    loc0 = Location(name="0", latitude=0, longitude=0)
+    loc1 = Location(name="1", latitude=0.01, longitude=0)
+    loc2 = Location(name="2", latitude=0.02, longitude=0)
+    test_map.add_route(start=loc0, end=loc1, duration=4)
+    test_map.add_route(start=loc0, end=loc2, duration=8)
+    test_map.add_route(start=loc1, end=loc2, duration=3)
+    return test_map, [loc0, loc1, loc2]
+
+
+def test_init():
+    test_map, _ = example_map()
+    scenario = Scenario(test_map)
+    assert scenario.time_units == "minutes"
+    assert scenario.changes == {}
+
+    # The topology is shared with the map rather than copied
+    graph = scenario.graph
+    assert graph.offsets is test_map.compile().offsets
+    assert graph.targets is test_map.compile().targets
+    assert np.array_equal(graph.weights, test_map.compile().weights)
+
+    # Later updates to the map do not leak into the scenario
+    scenario = Scenario(test_map)
+    test_map.update_route("0", "2", 1)
+    assert scenario.calculate_duration("0", "2") == 7
+    assert scenario.graph.weights.tolist().count(1) == 0
+    assert Scenario(test_map).calculate_duration("0", "2") == 1
+
+
+def test_weights():
+    test_map, (loc0, loc1, loc2) = example_map()
+    scenario = Scenario(test_map, weights=test_map.compile().weights * 2)
+    for method in ["dijkstra", "bidirectional", "astar"]:
+        assert scenario.calculate_duration("0", "2", method=method) == 14
+        assert scenario.construct_path(loc0, "2", method=method) == [loc0, loc1, loc2]
+
+    # The map itself is unchanged
+    assert test_map.calculate_duration("0", "2") == 7
+
+    with pytest.raises(ValueError):
+        Scenario(test_map, weights=[1, 2, 3])
+
+
+def test_changes():
+    test_map, (loc0, loc1, loc2) = example_map()
+    scenario = Scenario(test_map, changes={("1", "2"): float("inf")})
+    assert scenario.calculate_duration("2", "0") == 8
+    assert scenario.construct_path("0", "2") == [loc0, loc2]
+
+    # Unknown routes and locations raise KeyErrors
+    with pytest.raises(KeyError):
+        Scenario(test_map, changes={("0", "0"): 1}).graph
+    with pytest.raises(KeyError):
+        Scenario(test_map).route("0", "3")
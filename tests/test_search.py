@@ -0,0 +1,249 @@
+import random
+import numpy as np
+from route_calc.graph import CompiledGraph
+from route_calc.map import Map
+from route_calc.location import Location
+from route_calc.matrix import floyd_warshall
+from route_calc.search import (
+    ShortestPathTree,
+    bidirectional,
+    k_shortest_paths,
+    reachable_within,
+    unwind,
+    voronoi,
+)
+
+
+def example_graph():
+    # The shortest routes from A follow A-C-B-D-E-F, at durations 0, 2, 3, 8, 10
+    # and 13. Locations A to F are numbered 0 to 5.
+    test_map = Map()
+    locations = {name: Location(name=name) for name in "ABCDEF"}
+    for start, end, duration in [
+        ("A", "B", 4),
+        ("A", "C", 2),
+        ("B", "C", 1),
+        ("B", "D", 5),
+        ("C", "D", 9),
+        ("C", "E", 11),
+        ("D", "E", 2),
+        ("D", "F", 7),
+        ("E", "F", 3),
+    ]:
+        test_map.add_route(
+            start=locations[start], end=locations[end], duration=duration
+        )
+    return test_map.compile()
+
+
+A, B, C, D, E, F = range(6)
+
+
+def test_shortest_path_tree():
+    graph = example_graph()
+    tree = ShortestPathTree(graph, A)
+    assert tree.duration(B) == 3
+    assert tree.path(B) == [A, C, B]
+    # The search stops once the target is settled
+    assert list(tree.settled) == [A, C, B]
+    assert not tree.complete
+
+    # Resuming settles the rest in order of duration
+    tree.settle()
+    assert tree.complete
+    assert list(tree.settled.items()) == [
+        (A, 0),
+        (C, 2),
+        (B, 3),
+        (D, 8),
+        (E, 10),
+        (F, 13),
+    ]
+    assert tree.path(F) == unwind(tree.prev, F) == [A, C, B, D, E, F]
+
+
+def test_shortest_path_tree_update(random_graph, path_duration):
+    graph = random_graph()
+    rng = random.Random(1)
+    trees = [ShortestPathTree(graph, source) for source in [0, 17, 42]]
+    for step in range(200):
+        # Partially settle the trees, then slow down, speed up or block a route
+        for tree in trees:
+            tree.settle(rng.randrange(graph.n_nodes))
+        u = rng.randrange(graph.n_nodes)
+        v, old = rng.choice(graph.neighbors(u))
+        new = rng.choice([old * 3, old / 3, rng.uniform(1, 10), float("inf")])
+        graph.update_weight(u, v, new)
+        assert dict(graph.neighbors(v))[u] == new
+        for tree in trees:
+            tree.update_route(u, v, old, new)
+
+        for tree in trees:
+            # Every settled node is still nearer than every queued one
+            if tree._pq and tree.settled:
+                assert max(tree.settled.values()) <= min(tree._pq)[0]
+            if step % 20 == 0:
+                tree.settle()
+            # Every settled node is exact, and every path is a real route
+            expected = floyd_warshall(graph)[tree.source]
+            for node, duration in tree.settled.items():
+                assert abs(duration - expected[node]) < 1e-9
+            target = rng.randrange(graph.n_nodes)
+            assert np.isclose(tree.duration(target), expected[target])
+            if np.isfinite(expected[target]):
+                path = tree.path(target)
+                assert path[0] == tree.source and path[-1] == target
+                assert abs(path_duration(graph, path) - expected[target]) < 1e-9
+
+
+def _undirected(n_nodes, edges):
+    starts, ends, weights = zip(*edges)
+    return CompiledGraph.from_edges(
+        [str(i) for i in range(n_nodes)],
+        list(starts) + list(ends),
+        list(ends) + list(starts),
+        list(weights) * 2,
+    )
+
+
+def test_shortest_path_tree_update_radius():
+    graph = _undirected(
+        10,
+        [
+            (0, 1, 1), (0, 6, 7), (0, 5, 3), (1, 2, 1), (1, 5, 8), (1, 6, 9),
+            (1, 3, 3), (2, 4, 8), (2, 7, 7), (2, 3, 1), (6, 8, 4), (6, 7, 2),
+            (8, 9, 10), (3, 9, 5),
+        ],
+    )  # fmt: skip
+    tree = ShortestPathTree(graph, 0)
+    tree.duration(7)
+    for u, v, new in [(1, 2, 18), (2, 3, 2)]:
+        old = dict(graph.neighbors(u))[v]
+        graph.update_weight(u, v, new)
+        tree.update_route(u, v, old, new)
+
+    # A repair that settles nearer nodes does not shrink the searched radius
+    assert max(tree.settled.values()) <= min(tree._pq)[0]
+    nearest, _ = tree.nearest({9, 6, 2, 8})
+    assert nearest == [2]
+    assert tree.duration(2) == 6
+
+
+def test_shortest_path_tree_update_bounded():
+    graph = _undirected(2000, [(i, i + 1, 1) for i in range(1999)] + [(0, 5, 10)])
+    tree = ShortestPathTree(graph, 0)
+    tree.settle(3)
+    graph.update_weight(0, 5, 1)
+    tree.update_route(0, 5, 10, 1)
+
+    # Only the neighbourhood of the faster route is repaired
+    assert len(tree.distances) < 20 and len(tree._pq) < 20
+    assert tree.duration(6) == 2
+    assert tree.path(4) == [0, 5, 4]
+
+
+def test_bidirectional():
+    graph = example_graph()
+    assert bidirectional(graph, A, F)[:2] == (13, [A, C, B, D, E, F])
+    assert bidirectional(graph, F, B)[:2] == (10, [F, E, D, B])
+    assert bidirectional(graph, D, D)[:2] == (0, [D])
+
+    # Unreachable targets have no path
+    graph = CompiledGraph.from_edges(["A", "B", "C"], [0, 1], [1, 0], [1, 1])
+    assert bidirectional(graph, 0, 2)[:2] == (float("inf"), [])
+
+
+def test_bidirectional_blocked():
+    # A blocked route of infinite duration is never taken
+    graph = CompiledGraph.from_edges(
+        ["A", "B", "C"],
+        [0, 1, 0, 2, 1, 2],
+        [1, 0, 2, 0, 2, 1],
+        [np.inf, np.inf, 1, 1, 1, 1],
+    )
+    assert bidirectional(graph, 0, 1)[:2] == (2, [0, 2, 1])
+
+
+def test_k_shortest_paths():
+    graph = example_graph()
+    results = k_shortest_paths(graph, A, F, 3)
+    assert [result[:2] for result in results] == [
+        (13, [A, C, B, D, E, F]),
+        (14, [A, B, D, E, F]),
+        (15, [A, C, B, D, F]),
+    ]
+
+    # A resumed tree gives the same paths, and every path is found for a large k
+    tree = ShortestPathTree(graph, F)
+    tree.settle(D)
+    resumed = k_shortest_paths(graph, A, F, 3, tree=tree)
+    assert [r[:2] for r in resumed] == [r[:2] for r in results]
+    assert len(k_shortest_paths(graph, A, F, 100)) == 13
+
+    # Unreachable and trivial queries
+    graph = CompiledGraph.from_edges(["A", "B", "C"], [0, 1], [1, 0], [1.0, 1.0])
+    assert k_shortest_paths(graph, 0, 2, 3) == []
+    assert k_shortest_paths(graph, 0, 1, 3) == [(1.0, [0, 1], 2)]
+    assert k_shortest_paths(graph, 1, 1, 3)[0][:2] == (0.0, [1])
+
+
+def test_reachable_within():
+    graph = example_graph()
+    assert reachable_within(graph, [A], 8.0) == ([A, C, B, D], [0, 2, 3, 8])
+    assert reachable_within(graph, [A], -1.0) == ([], [])
+
+    # Several sources measure each node from the nearest one
+    nodes, durations = reachable_within(graph, [A, F], 4.0)
+    assert dict(zip(nodes, durations)) == {A: 0, F: 0, C: 2, B: 3, E: 3}
+    assert durations == sorted(durations)
+
+
+def test_nearest():
+    graph = example_graph()
+    tree = ShortestPathTree(graph, A)
+    found, settled = tree.nearest({B, E, F}, k=2)
+    assert found == [B, E]
+    assert settled == len(tree.settled) == 5
+    # Resuming finds the rest, and settled targets are answered without searching
+    assert tree.nearest({B, E, F}, k=10)[0] == [B, E, F]
+    assert tree.nearest({B, E, F}, k=2) == ([B, E], 0)
+
+
+def test_voronoi():
+    graph = example_graph()
+    # D is nearer to F, at 5, than to A, at 8
+    assert voronoi(graph, [A, F]) == ([0, 0, 0, 1, 1, 1], [0, 3, 2, 5, 3, 0])
+
+    # Unreachable nodes are left unlabelled
+    graph = CompiledGraph.from_edges(["A", "B", "C"], [0, 1], [1, 0], [1.0, 1.0])
+    assert voronoi(graph, [0]) == ([0, 0, -1], [0.0, 1.0, float("inf")])
+
+
+def test_random_graph(random_graph, path_duration):
+    # Every search agrees with Floyd-Warshall on a larger graph
+    graph = random_graph()
+    matrix = floyd_warshall(graph)
+    for source, target in [(0, 59), (12, 40), (33, 7), (5, 5)]:
+        tree = ShortestPathTree(graph, source)
+        for duration, path in [
+            (tree.duration(target), tree.path(target)),
+            bidirectional(graph, source, target)[:2],
+            k_shortest_paths(graph, source, target, 1)[0][:2],
+        ]:
+            assert np.isclose(duration, matrix[source, target])
+            assert path[0] == source and path[-1] == target
+            assert np.isclose(path_duration(graph, path), duration)
+
+    tree = ShortestPathTree(graph, 0)
+    targets = [5, 17, 23, 41, 59]
+    assert tree.nearest(targets, k=5)[0] == sorted(targets, key=matrix[0].__getitem__)
+
+    nearest = np.minimum(matrix[0], matrix[40])
+    nodes, durations = reachable_within(graph, [0, 40], 8.0)
+    assert sorted(nodes) == np.flatnonzero(nearest <= 8.0).tolist()
+    assert np.allclose(durations, nearest[nodes])
+
+    sources = [3, 30, 50]
+    labels, durations = voronoi(graph, sources)
+    assert np.allclose(durations, matrix[sources].min(axis=0))
+    assert np.allclose(matrix[sources][labels, range(graph.n_nodes)], durations)
@@ -1,7 +1,14 @@
 import pytest
+import numpy as np
 from route_calc.map import Map
 from route_calc.location import Location
-from route_calc.simulation import simulate_traffic
+from route_calc.simulation import (
+    estimate_route_statistic,
+    route_duration_distribution,
+    simulate_scenarios,
+    simulate_traffic,
+    simulate_traffic_batch,
+)
 
 
 def test_simulate_traffic():
@@ -88,3 +95,179 @@ def test_simulate_traffic():
         "Invalid risk factor -1. Please use a number between 0 and 1, inclusive"
         == str(exception.value)
     )
+
+
+def test_simulate_traffic_batch():
+    # Create an example map
+    test_map = Map()
+    A = Location(name="A", latitude=None, longitude=None)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=None, longitude=None)
+    test_map.add_route(start=A, end=B, duration=1)
+    test_map.add_route(start=A, end=C, duration=2)
+    test_map.add_route(start=C, end=B, duration=3)
+    graph = test_map.compile()
+    route_ids, _ = graph.route_ids()
+
+    # No traffic
+    no_traffic = simulate_traffic_batch(test_map, 5, min_delay=1, max_delay=1, risk=0)
+    assert no_traffic.shape == (5, 6)
+    assert (no_traffic == graph.weights).all()
+
+    # Has traffic but no extreme events, the same in both directions
+    with_traffic = simulate_traffic_batch(
+        test_map, 1000, min_delay=1, max_delay=3, risk=0, seed=1
+    )
+    multipliers = with_traffic / graph.weights
+    assert ((multipliers >= 1) & (multipliers <= 3)).all()
+    assert (multipliers != 1).any()
+    for route in range(3):
+        both = multipliers[:, route_ids == route]
+        assert (both[:, 0] == both[:, 1]).all()
+
+    # Has traffic and extreme events on every route
+    with_blockages = simulate_traffic_batch(
+        test_map, 1000, min_delay=1, max_delay=3, risk=1, risk_count=3, seed=1
+    )
+    multipliers = with_blockages / graph.weights
+    assert (multipliers > 10).all()
+    assert 0.15 < np.isinf(multipliers).mean() < 0.25
+
+    # Scenarios are reproducible from a seed
+    assert np.array_equal(
+        simulate_traffic_batch(test_map, 10, max_delay=3, risk=0.5, seed=7),
+        simulate_traffic_batch(test_map, 10, max_delay=3, risk=0.5, seed=7),
+    )
+
+    # Check that AssertionErrors are raised appropriately
+    with pytest.raises(AssertionError):
+        simulate_traffic_batch(test_map, 10, risk=2)
+
+
+def test_simulate_scenarios():
+    test_map = Map()
+    A = Location(name="A", latitude=None, longitude=None)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=None, longitude=None)
+    test_map.add_route(start=A, end=B, duration=1)
+    test_map.add_route(start=A, end=C, duration=1)
+    test_map.add_route(start=C, end=B, duration=1)
+
+    scenarios = simulate_scenarios(test_map, 20, min_delay=1, max_delay=3, seed=0)
+    assert len(scenarios) == 20
+    # Each scenario's durations are a row of one batch array, not a copy
+    batch = scenarios[0].graph.weights.base
+    assert batch is not None and batch.shape == (20, 6)
+    for scenario in scenarios:
+        assert 1 <= scenario.calculate_duration("A", "B") <= 3
+        assert scenario.graph.targets is test_map.compile().targets
+        assert scenario.graph.weights.base is batch
+
+
+def test_route_duration_distribution():
+    test_map = Map()
+    A = Location(name="A", latitude=None, longitude=None)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=None, longitude=None)
+    test_map.add_route(start=A, end=B, duration=2)
+    test_map.add_route(start=A, end=C, duration=1)
+    test_map.add_route(start=C, end=B, duration=1)
+
+    # No traffic: both paths tie and the duration never changes
+    distribution = route_duration_distribution(test_map, "A", "B", 10, workers=1)
+    assert (distribution.durations == 2).all()
+    assert distribution.percentiles == {5: 2, 50: 2, 95: 2}
+    assert distribution.blocked == 0
+    assert sum(distribution.paths.values()) == 1
+
+    # Results are reproducible regardless of the number of workers
+    kwargs = dict(max_delay=3, risk=0.5, seed=3, chunk_size=100)
+    serial = route_duration_distribution(test_map, "A", B, 1000, workers=1, **kwargs)
+    parallel = route_duration_distribution(test_map, "A", B, 1000, workers=2, **kwargs)
+    assert np.array_equal(serial.durations, parallel.durations)
+    assert serial.paths == parallel.paths
+    assert len(serial.durations) == 1000
+    assert serial.percentiles[5] <= serial.percentiles[50] <= serial.percentiles[95]
+    assert abs(sum(serial.paths.values()) + serial.blocked - 1) < 1e-9
+
+    # A single route is blocked in about 20% of extreme events
+    single_map = Map()
+    single_map.add_route(start=A, end=B, duration=1)
+    distribution = route_duration_distribution(
+        single_map, "A", "B", 2000, risk=1, seed=0, workers=1
+    )
+    assert 0.15 < distribution.blocked < 0.25
+    assert distribution.paths == {("A", "B"): 1 - distribution.blocked}
+
+
+def test_estimate_route_statistic():
+    test_map = Map()
+    A = Location(name="A", latitude=None, longitude=None)
+    B = Location(name="B", latitude=None, longitude=None)
+    C = Location(name="C", latitude=None, longitude=None)
+    D = Location(name="D", latitude=None, longitude=None)
+    test_map.add_route(start=A, end=B, duration=10)
+    test_map.add_route(start=B, end=C, duration=10)
+    test_map.add_route(start=C, end=D, duration=10)
+    traffic = dict(min_delay=1, max_delay=3, seed=0)
+
+    # The mean of A -> B lies near 20, the middle of the delay range
+    estimate = estimate_route_statistic(test_map, "A", "B", width=0.5, **traffic)
+    assert estimate.converged
+    assert estimate.width <= 0.5
+    assert estimate.lower < 20 < estimate.upper
+    assert estimate.n_samples % 100 == 0
+
+    # Antithetic pairs need fewer samples for the same width
+    antithetic = estimate_route_statistic(
+        test_map, "A", "B", width=0.5, antithetic=True, **traffic
+    )
+    assert antithetic.converged
+    assert antithetic.n_samples < estimate.n_samples
+
+    # Common random numbers make shared routes cancel out of a comparison
+    kwargs = dict(statistic="mean", width=0.5, compare_to=(test_map, "A", "D"))
+    crn = estimate_route_statistic(test_map, "A", "C", **kwargs, **traffic)
+    independent = estimate_route_statistic(
+        test_map, "A", "C", common_random_numbers=False, **kwargs, **traffic
+    )
+    assert crn.lower < -20 < crn.upper
+    assert crn.n_samples < independent.n_samples
+
+    # Routes are matched by their ends, whatever order the maps were built in
+    reordered = Map()
+    reordered.add_route(start=C, end=D, duration=10)
+    reordered.add_route(start=B, end=C, duration=10)
+    reordered.add_route(start=A, end=B, duration=10)
+    extended = Map()
+    extended.add_route(start=A, end=B, duration=10)
+    extended.add_route(start=A, end=C, duration=100)
+    extended.add_route(start=B, end=C, duration=10)
+    for variant in [reordered, extended]:
+        same = estimate_route_statistic(
+            test_map, "A", "C", width=0.5, compare_to=(variant, "A", "C"), **traffic
+        )
+        assert (same.estimate, same.width, same.n_samples) == (0, 0, 100)
+
+    # Percentiles and blockage probabilities
+    p95 = estimate_route_statistic(test_map, "A", "B", "p95", width=1, **traffic)
+    assert estimate.estimate < p95.estimate < 30
+    blocked = estimate_route_statistic(
+        test_map, "A", "B", "blocked", width=0.1, risk=1, **traffic
+    )
+    assert blocked.lower < 0.2 < blocked.upper
+
+    # Sampling stops at max_samples
+    capped = estimate_route_statistic(
+        test_map, "A", "B", width=0, max_samples=300, **traffic
+    )
+    assert not capped.converged
+    assert capped.n_samples == 300
+
+    with pytest.raises(ValueError):
+        estimate_route_statistic(test_map, "A", "B", "p95", antithetic=True)
+    for batch_size, antithetic in [(0, False), (1, True)]:
+        with pytest.raises(ValueError):
+            estimate_route_statistic(
+                test_map, "A", "B", batch_size=batch_size, antithetic=antithetic
+            )
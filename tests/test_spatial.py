@@ -0,0 +1,57 @@
+import warnings
+import numpy as np
+from route_calc.geo import haversine
+from route_calc.spatial import SpatialIndex
+
+
+def test_nearest():
+    rng = np.random.default_rng(0)
+    latitudes = rng.uniform(41.8, 42.2, 500)
+    longitudes = rng.uniform(-71.3, -70.7, 500)
+    latitudes[::50] = np.nan
+    index = SpatialIndex(latitudes, longitudes)
+    assert len(index) == 490
+
+    # Points inside, near and far from the indexed area match a full scan
+    queries = np.concatenate(
+        [
+            np.stack([rng.normal(42, 0.3, 100), rng.normal(-71, 0.5, 100)], axis=1),
+            np.stack([rng.uniform(-90, 90, 20), rng.uniform(-180, 180, 20)], axis=1),
+        ]
+    )
+    nodes, distances = index.nearest(queries[:, 0], queries[:, 1], k=3)
+    assert nodes.shape == distances.shape == (120, 3)
+    for (latitude, longitude), row, found in zip(queries, nodes, distances):
+        scan = haversine(latitude, longitude, latitudes, longitudes)
+        scan[np.isnan(scan)] = np.inf
+        assert np.allclose(found, np.sort(scan)[:3])
+        assert np.allclose(scan[row], found)
+
+    # Missing points are padded
+    index = SpatialIndex([0.0, 1.0], [0.0, 1.0], nodes=[7, 9])
+    nodes, distances = index.nearest(0.1, 0.1, k=3)
+    assert nodes.tolist() == [[7, 9, -1]]
+    assert distances[0, 2] == np.inf
+    nodes, distances = SpatialIndex([], []).nearest([0.0, 1.0], [0.0, 1.0])
+    assert nodes.tolist() == [[-1], [-1]]
+
+    # Query points without coordinates find nothing, without a cast warning
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        nodes, distances = index.nearest([np.nan, 1.0], [0.0, 1.0])
+    assert nodes.tolist() == [[-1], [9]]
+    assert distances[0, 0] == np.inf and distances[1, 0] == 0
+
+
+def test_within_radius():
+    rng = np.random.default_rng(1)
+    # Points either side of the antimeridian
+    latitudes = rng.uniform(-5, 5, 300)
+    longitudes = (rng.uniform(175, 185, 300) + 180) % 360 - 180
+    index = SpatialIndex(latitudes, longitudes)
+    for latitude, longitude, radius in [(0, 180, 200), (3, -178, 50), (0, 0, 100)]:
+        nodes, distances = index.within_radius(latitude, longitude, radius)
+        scan = haversine(latitude, longitude, latitudes, longitudes)
+        assert sorted(nodes.tolist()) == np.flatnonzero(scan <= radius).tolist()
+        assert np.allclose(distances, scan[nodes])
+        assert (np.diff(distances) >= 0).all()